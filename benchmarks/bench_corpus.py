@@ -0,0 +1,132 @@
+"""
+Benchmark de l'ingestion d'un corpus et de la recherche filtrée par document.
+
+Génère un corpus synthétique de règlements, mesure le débit du parsing
+(séquentiel puis parallèle), puis la latence des requêtes avec et sans
+filtre doc_id sur les bases vectorielles (embeddings aléatoires).
+
+Utilisation:
+    python benchmarks/bench_corpus.py --n-docs 300 --workers 1,4,8
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from chunking import compute_chunk_uid  # noqa: E402
+from corpus import iter_corpus_chunks, list_documents  # noqa: E402
+from rag_system import chunk_metadata, metadata_filter  # noqa: E402
+from vector_store import create_vector_store  # noqa: E402
+
+
+def write_corpus(root, n_docs, n_articles, n_points):
+    """Écrit un corpus synthétique (un fichier par règlement)."""
+    rng = np.random.default_rng(0)
+    words = ["продукция", "безопасность", "требования", "маркировка", "изготовитель",
+             "соответствие", "документация", "оценка", "упаковка", "транспортирование"]
+    for d in range(n_docs):
+        lines = [f"Технический регламент {d}\n\n"]
+        for a in range(1, n_articles + 1):
+            lines.append(f"Статья {a}. Раздел {a} документа {d}\n\n")
+            for p in range(1, n_points + 1):
+                text = " ".join(rng.choice(words, size=40))
+                lines.append(f"{p}. {text}.\n")
+            lines.append("\n")
+        (Path(root) / f"tr_{d:04d}.txt").write_text("".join(lines), encoding='utf-8')
+
+
+def bench_parse(root, workers):
+    """Mesure le débit de parsing du corpus."""
+    documents = list_documents(root)
+    size = sum(os.path.getsize(path) for path, _ in documents)
+    start = time.perf_counter()
+    chunks = list(iter_corpus_chunks(root, workers=workers, documents=documents))
+    elapsed = time.perf_counter() - start
+    return chunks, {
+        'workers': workers,
+        'seconds': elapsed,
+        'chunks_per_s': len(chunks) / elapsed,
+        'mb_per_s': size / elapsed / 1e6,
+    }
+
+
+def bench_filters(backend, chunks, n_queries, dim, n_results):
+    """Mesure la latence des requêtes sans filtre et filtrées sur 1 ou 10 documents."""
+    rng = np.random.default_rng(1)
+    vectors = rng.standard_normal((len(chunks), dim)).astype(np.float32)
+    queries = rng.standard_normal((n_queries, dim)).astype(np.float32)
+    doc_ids = sorted({chunk['doc_id'] for chunk in chunks})
+
+    with tempfile.TemporaryDirectory() as path:
+        store = create_vector_store(backend, path, "bench_corpus")
+        batch = store.max_batch_size() or len(chunks)
+        for i in range(0, len(chunks), batch):
+            part = chunks[i:i + batch]
+            store.upsert(
+                [compute_chunk_uid(c) for c in part], vectors[i:i + batch],
+                [c['text'] for c in part], [chunk_metadata(c) for c in part]
+            )
+
+        results = {}
+        for label, where in (
+            ("aucun", None),
+            ("1 doc", metadata_filter(doc_ids=doc_ids[:1])),
+            ("10 docs", metadata_filter(doc_ids=doc_ids[:10])),
+            ("10 docs + article", metadata_filter(articles=["3"], doc_ids=doc_ids[:10])),
+        ):
+            store.query(queries[:1], n_results, where=where)  # Préchauffage
+            latencies = []
+            for query in queries:
+                start = time.perf_counter()
+                store.query(query[None, :], n_results, where=where)
+                latencies.append(time.perf_counter() - start)
+            results[label] = (
+                float(np.percentile(np.array(latencies) * 1000, 50)),
+                float(np.percentile(np.array(latencies) * 1000, 95)),
+            )
+    return results
+
+
+def main():
+    """Point d'entrée du benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark d'ingestion de corpus et de filtres")
+    parser.add_argument("--n-docs", type=int, default=200, help="Nombre de règlements")
+    parser.add_argument("--n-articles", type=int, default=30, help="Articles par règlement")
+    parser.add_argument("--n-points", type=int, default=8, help="Points par article")
+    parser.add_argument("--workers", default=f"1,{os.cpu_count() or 1}", help="Nombres de processus à comparer")
+    parser.add_argument("--n-queries", type=int, default=200, help="Nombre de requêtes")
+    parser.add_argument("--dim", type=int, default=768, help="Dimension des embeddings")
+    parser.add_argument("--n-results", type=int, default=5, help="Résultats par requête")
+    parser.add_argument("--backends", default="numpy,chroma", help="Bases vectorielles à mesurer")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        write_corpus(root, args.n_docs, args.n_articles, args.n_points)
+        print(f"📊 Corpus: {args.n_docs} règlements x {args.n_articles} articles x {args.n_points} points\n")
+
+        print(f"{'processus':>9} {'durée (s)':>10} {'chunks/s':>10} {'Mo/s':>8}")
+        chunks = None
+        for workers in (int(w) for w in args.workers.split(",")):
+            chunks, r = bench_parse(root, workers)
+            print(f"{r['workers']:>9} {r['seconds']:>10.2f} {r['chunks_per_s']:>10.0f} {r['mb_per_s']:>8.1f}")
+
+    print(f"\n{'backend':<8} {'filtre':<18} {'p50 (ms)':>10} {'p95 (ms)':>10}")
+    for backend in args.backends.split(","):
+        try:
+            results = bench_filters(backend, chunks, args.n_queries, args.dim, args.n_results)
+        except ImportError as e:
+            print(f"{backend:<8} ⚠️  indisponible: {e}")
+            continue
+        for label, (p50, p95) in results.items():
+            print(f"{backend:<8} {label:<18} {p50:>10.3f} {p95:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
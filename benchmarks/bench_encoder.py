@@ -0,0 +1,140 @@
+"""
+Benchmark des backends de l'encodeur (vitesse et qualité de la recherche).
+
+Compare chaque backend au modèle de référence ("torch") sur les chunks du
+règlement: débit d'encodage des chunks, latence d'encodage d'une question,
+et recouvrement des top-k chunks retrouvés (overlap@k).
+
+Utilisation:
+    python benchmarks/bench_encoder.py --backends torch-int8,onnx,onnx-int8
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from config import CHUNK_STORE_PATH, EMBEDDING_MODEL, MODELS_DIR, REGULATION_FILE  # noqa: E402
+from chunk_store import ChunkStore  # noqa: E402
+from chunking import parse_regulation_to_chunks  # noqa: E402
+from encoders import load_encoder  # noqa: E402
+
+
+QUESTIONS = [
+    "Что говорится в статье 5 о требованиях безопасности?",
+    "Какие документы необходимы для подтверждения соответствия?",
+    "Quelles sont les exigences de sécurité pour les produits?",
+    "Как осуществляется маркировка продукции?",
+    "Кто несет ответственность за безопасность продукции?",
+    "Quelles informations doit contenir le marquage?",
+]
+
+
+def load_documents(limit):
+    """Charge les chunks du règlement (chunk store ou règlement brut)."""
+    if ChunkStore.exists(CHUNK_STORE_PATH):
+        chunks = list(ChunkStore(CHUNK_STORE_PATH))
+    else:
+        with open(REGULATION_FILE, 'r', encoding='utf-8') as f:
+            chunks = parse_regulation_to_chunks(f.read())
+    return [chunk['text'] for chunk in chunks][:limit]
+
+
+def build_queries(documents, n_queries):
+    """Questions d'exemple complétées par le début de chunks tirés au hasard."""
+    rng = np.random.default_rng(0)
+    picks = rng.choice(len(documents), size=min(n_queries, len(documents)), replace=False)
+    return QUESTIONS + [documents[i][:120] for i in picks]
+
+
+def top_k(doc_embeddings, query_embeddings, k):
+    """Indices des k chunks les plus proches (similarité cosinus) pour chaque question."""
+    docs = doc_embeddings / np.linalg.norm(doc_embeddings, axis=1, keepdims=True)
+    queries = query_embeddings / np.linalg.norm(query_embeddings, axis=1, keepdims=True)
+    scores = queries @ docs.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def bench_encoder(backend, documents, queries, batch_size):
+    """
+    Mesure un backend.
+
+    Returns:
+        Dictionnaire de mesures et embeddings produits
+    """
+    start = time.perf_counter()
+    encoder = load_encoder(EMBEDDING_MODEL, backend, MODELS_DIR)
+    load_time = time.perf_counter() - start
+
+    encoder.encode(documents[:batch_size], batch_size=batch_size)  # Préchauffage
+
+    start = time.perf_counter()
+    doc_embeddings = np.asarray(encoder.encode(documents, batch_size=batch_size), dtype=np.float32)
+    docs_time = time.perf_counter() - start
+
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        encoder.encode([query])
+        latencies.append(time.perf_counter() - start)
+    query_embeddings = np.asarray(encoder.encode(queries, batch_size=batch_size), dtype=np.float32)
+
+    return {
+        'backend': backend,
+        'load_s': load_time,
+        'docs_per_s': len(documents) / docs_time,
+        'query_p50_ms': float(np.percentile(np.array(latencies) * 1000, 50)),
+        'doc_embeddings': doc_embeddings,
+        'query_embeddings': query_embeddings,
+    }
+
+
+def main():
+    """Point d'entrée du benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark des backends de l'encodeur")
+    parser.add_argument("--backends", default="torch-int8,onnx,onnx-int8", help="Backends à comparer à torch")
+    parser.add_argument("--n-docs", type=int, default=2000, help="Nombre maximal de chunks")
+    parser.add_argument("--n-queries", type=int, default=100, help="Questions tirées des chunks")
+    parser.add_argument("--batch-size", type=int, default=32, help="Taille des lots d'encodage")
+    parser.add_argument("--k", type=int, default=5, help="Nombre de chunks retrouvés (overlap@k)")
+    args = parser.parse_args()
+
+    documents = load_documents(args.n_docs)
+    queries = build_queries(documents, args.n_queries)
+    print(f"📊 {len(documents)} chunks, {len(queries)} questions, modèle {EMBEDDING_MODEL}\n")
+
+    reference = bench_encoder("torch", documents, queries, args.batch_size)
+    reference_top = top_k(reference['doc_embeddings'], reference['query_embeddings'], args.k)
+
+    print(
+        f"{'backend':<11} {'chargement (s)':>15} {'chunks/s':>10} {'accélération':>13} "
+        f"{'question p50 (ms)':>18} {f'overlap@{args.k}':>11} {'cos moyen':>10}"
+    )
+    rows = [reference]
+    for backend in args.backends.split(","):
+        try:
+            rows.append(bench_encoder(backend, documents, queries, args.batch_size))
+        except ImportError as e:
+            print(f"{backend:<11} ⚠️  indisponible: {e}")
+
+    for r in rows:
+        candidate_top = top_k(r['doc_embeddings'], r['query_embeddings'], args.k)
+        overlap = np.mean([
+            len(set(ref) & set(cand)) / args.k for ref, cand in zip(reference_top, candidate_top)
+        ])
+        a = reference['doc_embeddings'] / np.linalg.norm(reference['doc_embeddings'], axis=1, keepdims=True)
+        b = r['doc_embeddings'] / np.linalg.norm(r['doc_embeddings'], axis=1, keepdims=True)
+        cosine = float(np.mean(np.sum(a * b, axis=1)))
+        print(
+            f"{r['backend']:<11} {r['load_s']:>15.1f} {r['docs_per_s']:>10.1f} "
+            f"{r['docs_per_s'] / reference['docs_per_s']:>12.2f}x {r['query_p50_ms']:>18.2f} "
+            f"{overlap:>11.3f} {cosine:>10.4f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
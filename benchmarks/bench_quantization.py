@@ -0,0 +1,131 @@
+"""
+Benchmark du stockage compact de la base NumPy (float16, int8, binaire).
+
+Pour chaque mode et facteur de rescoring: taille sur disque, mémoire parcourue
+à chaque recherche, rappel@k par rapport à la recherche exacte en float32 et
+latence. Les documents sont regroupés en thèmes (vecteurs proches d'un centre),
+comme des chunks d'un même règlement, pour que le rappel soit significatif.
+
+Utilisation:
+    python benchmarks/bench_quantization.py --n-docs 20000 --dim 384 --factors 1,4,10
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from vector_store import QUANTIZATIONS, NumpyVectorStore  # noqa: E402
+
+
+def percentile_ms(samples, q):
+    """Retourne le percentile q d'une liste de durées (en ms)."""
+    return float(np.percentile(np.array(samples) * 1000, q))
+
+
+def clustered_vectors(rng, centers, n, noise):
+    """
+    Génère des vecteurs regroupés autour de centres (thèmes).
+
+    Returns:
+        Matrice float32 (n x dim)
+    """
+    topics = rng.integers(0, len(centers), n)
+    return centers[topics] + noise * rng.standard_normal((n, centers.shape[1])).astype(np.float32)
+
+
+def recall(results, reference):
+    """Proportion des IDs de référence retrouvés (rappel@k moyen)."""
+    found = [len(set(ids) & set(ref)) / len(ref) for ids, ref in zip(results['ids'], reference['ids'])]
+    return float(np.mean(found))
+
+
+def bench_mode(path, quantization, factor, queries, n_results, reference):
+    """
+    Mesure le rappel, la latence et la mémoire d'un mode de stockage.
+
+    Args:
+        path: Répertoire de la base (déjà indexée)
+        quantization: Mode de stockage
+        factor: Facteur de rescoring
+        queries: Embeddings des requêtes
+        n_results: Nombre de résultats par requête
+        reference: Résultats de la recherche exacte float32
+
+    Returns:
+        Dictionnaire de mesures
+    """
+    store = NumpyVectorStore(path, quantization=quantization, rescore_factor=factor)
+    store.query(queries[:1], n_results)
+
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        store.query(query[None, :], n_results)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    results = store.query(queries, n_results)
+    batch_time = time.perf_counter() - start
+
+    return {
+        'mode': quantization,
+        'factor': factor,
+        'recall': recall(results, reference),
+        'p50_ms': percentile_ms(latencies, 50),
+        'p95_ms': percentile_ms(latencies, 95),
+        'batch_per_query_ms': batch_time * 1000 / len(queries),
+        **store.storage_stats(),
+    }
+
+
+def main():
+    """Point d'entrée du benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark du stockage compact des embeddings")
+    parser.add_argument("--n-docs", type=int, default=20000, help="Nombre de documents")
+    parser.add_argument("--n-queries", type=int, default=100, help="Nombre de requêtes")
+    parser.add_argument("--dim", type=int, default=768, help="Dimension des embeddings")
+    parser.add_argument("--n-results", type=int, default=10, help="Résultats par requête (k)")
+    parser.add_argument("--n-topics", type=int, default=200, help="Nombre de thèmes des documents")
+    parser.add_argument("--noise", type=float, default=0.6, help="Dispersion autour des thèmes")
+    parser.add_argument("--modes", default=",".join(QUANTIZATIONS), help="Modes à comparer")
+    parser.add_argument("--factors", default="1,4,10", help="Facteurs de rescoring à comparer")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((args.n_topics, args.dim)).astype(np.float32)
+    vectors = clustered_vectors(rng, centers, args.n_docs, args.noise)
+    queries = clustered_vectors(rng, centers, args.n_queries, args.noise)
+    factors = [int(f) for f in args.factors.split(",")]
+
+    print(f"📊 {args.n_docs} documents, {args.n_queries} requêtes, dim={args.dim}, k={args.n_results}\n")
+    print(
+        f"{'mode':<8} {'facteur':>7} {'disque (Mo)':>12} {'recherche (Mo)':>15} {'rappel@k':>9} "
+        f"{'p50 (ms)':>9} {'p95 (ms)':>9} {'lot (ms/q)':>11}"
+    )
+
+    with tempfile.TemporaryDirectory() as path:
+        store = NumpyVectorStore(path)
+        ids = [str(i) for i in range(args.n_docs)]
+        batch = 5000
+        for i in range(0, args.n_docs, batch):
+            n = len(ids[i:i + batch])
+            store.upsert(ids[i:i + batch], vectors[i:i + batch], [""] * n, [{}] * n)
+        reference = store.query(queries, args.n_results)
+
+        for quantization in args.modes.split(","):
+            for factor in (factors if quantization != "none" else [1]):
+                r = bench_mode(path, quantization, factor, queries, args.n_results, reference)
+                print(
+                    f"{r['mode']:<8} {r['factor']:>7} {r['disk_bytes'] / 1e6:>12.2f} {r['search_bytes'] / 1e6:>15.2f} "
+                    f"{r['recall']:>9.3f} {r['p50_ms']:>9.3f} {r['p95_ms']:>9.3f} {r['batch_per_query_ms']:>11.3f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
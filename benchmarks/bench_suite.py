@@ -0,0 +1,383 @@
+"""
+Suite de benchmarks de bout en bout, exécutable hors ligne.
+
+Le modèle d'embeddings est remplacé par un encodeur à hachage déterministe
+et Ollama par un serveur local imitant son API de streaming: les mesures
+reflètent le code du système RAG (parsing, indexation, recherche, contexte,
+streaming), pas le matériel. Les résultats sont écrits en JSON pour être
+comparés d'un commit à l'autre.
+
+Mesures:
+- parse: débit du parsing d'un règlement synthétique
+- index: durée de construction de l'index
+- retrieval: latence de retrieve_context (p50/p95/p99)
+- retrieval_concurrent: débit de retrieve_context appelé depuis plusieurs
+  threads (micro-batching de l'encodage et de la recherche)
+- e2e: délai avant le premier token (TTFT) et durée totale des requêtes
+  en streaming, pour chaque niveau de concurrence, et part des prompts
+  servie par le cache de préfixe simulé du serveur (--prompt-layout)
+- stages: durée moyenne de chaque étape (métriques du système RAG)
+
+Utilisation:
+    python benchmarks/bench_suite.py --output results/$(git rev-parse --short HEAD).json
+    python benchmarks/bench_suite.py --baseline results/abc1234.json
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from answer_cache import SemanticAnswerCache  # noqa: E402
+from chunking import iter_regulation_chunks  # noqa: E402
+from fakes import FakeOllamaServer, HashEmbedder  # noqa: E402
+from rag_system import RAGSystem  # noqa: E402
+
+
+WORDS = [
+    "продукция", "безопасность", "требования", "маркировка", "изготовитель", "соответствие",
+    "документация", "оценка", "упаковка", "транспортирование", "хранение", "эксплуатация",
+    "испытания", "сертификат", "декларация", "контроль", "надзор", "обращение", "рынок", "партия",
+]
+
+
+def synthetic_regulation(n_articles: int, n_points: int, seed: int = 0) -> str:
+    """Génère un règlement synthétique (articles numérotés, points numérotés)."""
+    rng = np.random.default_rng(seed)
+    lines = ["Технический регламент\n\n"]
+    for a in range(1, n_articles + 1):
+        lines.append(f"Статья {a}. {' '.join(rng.choice(WORDS, size=3))}\n\n")
+        for p in range(1, n_points + 1):
+            lines.append(f"{p}. {' '.join(rng.choice(WORDS, size=int(rng.integers(20, 80))))}.\n")
+        lines.append("\n")
+    return "".join(lines)
+
+
+def build_questions(n_questions: int, n_articles: int, seed: int = 1):
+    """Questions distinctes: mots du vocabulaire, une sur quatre citant un article."""
+    rng = np.random.default_rng(seed)
+    questions = []
+    for i in range(n_questions):
+        words = " ".join(rng.choice(WORDS, size=5))
+        if i % 4 == 0:
+            questions.append(f"Что говорится в статье {int(rng.integers(1, n_articles + 1))} про {words}? #{i}")
+        else:
+            questions.append(f"Какие {words}? #{i}")
+    return questions
+
+
+def percentiles_ms(samples):
+    """Percentiles p50/p95/p99 et moyenne d'une liste de durées (en ms)."""
+    values = np.array(samples) * 1000
+    return {
+        'p50_ms': float(np.percentile(values, 50)),
+        'p95_ms': float(np.percentile(values, 95)),
+        'p99_ms': float(np.percentile(values, 99)),
+        'mean_ms': float(values.mean()),
+    }
+
+
+def git_commit():
+    """Commit courant du dépôt (None hors d'un dépôt git)."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_parse(text, repeat):
+    """Mesure le débit du parsing (meilleure de `repeat` passes)."""
+    best = None
+    chunks = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        chunks = list(iter_regulation_chunks(io.StringIO(text)))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    size = len(text.encode('utf-8'))
+    return chunks, {
+        'chunks': len(chunks),
+        'seconds': best,
+        'chunks_per_s': len(chunks) / best,
+        'mb_per_s': size / best / 1e6,
+    }
+
+
+def make_rag(args, workdir, ollama_hosts):
+    """Construit un système RAG isolé (répertoires temporaires, encodeur à hachage)."""
+    rag = RAGSystem(
+        llm_model="fake:latest",
+        ollama_hosts=ollama_hosts,
+        chroma_db_path=str(Path(workdir) / "chroma_db"),
+        embedding_cache_dir=None,
+        vector_store_backend=args.backend,
+        numpy_store_path=str(Path(workdir) / "numpy_store"),
+        chunk_store_path=str(Path(workdir) / "chunk_store"),
+        preload=False,
+        warmup=False
+    )
+    rag.embedding_model = HashEmbedder(args.dim, args.embed_ms, args.embed_call_ms)
+    rag.micro_batch_enabled = not args.no_micro_batch
+    if args.prompt_layout:
+        rag.prompt_layout = args.prompt_layout
+    if not args.answer_cache:
+        rag.answer_cache = SemanticAnswerCache(max_entries=0)
+    return rag
+
+
+def bench_index(rag, chunks):
+    """Mesure la construction de l'index."""
+    start = time.perf_counter()
+    rag.index_chunks(chunks)
+    elapsed = time.perf_counter() - start
+    return {'chunks': len(chunks), 'seconds': elapsed, 'chunks_per_s': len(chunks) / elapsed}
+
+
+def bench_retrieval(rag, questions, n_results):
+    """Mesure la latence de retrieve_context, question par question."""
+    rag.retrieve_context(questions[0], n_results)  # Préchauffage
+    latencies = []
+    for question in questions[1:]:
+        start = time.perf_counter()
+        rag.retrieve_context(question, n_results)
+        latencies.append(time.perf_counter() - start)
+    return dict(percentiles_ms(latencies), queries=len(latencies))
+
+
+def bench_retrieval_concurrent(rag, questions, n_results, concurrency):
+    """Mesure le débit et la latence de retrieve_context depuis `concurrency` threads."""
+    calls = rag.embedding_model.calls
+    latencies = []
+
+    def one(question):
+        start = time.perf_counter()
+        rag.retrieve_context(question, n_results)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        list(executor.map(one, questions))
+    elapsed = time.perf_counter() - start
+    return dict(
+        percentiles_ms(latencies),
+        concurrency=concurrency,
+        queries=len(questions),
+        queries_per_s=len(questions) / elapsed,
+        encode_calls=rag.embedding_model.calls - calls,
+    )
+
+
+async def run_concurrent(rag, questions, n_results, concurrency):
+    """Envoie les questions en streaming avec au plus `concurrency` requêtes simultanées."""
+    semaphore = asyncio.Semaphore(concurrency)
+    ttfts, totals, errors = [], [], []
+
+    async def one(question):
+        async with semaphore:
+            start = time.perf_counter()
+            first = None
+            try:
+                async for event in rag.astream_events(question, n_results):
+                    if first is None and event['type'] == 'delta':
+                        first = time.perf_counter() - start
+            except Exception as e:
+                errors.append(repr(e))
+                return
+            ttfts.append(first if first is not None else time.perf_counter() - start)
+            totals.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(question) for question in questions))
+    elapsed = time.perf_counter() - start
+    return ttfts, totals, errors, elapsed
+
+
+def bench_e2e(rag, servers, questions, n_results, concurrency):
+    """Mesure TTFT et latence totale pour un niveau de concurrence."""
+    for server in servers:
+        server.stats['max_active'] = 0
+    prompt_chars = sum(server.stats['prompt_chars'] for server in servers)
+    cached_chars = sum(server.stats['cached_prompt_chars'] for server in servers)
+    ttfts, totals, errors, elapsed = asyncio.run(run_concurrent(rag, questions, n_results, concurrency))
+    prompt_chars = sum(server.stats['prompt_chars'] for server in servers) - prompt_chars
+    cached_chars = sum(server.stats['cached_prompt_chars'] for server in servers) - cached_chars
+    result = {
+        'concurrency': concurrency,
+        'requests': len(questions),
+        'errors': len(errors),
+        'requests_per_s': len(totals) / elapsed,
+        'llm_max_active': [server.stats['max_active'] for server in servers],
+        'prompt_cache_ratio': cached_chars / prompt_chars if prompt_chars else 0.0,
+    }
+    if errors:
+        result['first_error'] = errors[0]
+    if totals:
+        result['ttft'] = percentiles_ms(ttfts)
+        result['total'] = percentiles_ms(totals)
+    return result
+
+
+def summary(results):
+    """Indicateurs principaux d'un fichier de résultats (pour la comparaison)."""
+    metrics = {
+        'parse chunks/s': results['parse']['chunks_per_s'],
+        'index chunks/s': results['index']['chunks_per_s'],
+        'retrieval p50 (ms)': results['retrieval']['p50_ms'],
+        'retrieval p99 (ms)': results['retrieval']['p99_ms'],
+    }
+    for run in results.get('retrieval_concurrent', []):
+        metrics[f"c={run['concurrency']} retrieval q/s"] = run['queries_per_s']
+    for run in results.get('e2e', []):
+        if 'ttft' in run:
+            c = run['concurrency']
+            metrics[f"c={c} ttft p50 (ms)"] = run['ttft']['p50_ms']
+            metrics[f"c={c} ttft p99 (ms)"] = run['ttft']['p99_ms']
+            metrics[f"c={c} total p95 (ms)"] = run['total']['p95_ms']
+            metrics[f"c={c} req/s"] = run['requests_per_s']
+            metrics[f"c={c} cache KV (%)"] = run.get('prompt_cache_ratio', 0.0) * 100
+    return metrics
+
+
+def print_comparison(results, baseline):
+    """Affiche l'écart de chaque indicateur par rapport à un fichier de référence."""
+    current = summary(results)
+    reference = summary(baseline)
+    print(f"\n📊 Comparaison avec {baseline['meta'].get('commit')} (référence) → {results['meta'].get('commit')}")
+    print(f"{'indicateur':<24} {'référence':>12} {'actuel':>12} {'écart':>9}")
+    for name, value in current.items():
+        if name in reference and reference[name]:
+            change = (value - reference[name]) / reference[name] * 100
+            print(f"{name:<24} {reference[name]:>12.2f} {value:>12.2f} {change:>+8.1f}%")
+
+
+def main():
+    """Point d'entrée de la suite de benchmarks."""
+    parser = argparse.ArgumentParser(description="Suite de benchmarks hors ligne du système RAG")
+    parser.add_argument("--n-articles", type=int, default=300, help="Articles du règlement synthétique")
+    parser.add_argument("--n-points", type=int, default=10, help="Points par article")
+    parser.add_argument("--parse-repeat", type=int, default=3, help="Passes de parsing (meilleure retenue)")
+    parser.add_argument("--backend", default="numpy", help="Base vectorielle (numpy ou chroma)")
+    parser.add_argument("--dim", type=int, default=768, help="Dimension des embeddings")
+    parser.add_argument("--embed-ms", type=float, default=0.0, help="Coût simulé de l'encodage d'un texte (ms)")
+    parser.add_argument("--embed-call-ms", type=float, default=0.0,
+                        help="Coût simulé fixe d'un appel à l'encodeur (ms)")
+    parser.add_argument("--no-micro-batch", action="store_true",
+                        help="Désactiver le micro-batching de l'encodage et de la recherche")
+    parser.add_argument("--n-results", type=int, default=5, help="Chunks récupérés par question")
+    parser.add_argument("--n-queries", type=int, default=200, help="Questions pour la latence de recherche")
+    parser.add_argument("--n-requests", type=int, default=64, help="Requêtes par niveau de concurrence")
+    parser.add_argument("--concurrency", default="1,4,16", help="Niveaux de concurrence")
+    parser.add_argument("--llm-ttft-ms", type=float, default=50.0, help="Délai du LLM avant le premier token")
+    parser.add_argument("--llm-token-ms", type=float, default=5.0, help="Délai du LLM entre deux tokens")
+    parser.add_argument("--llm-tokens", type=int, default=64, help="Tokens par réponse")
+    parser.add_argument("--llm-parallel", type=int, default=4, help="Générations simultanées (OLLAMA_NUM_PARALLEL)")
+    parser.add_argument("--llm-prefill-ms-per-kchar", type=float, default=0.0,
+                        help="Coût du prefill hors préfixe en cache (ms pour 1000 caractères de prompt)")
+    parser.add_argument("--prompt-layout", default=None, help="Disposition du prompt (prefix ou legacy, défaut: PROMPT_LAYOUT)")
+    parser.add_argument("--llm-hosts", type=int, default=1, help="Serveurs Ollama simulés (pool LLM)")
+    parser.add_argument("--answer-cache", action="store_true", help="Activer le cache sémantique des réponses")
+    parser.add_argument("--output", default=None, help="Fichier JSON des résultats")
+    parser.add_argument("--baseline", default=None, help="Fichier JSON de référence à comparer")
+    args = parser.parse_args()
+
+    results = {
+        'meta': {
+            'commit': git_commit(),
+            'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'args': vars(args),
+        }
+    }
+
+    text = synthetic_regulation(args.n_articles, args.n_points)
+    chunks, results['parse'] = bench_parse(text, args.parse_repeat)
+    print(f"🔍 Parsing: {results['parse']['chunks']} chunks, {results['parse']['chunks_per_s']:.0f} chunks/s, "
+          f"{results['parse']['mb_per_s']:.1f} Mo/s")
+
+    with ExitStack() as stack:
+        servers = [
+            stack.enter_context(FakeOllamaServer(
+                args.llm_ttft_ms, args.llm_token_ms, args.llm_tokens, args.llm_parallel, args.llm_prefill_ms_per_kchar
+            ))
+            for _ in range(args.llm_hosts)
+        ]
+        workdir = stack.enter_context(tempfile.TemporaryDirectory())
+        rag = make_rag(args, workdir, [f"{server.url}={args.llm_parallel}" for server in servers])
+
+        results['index'] = bench_index(rag, chunks)
+        print(f"🔄 Indexation: {results['index']['seconds']:.2f}s ({results['index']['chunks_per_s']:.0f} chunks/s)")
+
+        questions = build_questions(args.n_queries, args.n_articles)
+        results['retrieval'] = bench_retrieval(rag, questions, args.n_results)
+        r = results['retrieval']
+        print(f"🔎 Recherche: p50 {r['p50_ms']:.2f} ms, p95 {r['p95_ms']:.2f} ms, p99 {r['p99_ms']:.2f} ms")
+
+        results['retrieval_concurrent'] = []
+        print(f"\n{'threads':>11} {'q/s':>8} {'p50':>8} {'p99':>8} {'encodages':>10}")
+        for level, concurrency in enumerate(int(c) for c in args.concurrency.split(",")):
+            batch = build_questions(args.n_requests, args.n_articles, seed=50 + level)
+            run = bench_retrieval_concurrent(rag, batch, args.n_results, concurrency)
+            results['retrieval_concurrent'].append(run)
+            print(f"{concurrency:>11} {run['queries_per_s']:>8.1f} {run['p50_ms']:>8.2f} {run['p99_ms']:>8.2f} "
+                  f"{run['encode_calls']:>10}")
+
+        results['e2e'] = []
+        try:
+            rag.llm
+        except ImportError as e:
+            print(f"⚠️  Bout en bout indisponible: {e}")
+            results['e2e_skipped'] = str(e)
+        else:
+            print(f"\n{'concurrence':>11} {'TTFT p50':>9} {'p95':>8} {'p99':>8} {'total p50':>10} "
+                  f"{'p95':>8} {'p99':>8} {'req/s':>7} {'erreurs':>8} {'cache KV':>9}")
+            for level, concurrency in enumerate(int(c) for c in args.concurrency.split(",")):
+                # Questions nouvelles à chaque niveau (pas de réponse déjà en cache)
+                batch = build_questions(args.n_requests, args.n_articles, seed=100 + level)
+                run = bench_e2e(rag, servers, batch, args.n_results, concurrency)
+                results['e2e'].append(run)
+                if 'ttft' in run:
+                    t, d = run['ttft'], run['total']
+                    print(f"{concurrency:>11} {t['p50_ms']:>9.1f} {t['p95_ms']:>8.1f} {t['p99_ms']:>8.1f} "
+                          f"{d['p50_ms']:>10.1f} {d['p95_ms']:>8.1f} {d['p99_ms']:>8.1f} "
+                          f"{run['requests_per_s']:>7.1f} {run['errors']:>8} {run['prompt_cache_ratio']:>8.0%}")
+                else:
+                    print(f"{concurrency:>11} ❌ {run['errors']} erreurs: {run.get('first_error')}")
+        results['llm_servers'] = [dict(server.stats) for server in servers]
+        results['stages'] = rag.metrics.stage_summary()
+
+    print(f"\n{'étape':<14} {'appels':>7} {'moyenne (ms)':>13}")
+    for stage, s in results['stages'].items():
+        print(f"{stage:<14} {s['count']:>7} {s['mean_ms']:>13.3f}")
+
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Résultats écrits dans {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            print_comparison(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark de latence des bases vectorielles (ChromaDB vs NumPy exacte).
+
+Utilisation:
+    python benchmarks/bench_vector_store.py --n-docs 3000 --n-queries 200
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from vector_store import create_vector_store  # noqa: E402
+
+
+def percentile_ms(samples, q):
+    """Retourne le percentile q d'une liste de durées (en ms)."""
+    return float(np.percentile(np.array(samples) * 1000, q))
+
+
+def bench_backend(backend, vectors, queries, n_results):
+    """
+    Mesure le temps d'indexation et la latence de requête d'un backend.
+
+    Args:
+        backend: "chroma" ou "numpy"
+        vectors: Embeddings des documents
+        queries: Embeddings des requêtes
+        n_results: Nombre de résultats par requête
+
+    Returns:
+        Dictionnaire de mesures
+    """
+    with tempfile.TemporaryDirectory() as path:
+        store = create_vector_store(backend, path, "bench_collection")
+
+        ids = [f"{i // 10}.{i % 10}" for i in range(len(vectors))]
+        metadatas = [{'article_num': str(i // 10), 'point_num': str(i % 10)} for i in range(len(vectors))]
+        documents = [f"document {i}" for i in range(len(vectors))]
+
+        start = time.perf_counter()
+        batch = 5000
+        for i in range(0, len(vectors), batch):
+            store.upsert(ids[i:i + batch], vectors[i:i + batch], documents[i:i + batch], metadatas[i:i + batch])
+        index_time = time.perf_counter() - start
+
+        # Préchauffage
+        store.query(queries[:1], n_results)
+
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            store.query(query[None, :], n_results)
+            latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        store.query(queries, n_results)
+        batch_time = time.perf_counter() - start
+
+    return {
+        'backend': backend,
+        'index_s': index_time,
+        'p50_ms': percentile_ms(latencies, 50),
+        'p95_ms': percentile_ms(latencies, 95),
+        'p99_ms': percentile_ms(latencies, 99),
+        'batch_per_query_ms': batch_time * 1000 / len(queries),
+    }
+
+
+def main():
+    """Point d'entrée du benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark des bases vectorielles")
+    parser.add_argument("--n-docs", type=int, default=3000, help="Nombre de documents")
+    parser.add_argument("--n-queries", type=int, default=200, help="Nombre de requêtes")
+    parser.add_argument("--dim", type=int, default=768, help="Dimension des embeddings")
+    parser.add_argument("--n-results", type=int, default=5, help="Résultats par requête")
+    parser.add_argument("--backends", default="numpy,chroma", help="Backends à comparer")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((args.n_docs, args.dim)).astype(np.float32)
+    queries = rng.standard_normal((args.n_queries, args.dim)).astype(np.float32)
+
+    print(f"📊 {args.n_docs} documents, {args.n_queries} requêtes, dim={args.dim}, k={args.n_results}\n")
+    print(f"{'backend':<8} {'index (s)':>10} {'p50 (ms)':>10} {'p95 (ms)':>10} {'p99 (ms)':>10} {'lot (ms/q)':>11}")
+
+    for backend in args.backends.split(","):
+        try:
+            r = bench_backend(backend, vectors, queries, args.n_results)
+        except ImportError as e:
+            print(f"{backend:<8} ⚠️  indisponible: {e}")
+            continue
+        print(
+            f"{r['backend']:<8} {r['index_s']:>10.2f} {r['p50_ms']:>10.3f} {r['p95_ms']:>10.3f} "
+            f"{r['p99_ms']:>10.3f} {r['batch_per_query_ms']:>11.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+"""
+Substituts locaux pour exécuter les benchmarks hors ligne.
+
+- HashEmbedder: encodeur déterministe (hachage des mots), sans modèle à télécharger
+- FakeOllamaServer: serveur HTTP imitant l'API de streaming d'Ollama
+  (/api/generate, /api/chat, /api/tags), avec délai avant le premier token,
+  débit de génération et nombre de générations parallèles configurables
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Sequence
+
+import numpy as np
+
+
+WORD_PATTERN = re.compile(r"\w+")
+
+ANSWER_WORDS = [
+    "Согласно", "статье", "регламента,", "продукция", "должна", "соответствовать",
+    "требованиям", "безопасности", "и", "сопровождаться", "документацией", "на",
+    "русском", "языке.", "Маркировка", "содержит", "сведения", "об", "изготовителе.",
+]
+
+
+class HashEmbedder:
+    """
+    Encodeur déterministe par hachage des mots (feature hashing).
+
+    Deux textes partageant des mots ont des vecteurs proches: la recherche
+    retrouve des chunks pertinents sans modèle ni réseau. Le coût simulé
+    occupe l'encodeur: comme un modèle sur CPU, deux appels ne se
+    chevauchent pas.
+    """
+
+    def __init__(self, dim: int = 768, cost_ms_per_text: float = 0.0, cost_ms_per_call: float = 0.0):
+        """
+        Args:
+            dim: Dimension des embeddings
+            cost_ms_per_text: Durée simulée de l'encodage d'un texte (ms)
+            cost_ms_per_call: Durée simulée fixe de chaque appel (ms), quelle que soit la taille du lot
+        """
+        self.dim = dim
+        self.cost_ms_per_text = cost_ms_per_text
+        self.cost_ms_per_call = cost_ms_per_call
+        self.calls = 0
+        self._busy = threading.Lock()
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in WORD_PATTERN.findall(text.lower()):
+            digest = int.from_bytes(hashlib.blake2b(word.encode('utf-8'), digest_size=8).digest(), 'little')
+            vector[digest % self.dim] += 1.0 if (digest >> 63) else -1.0
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            vector[0] = 1.0
+            return vector
+        return vector / norm
+
+    def encode(self, texts: Sequence[str], batch_size: int = 32, show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        """
+        Encode des textes (même interface que SentenceTransformer.encode).
+
+        Returns:
+            Embeddings normalisés float32 (len(texts) x dim)
+        """
+        if isinstance(texts, str):
+            texts = [texts]
+        cost = self.cost_ms_per_call + len(texts) * self.cost_ms_per_text
+        with self._busy:
+            self.calls += 1
+            if cost > 0:
+                time.sleep(cost / 1000)
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.stack([self._embed(text) for text in texts])
+
+
+class FakeOllamaServer:
+    """
+    Serveur imitant l'API HTTP d'Ollama, exécuté dans un thread.
+
+    Chaque génération attend ttft_ms avant le premier token puis émet un
+    token toutes les token_ms (réponses NDJSON en transfert chunked, comme
+    Ollama). Au plus max_parallel générations s'exécutent à la fois, les
+    autres attendent (OLLAMA_NUM_PARALLEL).
+
+    Comme llama.cpp, chaque slot garde le cache KV de son dernier prompt:
+    une génération prend le slot libre partageant le plus long préfixe avec
+    son prompt, et seule la suite du prompt coûte prefill_ms_per_kchar.
+    """
+
+    def __init__(
+        self,
+        ttft_ms: float = 50.0,
+        token_ms: float = 5.0,
+        n_tokens: int = 64,
+        max_parallel: int = 4,
+        prefill_ms_per_kchar: float = 0.0,
+        host: str = "127.0.0.1",
+        port: int = 0
+    ):
+        """
+        Args:
+            ttft_ms: Délai avant le premier token (évaluation du prompt)
+            token_ms: Délai entre deux tokens
+            n_tokens: Nombre de tokens d'une réponse (sauf num_predict)
+            max_parallel: Nombre de générations simultanées
+            prefill_ms_per_kchar: Coût de l'évaluation du prompt hors préfixe en cache (ms pour 1000 caractères)
+            host: Adresse d'écoute
+            port: Port d'écoute (0 pour un port libre)
+        """
+        self.ttft_ms = ttft_ms
+        self.token_ms = token_ms
+        self.n_tokens = n_tokens
+        self.prefill_ms_per_kchar = prefill_ms_per_kchar
+        self._slots = threading.Semaphore(max_parallel)
+        self._slot_prompts = [""] * max_parallel
+        self._slot_busy = [False] * max_parallel
+        self._stats_lock = threading.Lock()
+        self.stats = {'requests': 0, 'active': 0, 'max_active': 0, 'prompt_chars': 0, 'cached_prompt_chars': 0}
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        """URL du serveur (à passer comme ollama_host)."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeOllamaServer":
+        """Démarre le serveur en arrière-plan."""
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Arrête le serveur."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeOllamaServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.stop()
+
+    def generate(self, prompt: str, options: Dict):
+        """
+        Produit les tokens d'une réponse au rythme configuré.
+
+        Yields:
+            Tokens de la réponse
+        """
+        n_tokens = options.get('num_predict') or self.n_tokens
+        if n_tokens < 0:
+            n_tokens = self.n_tokens
+
+        with self._stats_lock:
+            self.stats['requests'] += 1
+            self.stats['prompt_chars'] += len(prompt)
+
+        with self._slots:
+            with self._stats_lock:
+                self.stats['active'] += 1
+                self.stats['max_active'] = max(self.stats['max_active'], self.stats['active'])
+                slot, cached = max(
+                    ((i, len(os.path.commonprefix([cached_prompt, prompt])))
+                     for i, cached_prompt in enumerate(self._slot_prompts) if not self._slot_busy[i]),
+                    key=lambda item: item[1]
+                )
+                self._slot_busy[slot] = True
+                self._slot_prompts[slot] = prompt
+                self.stats['cached_prompt_chars'] += cached
+            try:
+                time.sleep((self.ttft_ms + (len(prompt) - cached) * self.prefill_ms_per_kchar / 1000) / 1000)
+                for i in range(n_tokens):
+                    if i:
+                        time.sleep(self.token_ms / 1000)
+                    yield ANSWER_WORDS[i % len(ANSWER_WORDS)] + " "
+            finally:
+                with self._stats_lock:
+                    self.stats['active'] -= 1
+                    self._slot_busy[slot] = False
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, payload: Dict, status: int = 200) -> None:
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _write_chunk(self, payload: Dict) -> None:
+                line = json.dumps(payload, ensure_ascii=False).encode('utf-8') + b"\n"
+                self.wfile.write(f"{len(line):x}\r\n".encode('ascii') + line + b"\r\n")
+                self.wfile.flush()
+
+            def do_HEAD(self):
+                self.send_response(200)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def do_GET(self):
+                if self.path == "/api/tags":
+                    self._send_json({'models': [{'name': "fake:latest", 'model': "fake:latest"}]})
+                elif self.path == "/api/version":
+                    self._send_json({'version': "0.0.0-fake"})
+                else:
+                    body = b"Ollama is running"
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                if self.path not in ("/api/generate", "/api/chat"):
+                    self._send_json({'error': f"unknown endpoint {self.path}"}, status=404)
+                    return
+
+                chat = self.path == "/api/chat"
+                if chat:
+                    prompt = "\n".join(m.get('content', "") for m in request.get('messages', []))
+                else:
+                    prompt = request.get('prompt', "")
+                model = request.get('model', "fake:latest")
+                start = time.perf_counter_ns()
+
+                def message(token: str, done: bool) -> Dict:
+                    payload = {
+                        'model': model,
+                        'created_at': datetime.now(timezone.utc).isoformat(),
+                        'done': done,
+                    }
+                    if chat:
+                        payload['message'] = {'role': "assistant", 'content': token}
+                    else:
+                        payload['response'] = token
+                    return payload
+
+                tokens = server.generate(prompt, request.get('options') or {})
+                if not request.get('stream', True):
+                    final = message("".join(tokens), True)
+                    final.update(done_reason="stop", total_duration=time.perf_counter_ns() - start)
+                    self._send_json(final)
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                count = 0
+                for token in tokens:
+                    self._write_chunk(message(token, False))
+                    count += 1
+                final = message("", True)
+                final.update(
+                    done_reason="stop",
+                    total_duration=time.perf_counter_ns() - start,
+                    prompt_eval_count=len(prompt) // 4,
+                    eval_count=count
+                )
+                self._write_chunk(final)
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+
+        return Handler
@@ -0,0 +1,146 @@
+"""
+Contrôle d'admission des requêtes du service HTTP.
+Au plus max_concurrency requêtes sont traitées à la fois; au-delà, au plus
+max_queue requêtes attendent leur tour (dans l'ordre d'arrivée) pendant
+queue_timeout secondes. Une requête refusée l'est immédiatement:
+- 429 si la file d'attente est pleine;
+- 503 si l'attente a dépassé queue_timeout.
+"""
+
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, Optional
+
+from metrics import RAGMetrics
+
+
+class AdmissionRejected(Exception):
+    """Requête refusée par le contrôle d'admission."""
+
+    def __init__(self, status_code: int, reason: str, retry_after: int):
+        """
+        Args:
+            status_code: Code HTTP à renvoyer (429 ou 503)
+            reason: Motif du refus ('queue_full' ou 'queue_timeout')
+            retry_after: Délai conseillé avant un nouvel essai (secondes)
+        """
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """File d'admission bornée (à utiliser depuis une seule boucle asyncio)."""
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        max_queue: int,
+        queue_timeout: float,
+        metrics: Optional[RAGMetrics] = None
+    ):
+        """
+        Args:
+            max_concurrency: Nombre maximal de requêtes traitées simultanément
+            max_queue: Nombre maximal de requêtes en attente
+            queue_timeout: Attente maximale d'une requête (secondes)
+            metrics: Métriques où publier l'état de la file (optionnel)
+        """
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.admitted = 0
+        self.rejected: Dict[str, int] = {'queue_full': 0, 'queue_timeout': 0}
+        self._waiters: Deque[asyncio.Future] = deque()
+
+        self._gauges = None
+        if metrics is not None:
+            registry = metrics.registry
+            self._gauges = (
+                registry.gauge("rag_admission_active", "Requêtes admises en cours de traitement"),
+                registry.gauge("rag_admission_waiting", "Requêtes en attente d'admission"),
+                registry.counter("rag_admission_rejected_total", "Requêtes refusées, par motif", ("reason",)),
+            )
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def _publish(self) -> None:
+        if self._gauges is not None:
+            self._gauges[0].set(self.active)
+            self._gauges[1].set(self.waiting)
+
+    def _reject(self, status_code: int, reason: str) -> AdmissionRejected:
+        self.rejected[reason] += 1
+        if self._gauges is not None:
+            self._gauges[2].inc(reason=reason)
+        return AdmissionRejected(status_code, reason, retry_after=max(1, round(self.queue_timeout)))
+
+    async def acquire(self) -> None:
+        """
+        Attend une place de traitement.
+
+        Raises:
+            AdmissionRejected: File pleine (429) ou attente trop longue (503)
+        """
+        if self.active < self.max_concurrency and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            self._publish()
+            return
+
+        if self.waiting >= self.max_queue:
+            raise self._reject(429, 'queue_full')
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        self._publish()
+        try:
+            # shield: à l'expiration, la place a pu être attribuée entre-temps
+            await asyncio.wait_for(asyncio.shield(future), self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                self.release()
+            else:
+                future.cancel()
+                self._waiters.remove(future)
+                self._publish()
+            if isinstance(e, asyncio.TimeoutError):
+                raise self._reject(503, 'queue_timeout') from None
+            raise
+        self.admitted += 1
+
+    def release(self) -> None:
+        """Libère une place (transmise directement à la plus ancienne requête en attente)."""
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+                self._publish()
+                return
+        self.active -= 1
+        self._publish()
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Context manager: acquire puis release."""
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict:
+        """État de la file (pour /health)."""
+        return {
+            'active': self.active,
+            'waiting': self.waiting,
+            'max_concurrency': self.max_concurrency,
+            'max_queue': self.max_queue,
+            'admitted': self.admitted,
+            'rejected': dict(self.rejected),
+        }
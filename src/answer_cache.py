@@ -0,0 +1,187 @@
+"""
+Cache sémantique des réponses du LLM.
+Une réponse est réutilisée lorsqu'une nouvelle question est identique
+(texte normalisé) ou a un embedding suffisamment proche (similarité cosinus)
+d'une question déjà traitée.
+"""
+
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from embedding_cache import normalize_text
+
+
+class SemanticAnswerCache:
+    """
+    Cache de réponses recherché par similarité cosinus des questions.
+
+    Les embeddings normalisés des questions sont rangés dans une matrice
+    pré-allouée: une recherche est un seul produit matrice-vecteur.
+    """
+
+    def __init__(
+        self,
+        similarity_threshold: float = 0.95,
+        ttl_seconds: float = 3600,
+        max_entries: int = 1000
+    ):
+        """
+        Initialise le cache.
+
+        Args:
+            similarity_threshold: Similarité cosinus minimale pour un hit
+            ttl_seconds: Durée de validité d'une réponse
+            max_entries: Nombre maximal de réponses conservées
+        """
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._vectors: Optional[np.ndarray] = None
+        self._created = np.full(max_entries, -np.inf)
+        self._n_results = np.zeros(max_entries, dtype=np.int64)
+        self._scopes = np.full(max_entries, "", dtype=object)
+        self._entries: List[Optional[Dict]] = [None] * max_entries
+        self._semantic = np.zeros(max_entries, dtype=bool)
+        self._exact: Dict[Tuple[str, int, str], int] = {}
+
+    def __len__(self) -> int:
+        return sum(entry is not None for entry in self._entries)
+
+    @staticmethod
+    def _normalize(embedding: np.ndarray) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def lookup(self, query_embedding: np.ndarray, n_results: int, scope: str = "") -> Optional[Dict]:
+        """
+        Recherche une réponse pour une question similaire.
+
+        Args:
+            query_embedding: Embedding de la question
+            n_results: Nombre de chunks utilisés pour la réponse
+            scope: Périmètre de la recherche (documents autorisés, "" pour tous)
+
+        Returns:
+            Entrée {'question', 'answer', 'documents', 'metadatas', 'similarity'} ou None
+        """
+        with self._lock:
+            if self._vectors is None or self.max_entries <= 0:
+                self.misses += 1
+                return None
+
+            query = self._normalize(query_embedding)
+            similarities = self._vectors @ query
+
+            valid = (
+                self._semantic
+                & (self._created > time.time() - self.ttl_seconds)
+                & (self._n_results == n_results)
+                & (self._scopes == scope)
+                & (similarities >= self.similarity_threshold)
+            )
+            if not valid.any():
+                self.misses += 1
+                return None
+
+            best = int(np.argmax(np.where(valid, similarities, -np.inf)))
+            self.hits += 1
+            return dict(self._entries[best], similarity=float(similarities[best]))
+
+    def lookup_exact(self, question: str, n_results: int, scope: str = "") -> Optional[Dict]:
+        """
+        Recherche une réponse pour la même question (texte normalisé), sans embedding.
+
+        Args:
+            question: Question de l'utilisateur
+            n_results: Nombre de chunks utilisés pour la réponse
+            scope: Périmètre de la recherche (documents autorisés, "" pour tous)
+
+        Returns:
+            Entrée en cache ou None
+        """
+        with self._lock:
+            slot = self._exact.get((normalize_text(question), n_results, scope))
+            if slot is None or self._created[slot] <= time.time() - self.ttl_seconds:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return dict(self._entries[slot], similarity=1.0)
+
+    def store(
+        self,
+        query_embedding: Optional[np.ndarray],
+        n_results: int,
+        question: str,
+        answer: str,
+        documents: List[str],
+        metadatas: List[Dict],
+        scope: str = ""
+    ) -> None:
+        """
+        Enregistre une réponse générée.
+
+        Args:
+            query_embedding: Embedding de la question (None pour n'autoriser
+                que les correspondances exactes)
+            n_results: Nombre de chunks utilisés pour la réponse
+            question: Question d'origine
+            answer: Réponse du LLM
+            documents: Chunks sources
+            metadatas: Métadonnées des chunks sources
+            scope: Périmètre de la recherche (documents autorisés, "" pour tous)
+        """
+        if self.max_entries <= 0:
+            return
+
+        vector = None if query_embedding is None else self._normalize(query_embedding)
+        with self._lock:
+            if vector is not None and (self._vectors is None or self._vectors.shape[1] != vector.shape[0]):
+                self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+                self._created[:] = -np.inf
+                self._semantic[:] = False
+                self._entries = [None] * self.max_entries
+                self._exact = {}
+
+            # Remplacer l'entrée la plus ancienne (ou expirée, ou vide)
+            slot = int(np.argmin(self._created))
+            previous = self._entries[slot]
+            if previous is not None:
+                previous_key = (normalize_text(previous['question']), int(self._n_results[slot]), self._scopes[slot])
+                if self._exact.get(previous_key) == slot:
+                    del self._exact[previous_key]
+
+            if vector is not None:
+                self._vectors[slot] = vector
+            self._semantic[slot] = vector is not None
+            self._created[slot] = time.time()
+            self._n_results[slot] = n_results
+            self._scopes[slot] = scope
+            self._exact[(normalize_text(question), n_results, scope)] = slot
+            self._entries[slot] = {
+                'question': question,
+                'answer': answer,
+                'documents': list(documents),
+                'metadatas': list(metadatas),
+            }
+
+    def clear(self) -> None:
+        """Invalide toutes les réponses (par exemple après une réindexation)."""
+        with self._lock:
+            self._created[:] = -np.inf
+            self._semantic[:] = False
+            self._entries = [None] * self.max_entries
+            self._exact = {}
+            if self._vectors is not None:
+                self._vectors[:] = 0.0
+
+    def stats(self) -> Dict[str, int]:
+        """Retourne les statistiques du cache."""
+        return {'size': len(self), 'hits': self.hits, 'misses': self.misses}
@@ -4,8 +4,11 @@ Application Gradio pour l'interface utilisateur du système RAG.
 
 import gradio as gr
 import os
+import threading
 from pathlib import Path
 from rag_system import RAGSystem
+from chunking import iter_regulation_file
+from config import GRADIO_CONCURRENCY_LIMIT, METRICS_ENABLED
 
 
 class RAGGradioApp:
@@ -20,27 +23,62 @@ class RAGGradioApp:
         """
         print("🚀 Démarrage de l'application RAG...")
         
-        # Initialiser le système RAG
+        # Initialiser le système RAG (les composants se chargent en arrière-plan)
         self.rag = RAGSystem(
             embedding_model='multi-qa-mpnet-base-dot-v1',
             llm_model='llama3.2:latest',
             chroma_db_path='./data/chroma_db'
         )
         
-        # Charger et indexer le règlement si fourni
+        # Charger et indexer le règlement en arrière-plan: l'interface
+        # démarre sans attendre et /health indique quand le service est prêt
+        self.index_status = 'ready'
         if regulation_file and os.path.exists(regulation_file):
-            print(f"📖 Chargement du règlement: {regulation_file}")
-            chunks = self.rag.load_regulation(regulation_file)
-            self.rag.index_chunks(chunks)
+            self.index_status = 'loading'
+            threading.Thread(
+                target=self._index_regulation,
+                args=(regulation_file,),
+                name="rag-index",
+                daemon=True
+            ).start()
         else:
             print("⚠️  Aucun fichier de règlement fourni. Utilisation de la collection existante.")
     
-    def rag_interface(self, question: str):
+    def _index_regulation(self, regulation_file: str) -> None:
         """
-        Interface Gradio avec streaming.
+        Charge et indexe le règlement (exécuté dans un thread).
+        
+        Args:
+            regulation_file: Chemin vers le fichier du règlement
+        """
+        try:
+            print(f"📖 Chargement du règlement: {regulation_file}")
+            self.rag.index_chunks(iter_regulation_file(regulation_file))
+            self.index_status = 'ready'
+        except Exception as e:
+            print(f"❌ Erreur lors de l'indexation: {e}")
+            self.index_status = f"error: {e}"
+    
+    def health(self) -> dict:
+        """
+        Retourne l'état de préparation de l'application.
+        
+        Returns:
+            Dictionnaire {'ready': bool, 'components': {nom: état}}
+        """
+        status = self.rag.readiness()
+        status['components']['index'] = self.index_status
+        status['ready'] = status['ready'] and self.index_status == 'ready'
+        return status
+    
+    async def rag_interface(self, question: str, documents: str = ""):
+        """
+        Interface Gradio avec streaming asynchrone.
         
         Args:
             question: Question de l'utilisateur
+            documents: Identifiants des règlements où chercher, séparés par
+                des virgules (vide pour tout le corpus)
             
         Yields:
             Réponses progressives
@@ -49,9 +87,16 @@ class RAGGradioApp:
             yield "Veuillez entrer une question."
             return
         
-        # Utiliser le streaming pour une meilleure UX
-        for response in self.rag.query_streaming(question, n_results=5):
-            yield response
+        # Streaming asynchrone par deltas regroupés en trames:
+        # aucun thread n'est bloqué et une trame regroupe plusieurs tokens
+        response = f"**Question:** {question}\n\n**Réponse:** "
+        doc_ids = [doc_id.strip() for doc_id in documents.split(",") if doc_id.strip()] or None
+        async for event in self.rag.astream_events(question, n_results=5, doc_ids=doc_ids):
+            if event['type'] == 'delta':
+                response += event['text']
+                yield response
+            else:
+                yield response + "\n\n" + event['markdown']
     
     def create_interface(self):
         """
@@ -62,11 +107,17 @@ class RAGGradioApp:
         """
         demo = gr.Interface(
             fn=self.rag_interface,
-            inputs=gr.Textbox(
-                label="Posez une question sur le règlement technique",
-                placeholder="Что говорится о безопасности продукции?",
-                lines=3,
-            ),
+            inputs=[
+                gr.Textbox(
+                    label="Posez une question sur le règlement technique",
+                    placeholder="Что говорится о безопасности продукции?",
+                    lines=3,
+                ),
+                gr.Textbox(
+                    label="Règlements (optionnel)",
+                    placeholder="Identifiants séparés par des virgules, vide pour tout le corpus",
+                ),
+            ],
             outputs=gr.Markdown(label="Réponse"),
             title="🤖 Système RAG - Règlement Technique",
             description="""
@@ -79,10 +130,10 @@ class RAGGradioApp:
             - ✅ Support multilingue (Français/Russe)
             """,
             examples=[
-                "Что говорится в статье 5 о требованиях безопасности?",
-                "Какие документы необходимы для подтверждения соответствия?",
-                "Quelles sont les exigences de sécurité pour les produits?",
-                "Как осуществляется маркировка продукции?",
+                ["Что говорится в статье 5 о требованиях безопасности?", ""],
+                ["Какие документы необходимы для подтверждения соответствия?", ""],
+                ["Quelles sont les exigences de sécurité pour les produits?", ""],
+                ["Как осуществляется маркировка продукции?", ""],
             ],
             allow_flagging="never",
             theme=gr.themes.Soft(),
@@ -103,11 +154,26 @@ class RAGGradioApp:
         
         print(f"\n🌐 Lancement de l'application sur http://{server_name}:{server_port}")
         
-        demo.queue().launch(
-            share=share,
-            server_name=server_name,
-            server_port=server_port
-        )
+        # Les requêtes étant asynchrones, plusieurs sessions partagent la boucle d'événements
+        demo.queue(default_concurrency_limit=GRADIO_CONCURRENCY_LIMIT)
+        
+        if share:
+            # Le lien public nécessite le serveur intégré de Gradio (sans /health ni /metrics)
+            demo.launch(share=share, server_name=server_name, server_port=server_port)
+            return
+        
+        # Servir Gradio derrière l'API HTTP (service.py), dans le même processus:
+        # un seul RAGSystem ouvre la base, le cache d'embeddings et l'index des métadonnées
+        import uvicorn
+        from service import create_app
+        
+        app = create_app(self.rag, readiness=self.health)
+        app = gr.mount_gradio_app(app, demo, path="/")
+        print(f"🔌 API HTTP: http://{server_name}:{server_port}/v1/query (documentation: /docs)")
+        print(f"🩺 État du service: http://{server_name}:{server_port}/health")
+        if METRICS_ENABLED:
+            print(f"📈 Métriques Prometheus: http://{server_name}:{server_port}/metrics")
+        uvicorn.run(app, host=server_name, port=server_port)
 
 
 def main():
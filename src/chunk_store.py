@@ -0,0 +1,272 @@
+"""
+Stockage compact des chunks avec accès direct par ID.
+Les chunks sont écrits en JSONL (un objet JSON par ligne, les retours à la
+ligne du texte étant échappés) avec un index trié (ID, offset, longueur)
+mappé en mémoire: lecture d'un chunk par recherche dichotomique, sans
+charger le fichier, et itération en streaming.
+
+Chaque écriture produit une nouvelle version (chunks.<version>.jsonl et
+index.<version>.npy), désignée ensuite par manifest.json: un lecteur ne
+peut pas associer l'index d'une version aux enregistrements d'une autre.
+
+Conversion depuis l'ancien format texte:
+    python chunk_store.py data/chunks.txt data/chunk_store
+"""
+
+import json
+import mmap
+import os
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from chunking import compute_chunk_uid, iter_chunks_from_txt
+
+
+MANIFEST_FILE = "manifest.json"
+# Ancien format, sans version
+RECORDS_FILE = "chunks.jsonl"
+INDEX_FILE = "index.npy"
+
+
+def _read_version(path: Path) -> Optional[int]:
+    """Retourne la version désignée par le manifeste (0: ancien format, None: absent)."""
+    if (path / MANIFEST_FILE).exists():
+        with open(path / MANIFEST_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)['version']
+    if (path / INDEX_FILE).exists() and (path / RECORDS_FILE).exists():
+        return 0
+    return None
+
+
+def _version_files(path: Path, version: int) -> Tuple[Path, Path]:
+    """Retourne les fichiers (enregistrements, index) d'une version."""
+    if version == 0:
+        return path / RECORDS_FILE, path / INDEX_FILE
+    return path / f"chunks.{version}.jsonl", path / f"index.{version}.npy"
+
+
+class ChunkStoreWriter:
+    """
+    Écrit un chunk store en streaming.
+
+    Les fichiers sont écrits sous une nouvelle version, puis le manifeste
+    est remplacé à la fermeture: un lecteur ouvert sur l'ancienne version
+    n'est pas affecté, et une écriture interrompue la laisse intacte.
+    """
+
+    def __init__(self, path: str):
+        """
+        Ouvre un chunk store en écriture (son contenu sera remplacé).
+
+        Args:
+            path: Répertoire du chunk store
+        """
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._version = (_read_version(self.path) or 0) + 1
+        self._records_file, self._index_file = _version_files(self.path, self._version)
+        self._file = open(self._records_file, 'wb')
+        self._keys: List[bytes] = []
+        self._offsets: List[int] = []
+        self._lengths: List[int] = []
+        self._offset = 0
+
+    def add(self, chunk: Dict, uid: Optional[str] = None) -> str:
+        """
+        Ajoute un chunk.
+
+        Args:
+            chunk: Chunk avec métadonnées
+            uid: ID du chunk (par défaut compute_chunk_uid)
+
+        Returns:
+            ID du chunk
+        """
+        uid = uid or compute_chunk_uid(chunk)
+        record = json.dumps(chunk, ensure_ascii=False).encode('utf-8') + b"\n"
+        self._file.write(record)
+        self._keys.append(uid.encode('utf-8'))
+        self._offsets.append(self._offset)
+        self._lengths.append(len(record) - 1)
+        self._offset += len(record)
+        return uid
+
+    def close(self) -> None:
+        """Écrit l'index trié et publie le chunk store."""
+        self._file.close()
+
+        width = max((len(key) for key in self._keys), default=1)
+        index = np.zeros(len(self._keys), dtype=[('key', f'S{width}'), ('offset', '<i8'), ('length', '<i8')])
+        index['key'] = self._keys
+        index['offset'] = self._offsets
+        index['length'] = self._lengths
+        index.sort(order='key', kind='stable')
+
+        np.save(self._index_file, index)
+
+        tmp_manifest = self.path / "manifest.tmp.json"
+        with open(tmp_manifest, 'w', encoding='utf-8') as f:
+            json.dump({'version': self._version, 'count': len(index)}, f)
+        tmp_manifest.replace(self.path / MANIFEST_FILE)
+        self._remove_stale_files()
+
+    def _remove_stale_files(self) -> None:
+        """Supprime les fichiers des versions précédentes."""
+        keep = {self._records_file.name, self._index_file.name}
+        for file in self.path.iterdir():
+            if file.name.startswith(("chunks.", "index.")) and file.name not in keep:
+                try:
+                    file.unlink(missing_ok=True)
+                except OSError:
+                    pass  # Encore mappé (Windows): supprimé à la prochaine écriture
+
+    def __enter__(self) -> "ChunkStoreWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+            self._records_file.unlink(missing_ok=True)
+
+
+class ChunkStore:
+    """Lecture d'un chunk store: accès par ID (mmap) et itération en streaming."""
+
+    def __init__(self, path: str):
+        """
+        Ouvre un chunk store.
+
+        Args:
+            path: Répertoire du chunk store
+        """
+        self.path = Path(path)
+        version = _read_version(self.path)
+        if version is None:
+            raise FileNotFoundError(f"Chunk store introuvable: {self.path}")
+        records_file, index_file = _version_files(self.path, version)
+        # Les deux fichiers restent lisibles (mappés) même si une écriture les remplace
+        self._index = np.load(index_file, mmap_mode='r')
+        self._records = None
+        if os.path.getsize(records_file) > 0:
+            with open(records_file, 'rb') as f:
+                self._records = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        """Indique si un chunk store existe dans le répertoire."""
+        return _read_version(Path(path)) is not None
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, uid: str) -> bool:
+        return self._position(uid) is not None
+
+    def _position(self, uid: str) -> Optional[int]:
+        """Retourne la position d'un ID dans l'index (recherche dichotomique)."""
+        key = uid.encode('utf-8')
+        keys = self._index['key']
+        position = int(np.searchsorted(keys, key))
+        if position < len(keys) and keys[position] == key:
+            return position
+        return None
+
+    def get(self, uid: str) -> Optional[Dict]:
+        """
+        Lit un chunk par ID.
+
+        Args:
+            uid: ID du chunk
+
+        Returns:
+            Chunk, ou None s'il est absent
+        """
+        position = self._position(uid)
+        if position is None:
+            return None
+        offset = int(self._index['offset'][position])
+        length = int(self._index['length'][position])
+        return json.loads(self._records[offset:offset + length])
+
+    def get_many(self, uids: Sequence[str]) -> List[Optional[Dict]]:
+        """
+        Lit plusieurs chunks par ID.
+
+        Args:
+            uids: IDs des chunks
+
+        Returns:
+            Chunks (None pour les IDs absents), dans l'ordre des IDs
+        """
+        return [self.get(uid) for uid in uids]
+
+    def ids(self) -> List[str]:
+        """Retourne les IDs de tous les chunks (ordre trié)."""
+        return [key.decode('utf-8') for key in self._index['key']]
+
+    def __iter__(self) -> Iterator[Dict]:
+        """Parcourt les chunks dans l'ordre d'écriture, ligne par ligne."""
+        records = self._records
+        if records is None:
+            return
+        start = 0
+        while start < len(records):
+            end = records.find(b"\n", start)
+            yield json.loads(records[start:end])
+            start = end + 1
+
+    def close(self) -> None:
+        """Libère le mapping mémoire."""
+        if self._records is not None:
+            self._records.close()
+            self._records = None
+
+
+def write_chunk_store(chunks: Iterable[Dict], path: str) -> int:
+    """
+    Écrit des chunks dans un chunk store.
+
+    Args:
+        chunks: Chunks (liste ou itérable)
+        path: Répertoire du chunk store
+
+    Returns:
+        Nombre de chunks écrits
+    """
+    count = 0
+    with ChunkStoreWriter(path) as writer:
+        for chunk in chunks:
+            writer.add(chunk)
+            count += 1
+    return count
+
+
+def convert_txt_to_store(txt_file: str, path: str) -> int:
+    """
+    Convertit un fichier de chunks texte (save_chunks_to_txt) en chunk store.
+
+    Args:
+        txt_file: Fichier de chunks au format texte
+        path: Répertoire du chunk store
+
+    Returns:
+        Nombre de chunks convertis
+    """
+    count = write_chunk_store(iter_chunks_from_txt(txt_file), path)
+    print(f"✅ {count} chunks convertis de {txt_file} vers {path}")
+    return count
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Conversion de chunks.txt en chunk store")
+    parser.add_argument("txt_file", help="Fichier de chunks au format texte")
+    parser.add_argument("store_path", help="Répertoire du chunk store")
+    args = parser.parse_args()
+
+    convert_txt_to_store(args.txt_file, args.store_path)
@@ -3,9 +3,10 @@ Module de chunking pour parser le règlement technique en chunks structurés.
 Basé sur la méthode du notebook Локальные_модели_для_формирования_эмбеддингов_и_векторные_БД.
 """
 
+import io
 import re
-import gdown
-from typing import List, Dict
+import hashlib
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO
 
 
 def download_regulation(file_id: str, output_filename: str = 'regulation.txt') -> None:
@@ -16,11 +17,90 @@ def download_regulation(file_id: str, output_filename: str = 'regulation.txt') -
         file_id: ID du fichier Google Drive
         output_filename: Nom du fichier de sortie
     """
+    import gdown
+    
     url = f"https://drive.google.com/uc?id={file_id}"
     gdown.download(url, output_filename, quiet=False)
     print(f"Fichier téléchargé: {output_filename}")
 
 
+ARTICLE_PATTERN = re.compile(r"Статья (\d+)\. (.+?)(?=\n|$)")
+POINT_PATTERN = re.compile(r"^(\d+)\.\s+(.+?)(?=^\d+\.\s+|\Z)", re.MULTILINE | re.DOTALL)
+
+
+def _article_chunks(article_num: str, article_title: str, article_text: str) -> Iterator[Dict]:
+    """
+    Découpe le texte d'un article en chunks par points.
+    
+    Args:
+        article_num: Numéro de l'article
+        article_title: Titre de l'article
+        article_text: Texte de l'article (après le titre)
+        
+    Yields:
+        Chunks de l'article
+    """
+    for pt, point_text in POINT_PATTERN.findall(article_text.strip()):
+        yield {
+            'id': f"{article_num}.{pt}",
+            'article_num': article_num,
+            'article_title': article_title,
+            'point_num': pt,
+            'text': point_text.strip()
+        }
+
+
+def iter_regulation_chunks(lines: Iterable[str]) -> Iterator[Dict]:
+    """
+    Parse le règlement ligne par ligne et produit les chunks au fil de l'eau.
+    
+    Seul l'article en cours est conservé en mémoire: ses chunks sont produits
+    dès que l'article suivant commence. Le découpage est identique à celui de
+    parse_regulation_to_chunks.
+    
+    Args:
+        lines: Lignes du règlement (avec leurs fins de ligne), par exemple un
+            fichier ouvert en lecture
+        
+    Yields:
+        Chunks avec métadonnées (id, article_num, article_title, point_num, text)
+    """
+    article = None  # (numéro, titre)
+    body: List[str] = []
+    
+    for line in lines:
+        # Un titre d'article occupe la fin de sa ligne: au plus un par ligne
+        match = ARTICLE_PATTERN.search(line)
+        if match is None:
+            if article is not None:
+                body.append(line)
+            continue
+        
+        if article is not None:
+            body.append(line[:match.start()])
+            yield from _article_chunks(article[0], article[1], "".join(body))
+        
+        article = (match.group(1), match.group(2).strip())
+        body = [line[match.end():]]
+    
+    if article is not None:
+        yield from _article_chunks(article[0], article[1], "".join(body))
+
+
+def iter_regulation_file(regulation_file: str) -> Iterator[Dict]:
+    """
+    Lit un fichier de règlement de façon incrémentale et produit ses chunks.
+    
+    Args:
+        regulation_file: Chemin vers le fichier du règlement
+        
+    Yields:
+        Chunks avec métadonnées
+    """
+    with open(regulation_file, 'r', encoding='utf-8') as f:
+        yield from iter_regulation_chunks(f)
+
+
 def parse_regulation_to_chunks(text: str) -> List[Dict]:
     """
     Parse le règlement en chunks par articles et points.
@@ -32,31 +112,33 @@ def parse_regulation_to_chunks(text: str) -> List[Dict]:
     Returns:
         Liste de chunks avec métadonnées (id, article_num, article_title, point_num, text)
     """
-    chunks = []
-    article_pattern = r"Статья (\d+)\. (.+?)(?=\n|$)"
-    article_matches = list(re.finditer(article_pattern, text))
-
-    for i, match in enumerate(article_matches):
-        article_num = match.group(1)
-        article_title = match.group(2).strip()
-
-        start = match.end()
-        end = article_matches[i + 1].start() if i + 1 < len(article_matches) else len(text)
-        article_text = text[start:end].strip()
-
-        point_pattern = r"^(\d+)\.\s+(.+?)(?=^\d+\.\s+|\Z)"
-        points = re.findall(point_pattern, article_text, re.MULTILINE | re.DOTALL)
+    return list(iter_regulation_chunks(io.StringIO(text)))
 
-        for pt, point_text in points:
-            chunks.append({
-                'id': f"{article_num}.{pt}",
-                'article_num': article_num,
-                'article_title': article_title,
-                'point_num': pt,
-                'text': point_text.strip()
-            })
 
-    return chunks
+def compute_chunk_uid(chunk: Dict) -> str:
+    """
+    Calcule un identifiant stable pour un chunk.
+    
+    L'identifiant combine l'ID structurel du chunk (article.point) et un hash
+    de son contenu: il ne dépend pas de la position du chunk dans le règlement
+    et ne change que si le texte ou le titre de l'article est modifié. Pour un
+    chunk issu d'un corpus, il est préfixé par l'identifiant du document et la
+    version du document entre dans le hash, pour que deux règlements ne
+    partagent jamais un ID.
+    
+    Args:
+        chunk: Chunk avec métadonnées
+        
+    Returns:
+        Identifiant de la forme "article.point#hash" ou "doc_id/article.point#hash"
+    """
+    content = f"{chunk.get('article_title', '')}\x00{chunk['text']}"
+    if 'doc_version' in chunk:
+        content = f"{chunk['doc_version']}\x00{content}"
+    content_hash = hashlib.sha1(content.encode('utf-8')).hexdigest()[:16]
+    if 'doc_id' in chunk:
+        return f"{chunk['doc_id']}/{chunk['id']}#{content_hash}"
+    return f"{chunk['id']}#{content_hash}"
 
 
 def save_chunks_to_txt(chunks: List[Dict], filename: str = 'chunks.txt') -> None:
@@ -69,53 +151,106 @@ def save_chunks_to_txt(chunks: List[Dict], filename: str = 'chunks.txt') -> None
     """
     with open(filename, 'w', encoding='utf-8') as f:
         for chunk in chunks:
-            f.write(f"ID: {chunk['id']}\n")
-            f.write(f"номер статьи: {chunk['article_num']}\t{chunk['article_title']}\n")
-            f.write(f"номер пункта внутри статьи: {chunk['point_num']}\n")
-            f.write(f"Text: {chunk['text']}\n")
-            f.write("-" * 80 + "\n\n")
+            write_chunk(f, chunk)
     print(f"Chunks sauvegardés dans {filename}")
 
 
-def load_chunks_from_txt(filename: str = 'chunks.txt') -> List[Dict]:
+def write_chunk(f: TextIO, chunk: Dict) -> None:
     """
-    Charge les chunks depuis un fichier texte.
+    Écrit un chunk au format de save_chunks_to_txt.
     
     Args:
-        filename: Nom du fichier à charger
+        f: Fichier texte ouvert en écriture
+        chunk: Chunk à écrire
+    """
+    f.write(f"ID: {chunk['id']}\n")
+    if 'doc_id' in chunk:
+        f.write(f"Document: {chunk['doc_id']}\t{chunk.get('doc_version', '')}\n")
+    f.write(f"номер статьи: {chunk['article_num']}\t{chunk['article_title']}\n")
+    f.write(f"номер пункта внутри статьи: {chunk['point_num']}\n")
+    f.write(f"Text: {chunk['text']}\n")
+    f.write("-" * 80 + "\n\n")
+
+
+def _parse_txt_block(block: str) -> Optional[Dict]:
+    """
+    Parse un bloc du format texte de save_chunks_to_txt.
+    
+    Args:
+        block: Bloc de texte d'un chunk
         
     Returns:
-        Liste de chunks
+        Chunk, ou None si le bloc est incomplet
+    """
+    lines = block.strip().split('\n')
+    chunk_data = {}
+
+    for i, line in enumerate(lines):
+        if line.startswith('ID:'):
+            chunk_data['id'] = line.replace('ID:', '').strip()
+        elif line.startswith('Document:'):
+            parts = line.replace('Document:', '').strip().split('\t')
+            chunk_data['doc_id'] = parts[0].strip()
+            if len(parts) > 1 and parts[1].strip():
+                chunk_data['doc_version'] = parts[1].strip()
+        elif line.startswith('номер статьи:'):
+            parts = line.replace('номер статьи:', '').strip().split('\t')
+            chunk_data['article_num'] = parts[0].strip()
+            chunk_data['article_title'] = parts[1].strip() if len(parts) > 1 else ''
+        elif line.startswith('номер пункта внутри статьи:'):
+            chunk_data['point_num'] = line.replace('номер пункта внутри статьи:', '').strip()
+        elif line.startswith('Text:'):
+            chunk_data['text'] = '\n'.join(lines[i:]).replace('Text:', '', 1).strip()
+            break
+
+    if 'id' in chunk_data and 'text' in chunk_data:
+        return chunk_data
+    return None
+
+
+def iter_chunks_from_txt(filename: str = 'chunks.txt') -> Iterator[Dict]:
     """
-    chunks = []
+    Lit les chunks d'un fichier texte au fil de l'eau.
+    
+    Les blocs sont séparés par une ligne composée exactement de 80 tirets.
+    
+    Args:
+        filename: Nom du fichier à lire
+        
+    Yields:
+        Chunks
+    """
+    separator = '-' * 80
+    block: List[str] = []
     with open(filename, 'r', encoding='utf-8') as f:
-        content = f.read()
+        for line in f:
+            if line.rstrip('\n') == separator:
+                chunk = _parse_txt_block(''.join(block))
+                if chunk is not None:
+                    yield chunk
+                block = []
+            else:
+                block.append(line)
 
-    chunk_blocks = content.split('-' * 80)
+    chunk = _parse_txt_block(''.join(block))
+    if chunk is not None:
+        yield chunk
 
-    for block in chunk_blocks:
-        block = block.strip()
-        if not block:
-            continue
 
-        lines = block.split('\n')
-        chunk_data = {}
-
-        for i, line in enumerate(lines):
-            if line.startswith('ID:'):
-                chunk_data['id'] = line.replace('ID:', '').strip()
-            elif line.startswith('номер статьи:'):
-                parts = line.replace('номер статьи:', '').strip().split('\t')
-                chunk_data['article_num'] = parts[0].strip()
-                chunk_data['article_title'] = parts[1].strip() if len(parts) > 1 else ''
-            elif line.startswith('номер пункта внутри статьи:'):
-                chunk_data['point_num'] = line.replace('номер пункта внутри статьи:', '').strip()
-            elif line.startswith('Text:'):
-                chunk_data['text'] = '\n'.join(lines[i:]).replace('Text:', '', 1).strip()
-                break
-
-        if 'id' in chunk_data and 'text' in chunk_data:
-            chunks.append(chunk_data)
+def load_chunks_from_txt(filename: str = 'chunks.txt') -> List[Dict]:
+    """
+    Charge les chunks depuis un fichier texte.
+    
+    Pour les gros fichiers, préférer le chunk store (chunk_store.py), qui
+    permet l'accès direct par ID sans tout charger.
+    
+    Args:
+        filename: Nom du fichier à charger
+        
+    Returns:
+        Liste de chunks
+    """
+    chunks = list(iter_chunks_from_txt(filename))
 
     print(f"{len(chunks)} chunks chargés depuis {filename}")
     return chunks
@@ -10,10 +10,17 @@ BASE_DIR = Path(__file__).parent.parent  # Remonte au dossier rag-app
 DATA_DIR = BASE_DIR / "data"
 MODELS_DIR = BASE_DIR / "models"
 CHROMA_DB_PATH = DATA_DIR / "chroma_db"
+NUMPY_STORE_PATH = DATA_DIR / "numpy_store"
+EMBEDDING_CACHE_DIR = DATA_DIR / "embedding_cache"
 
 # Fichiers
 REGULATION_FILE = DATA_DIR / "regulation.txt"
 CHUNKS_FILE = DATA_DIR / "chunks.txt"
+CHUNK_STORE_PATH = DATA_DIR / "chunk_store"  # Chunks en JSONL + index des offsets (remplace chunks.txt)
+
+# Corpus de règlements (un fichier .txt par règlement, parsés en parallèle)
+CORPUS_DIR = Path(os.getenv("CORPUS_DIR", str(DATA_DIR / "corpus")))
+CORPUS_PARSE_WORKERS = int(os.getenv("CORPUS_PARSE_WORKERS", "0"))  # 0: un processus par cœur
 
 # Google Drive
 REGULATION_GOOGLE_DRIVE_ID = "1DhT50DonrOVzt5bX_JgCScvM03L9GOIK"
@@ -22,17 +29,90 @@ REGULATION_GOOGLE_DRIVE_ID = "1DhT50DonrOVzt5bX_JgCScvM03L9GOIK"
 EMBEDDING_MODEL = "multi-qa-mpnet-base-dot-v1"
 LLM_MODEL = "llama3.2:latest"
 
+# Backend de l'encodeur: "torch" (référence), "torch-int8", "onnx" ou "onnx-int8"
+# (les exports ONNX sont mis en cache sous MODELS_DIR)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+
+# Base vectorielle: "chroma" (HNSW persistant) ou "numpy" (recherche exacte en mémoire)
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "chroma")
+# Stocker le texte des chunks dans la base vectorielle (sinon, lu à la demande dans le chunk store)
+VECTOR_STORE_DOCUMENTS = os.getenv("VECTOR_STORE_DOCUMENTS", "true").lower() == "true"
+# Base NumPy: codes compacts parcourus à la recherche ("none", "float16", "int8" ou "binary"),
+# puis candidats re-classés en float32 (rescore_factor x n_results candidats)
+VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "none")
+VECTOR_RESCORE_FACTOR = int(os.getenv("VECTOR_RESCORE_FACTOR", "10"))
+
+# Indexation: taille des lots encodés puis écrits dans la base, et processus
+# d'encodage pour les grandes indexations (0: un par cœur, 1: désactivé)
+INDEX_BATCH_SIZE = int(os.getenv("INDEX_BATCH_SIZE", "1024"))
+INDEX_ENCODE_PROCESSES = int(os.getenv("INDEX_ENCODE_PROCESSES", "0"))
+INDEX_MULTIPROCESS_MIN_CHUNKS = int(os.getenv("INDEX_MULTIPROCESS_MIN_CHUNKS", "2000"))
+INDEX_STREAM_WINDOW = int(os.getenv("INDEX_STREAM_WINDOW", "8192"))  # Chunks lus avant chaque écriture
+
+# Cache persistant des embeddings (partagé entre indexation et requêtes)
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+
+# Cache LRU en mémoire des embeddings de questions (0 pour désactiver)
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1024"))
+
+# Cache sémantique des réponses du LLM
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_SIMILARITY_THRESHOLD = float(os.getenv("ANSWER_CACHE_SIMILARITY_THRESHOLD", "0.95"))
+ANSWER_CACHE_TTL_SECONDS = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+
+# Streaming: regroupement des tokens en trames
+STREAM_FLUSH_INTERVAL_MS = int(os.getenv("STREAM_FLUSH_INTERVAL_MS", "30"))
+STREAM_FLUSH_MAX_TOKENS = int(os.getenv("STREAM_FLUSH_MAX_TOKENS", "16"))
+
 # Ollama
 OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+# Plusieurs serveurs: "http://a:11434,http://b:11434=8" (capacité optionnelle après "=")
+OLLAMA_HOSTS = [host for host in os.getenv("OLLAMA_HOSTS", OLLAMA_HOST).split(",") if host.strip()]
+# Générations simultanées par serveur (OLLAMA_NUM_PARALLEL), 0 pour ne pas limiter.
+# Un seul serveur: pas de limite par défaut (les requêtes ne sont pas mises en attente)
+OLLAMA_HOST_MAX_CONCURRENCY = int(os.getenv("OLLAMA_HOST_MAX_CONCURRENCY", "4" if len(OLLAMA_HOSTS) > 1 else "0"))
+LLM_QUEUE_TIMEOUT_SECONDS = float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", "60"))  # Attente maximale d'une place libre
+LLM_HOST_RETRY_SECONDS = float(os.getenv("LLM_HOST_RETRY_SECONDS", "10"))  # Durée d'éviction d'un serveur en échec
+LLM_HEALTH_CHECK_INTERVAL_SECONDS = float(os.getenv("LLM_HEALTH_CHECK_INTERVAL_SECONDS", "10"))  # Même avec un seul serveur (état dans /health), 0 pour désactiver
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")  # Durée de maintien du modèle en mémoire ("-1": toujours)
+
+# Préchauffage au démarrage et pings de maintien en mémoire (0 pour désactiver les pings)
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+KEEP_WARM_INTERVAL_SECONDS = int(os.getenv("KEEP_WARM_INTERVAL_SECONDS", "240"))
 
 # Gradio
 GRADIO_SERVER_NAME = os.getenv("GRADIO_SERVER_NAME", "0.0.0.0")
 GRADIO_SERVER_PORT = int(os.getenv("GRADIO_SERVER_PORT", "7860"))
 GRADIO_SHARE = os.getenv("GRADIO_SHARE", "false").lower() == "true"
+GRADIO_CONCURRENCY_LIMIT = int(os.getenv("GRADIO_CONCURRENCY_LIMIT", "64"))  # Sessions de streaming simultanées
+
+# Service HTTP (service.py): file d'admission bornée et délais
+SERVICE_HOST = os.getenv("SERVICE_HOST", "0.0.0.0")
+SERVICE_PORT = int(os.getenv("SERVICE_PORT", "8000"))
+SERVICE_MAX_CONCURRENCY = int(os.getenv("SERVICE_MAX_CONCURRENCY", "16"))  # Requêtes traitées simultanément
+SERVICE_MAX_QUEUE = int(os.getenv("SERVICE_MAX_QUEUE", "64"))  # Requêtes en attente (au-delà: 429)
+SERVICE_QUEUE_TIMEOUT_SECONDS = float(os.getenv("SERVICE_QUEUE_TIMEOUT_SECONDS", "10"))  # Attente maximale (au-delà: 503)
+SERVICE_REQUEST_TIMEOUT_SECONDS = float(os.getenv("SERVICE_REQUEST_TIMEOUT_SECONDS", "120"))  # Durée maximale (au-delà: 504)
+SERVICE_BATCH_MAX_QUESTIONS = int(os.getenv("SERVICE_BATCH_MAX_QUESTIONS", "32"))
+
+# Métriques Prometheus exposées sur /metrics
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
 
 # RAG
 RAG_N_RESULTS = 5  # Nombre de chunks à récupérer
-RAG_CONTEXT_MAX_LENGTH = 4000  # Longueur maximale du contexte
+RAG_CONTEXT_MAX_LENGTH = 4000  # Longueur maximale du contexte (caractères)
+RAG_CONTEXT_MAX_TOKENS = int(os.getenv("RAG_CONTEXT_MAX_TOKENS", "1200"))  # Budget de tokens du contexte
+CONTEXT_TOKENIZER = os.getenv("CONTEXT_TOKENIZER", "")  # Tokenizer Hugging Face (vide: estimation)
+PROMPT_LAYOUT = os.getenv("PROMPT_LAYOUT", "legacy")  # "prefix": longues consignes constantes + chunks par position (cache KV)
+QUERY_ROUTER_ENABLED = os.getenv("QUERY_ROUTER_ENABLED", "true").lower() == "true"  # Accès direct "Статья N" / "article N"
+RAG_EXECUTOR_WORKERS = int(os.getenv("RAG_EXECUTOR_WORKERS", str(min(8, os.cpu_count() or 1))))  # Threads pour encodage/recherche (API async)
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"  # Questions identiques en cours partagées
+MICRO_BATCH_ENABLED = os.getenv("MICRO_BATCH_ENABLED", "true").lower() == "true"  # Encodage/recherche regroupés entre requêtes
+MICRO_BATCH_MAX_WAIT_MS = float(os.getenv("MICRO_BATCH_MAX_WAIT_MS", "0"))  # Attente d'autres questions (0: celles arrivées pendant le lot précédent)
+MICRO_BATCH_MAX_SIZE = int(os.getenv("MICRO_BATCH_MAX_SIZE", "32"))  # Questions par lot
+RAG_BATCH_MAX_CONCURRENCY = int(os.getenv("RAG_BATCH_MAX_CONCURRENCY", "4"))  # Générations LLM simultanées (query_batch)
 
 # Créer les répertoires si nécessaire
 DATA_DIR.mkdir(exist_ok=True)
@@ -0,0 +1,181 @@
+"""
+Construction du contexte envoyé au LLM.
+Les chunks sont ajoutés entiers, par ordre de pertinence, jusqu'à un budget
+de tokens; les chunks redondants sont ignorés. Les chunks retenus peuvent
+ensuite être classés par position dans le règlement (ordre déterministe,
+favorable à la réutilisation du cache de préfixe du LLM).
+"""
+
+import math
+import re
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from embedding_cache import normalize_text
+
+
+CONTEXT_SEPARATOR = "\n\n---SECTION---\n\n"
+
+_WORD_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+class TokenCounter:
+    """
+    Compte les tokens d'un texte pour le LLM cible.
+
+    Utilise le tokenizer Hugging Face indiqué s'il est disponible, sinon une
+    estimation calibrée sur les tokenizers BPE de Llama 3 (environ 4 caractères
+    par token en alphabet latin, 3 en cyrillique).
+    """
+
+    def __init__(self, tokenizer_name: Optional[str] = None):
+        """
+        Initialise le compteur.
+
+        Args:
+            tokenizer_name: Nom d'un tokenizer Hugging Face (optionnel)
+        """
+        self.tokenizer = None
+        if tokenizer_name:
+            try:
+                from transformers import AutoTokenizer
+                self.tokenizer = AutoTokenizer.from_pretrained(tokenizer_name)
+            except Exception as e:
+                print(f"⚠️  Tokenizer {tokenizer_name} indisponible, estimation utilisée: {e}")
+
+    def count(self, text: str) -> int:
+        """
+        Compte (ou estime) le nombre de tokens d'un texte.
+
+        Args:
+            text: Texte à mesurer
+
+        Returns:
+            Nombre de tokens
+        """
+        if self.tokenizer is not None:
+            return len(self.tokenizer.encode(text, add_special_tokens=False))
+
+        tokens = 0
+        for piece in _WORD_PATTERN.findall(text):
+            chars_per_token = 4 if piece.isascii() else 3
+            tokens += max(1, math.ceil(len(piece) / chars_per_token))
+        return tokens
+
+
+def position_key(metadata: Dict) -> Tuple:
+    """
+    Clé de tri d'un chunk selon sa position dans le corpus.
+
+    Args:
+        metadata: Métadonnées du chunk (doc_id, article_num, point_num, id)
+
+    Returns:
+        Clé (document, numéros d'article, numéros de point, id)
+    """
+    def numbers(value) -> Tuple[int, ...]:
+        return tuple(int(n) for n in re.findall(r"\d+", str(value or "")))
+
+    return (
+        metadata.get('doc_id') or "",
+        numbers(metadata.get('article_num')),
+        numbers(metadata.get('point_num')),
+        str(metadata.get('id', "")),
+    )
+
+
+def _truncate_to_tokens(text: str, max_tokens: int, counter: TokenCounter) -> str:
+    """
+    Tronque un texte à la dernière phrase complète tenant dans le budget.
+
+    Args:
+        text: Texte à tronquer
+        max_tokens: Budget de tokens
+        counter: Compteur de tokens
+
+    Returns:
+        Texte tronqué (éventuellement vide)
+    """
+    sentences = re.split(r"(?<=[.;:!?])\s+", text)
+    kept = []
+    used = 0
+    for sentence in sentences:
+        cost = counter.count(sentence) + 1
+        if used + cost > max_tokens:
+            break
+        kept.append(sentence)
+        used += cost
+    return " ".join(kept)
+
+
+def build_context(
+    documents: Sequence[str],
+    metadatas: Sequence[Dict],
+    max_tokens: int,
+    counter: TokenCounter,
+    max_chars: Optional[int] = None,
+    sort_key: Optional[Callable[[Dict], Any]] = None
+) -> Dict:
+    """
+    Assemble le contexte dans un budget de tokens.
+
+    Les chunks sont pris dans l'ordre de pertinence et ajoutés entiers tant
+    qu'ils tiennent dans le budget; un chunk déjà contenu dans un chunk retenu
+    est ignoré. Si même le premier chunk dépasse le budget, il est tronqué à
+    la dernière phrase complète. Avec sort_key, les chunks retenus sont
+    classés selon leurs métadonnées (par exemple position_key) dans le texte
+    du contexte seulement: documents et metadatas restent dans l'ordre de
+    pertinence (sources affichées, cache des réponses).
+
+    Args:
+        documents: Chunks triés par pertinence
+        metadatas: Métadonnées correspondantes
+        max_tokens: Budget de tokens du contexte
+        counter: Compteur de tokens
+        max_chars: Longueur maximale en caractères (optionnelle)
+        sort_key: Clé de tri des chunks dans le contexte (optionnelle, sinon ordre de pertinence)
+
+    Returns:
+        Dictionnaire {'context', 'documents', 'metadatas', 'tokens'}
+    """
+    separator_tokens = counter.count(CONTEXT_SEPARATOR)
+    max_chars = max_chars or math.inf
+
+    kept_documents: List[str] = []
+    kept_metadatas: List[Dict] = []
+    kept_normalized: List[str] = []
+    tokens = 0
+    chars = 0
+
+    for document, metadata in zip(documents, metadatas):
+        normalized = normalize_text(document)
+        if not normalized or any(normalized in other for other in kept_normalized):
+            continue
+
+        extra_tokens = counter.count(document) + (separator_tokens if kept_documents else 0)
+        extra_chars = len(document) + (len(CONTEXT_SEPARATOR) if kept_documents else 0)
+        if tokens + extra_tokens > max_tokens or chars + extra_chars > max_chars:
+            if kept_documents:
+                continue
+            document = _truncate_to_tokens(document, max_tokens, counter)[:int(min(max_chars, len(document)))]
+            if not document:
+                continue
+            extra_tokens = counter.count(document)
+            extra_chars = len(document)
+
+        kept_documents.append(document)
+        kept_metadatas.append(metadata)
+        kept_normalized.append(normalized)
+        tokens += extra_tokens
+        chars += extra_chars
+
+    context_documents = kept_documents
+    if sort_key is not None:
+        order = sorted(range(len(kept_documents)), key=lambda i: sort_key(kept_metadatas[i]))
+        context_documents = [kept_documents[i] for i in order]
+
+    return {
+        'context': CONTEXT_SEPARATOR.join(context_documents),
+        'documents': kept_documents,
+        'metadatas': kept_metadatas,
+        'tokens': tokens,
+    }
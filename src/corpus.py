@@ -0,0 +1,125 @@
+"""
+Ingestion d'un corpus de règlements (un fichier texte par règlement).
+Les fichiers sont parsés en parallèle dans des processus séparés; chaque chunk
+est étiqueté avec l'identifiant et la version de son document.
+"""
+
+import hashlib
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from chunking import iter_regulation_file
+
+
+def document_id(path: Path, root: Path) -> str:
+    """
+    Calcule l'identifiant d'un document: son chemin relatif, sans extension.
+
+    Args:
+        path: Chemin du fichier
+        root: Répertoire racine du corpus
+
+    Returns:
+        Identifiant du document (par exemple "tr_ts/004-2011")
+    """
+    return Path(path).relative_to(root).with_suffix("").as_posix()
+
+
+def document_version(path: Path) -> str:
+    """
+    Calcule la version d'un document: hash de son contenu.
+
+    Args:
+        path: Chemin du fichier
+
+    Returns:
+        Version du document (12 caractères hexadécimaux)
+    """
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+def parse_document(path: str, doc_id: str) -> List[Dict]:
+    """
+    Parse un document du corpus (exécuté dans un processus du pool).
+
+    Args:
+        path: Chemin du fichier
+        doc_id: Identifiant du document
+
+    Returns:
+        Chunks du document, étiquetés avec doc_id et doc_version
+    """
+    version = document_version(Path(path))
+    chunks = []
+    for chunk in iter_regulation_file(path):
+        chunk['doc_id'] = doc_id
+        chunk['doc_version'] = version
+        chunks.append(chunk)
+    return chunks
+
+
+def list_documents(corpus_dir: str, pattern: str = "**/*.txt") -> List[Tuple[str, str]]:
+    """
+    Liste les documents d'un corpus.
+
+    Args:
+        corpus_dir: Répertoire du corpus
+        pattern: Motif glob des fichiers de règlements
+
+    Returns:
+        Liste triée de (chemin, doc_id)
+    """
+    root = Path(corpus_dir)
+    return [(str(path), document_id(path, root)) for path in sorted(root.glob(pattern)) if path.is_file()]
+
+
+def iter_corpus_chunks(
+    corpus_dir: str,
+    pattern: str = "**/*.txt",
+    workers: Optional[int] = None,
+    documents: Optional[Sequence[Tuple[str, str]]] = None
+) -> Iterator[Dict]:
+    """
+    Parse un corpus en parallèle et produit les chunks au fil des documents.
+
+    Au plus 2 documents par processus sont en cours à la fois: les chunks
+    sont produits dès qu'un document est parsé, sans attendre le corpus entier.
+
+    Args:
+        corpus_dir: Répertoire du corpus
+        pattern: Motif glob des fichiers de règlements
+        workers: Nombre de processus (par défaut, un par cœur; 1 pour parser
+            dans le processus courant)
+        documents: Liste (chemin, doc_id) à parser (par défaut, list_documents)
+
+    Yields:
+        Chunks avec métadonnées (dont doc_id et doc_version)
+    """
+    if documents is None:
+        documents = list_documents(corpus_dir, pattern)
+    workers = workers or os.cpu_count() or 1
+
+    if workers <= 1:
+        for path, doc_id in documents:
+            yield from parse_document(path, doc_id)
+        return
+
+    pending_documents = iter(documents)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        running = set()
+        while True:
+            for path, doc_id in pending_documents:
+                running.add(executor.submit(parse_document, path, doc_id))
+                if len(running) >= 2 * workers:
+                    break
+            if not running:
+                break
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from future.result()
@@ -0,0 +1,403 @@
+"""
+Caches d'embeddings.
+Cache persistant sur disque: les vecteurs sont stockés dans un tableau float32
+mappé en mémoire (mmap), indexés par un hash compact du couple
+(modèle d'embeddings, texte normalisé).
+Cache LRU en mémoire pour les embeddings des questions fréquentes.
+
+Le cache persistant peut être ouvert par plusieurs processus (application,
+API, indexation): les écritures sont sérialisées par un verrou de fichier,
+et la clé d'un emplacement est relue avant d'en retourner le vecteur (un
+autre processus a pu le réattribuer).
+"""
+
+import json
+import hashlib
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: verrou entre threads seulement
+    fcntl = None
+
+
+KEY_SIZE = 16  # Taille des clés (octets de hash SHA-1 conservés)
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalise un texte avant le calcul de sa clé de cache.
+
+    Args:
+        text: Texte brut
+
+    Returns:
+        Texte en forme NFC, sans espaces superflus
+    """
+    text = unicodedata.normalize('NFC', text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def embedding_key(model_name: str, text: str) -> bytes:
+    """
+    Calcule la clé de cache d'un texte pour un modèle donné.
+
+    Args:
+        model_name: Nom du modèle d'embeddings
+        text: Texte à encoder
+
+    Returns:
+        Clé binaire de KEY_SIZE octets
+    """
+    payload = f"{model_name}\x00{normalize_text(text)}".encode('utf-8')
+    return hashlib.sha1(payload).digest()[:KEY_SIZE]
+
+
+class EmbeddingCache:
+    """
+    Cache d'embeddings persistant et borné en taille.
+
+    Trois fichiers .npy mappés en mémoire sont conservés par modèle:
+    les vecteurs (capacity x dim), les clés et un compteur de dernier accès
+    utilisé pour évincer les entrées les moins récemment utilisées.
+    """
+
+    def __init__(self, cache_dir: str, model_name: str, max_entries: int = 100_000):
+        """
+        Initialise le cache.
+
+        Args:
+            cache_dir: Répertoire racine du cache
+            model_name: Nom du modèle d'embeddings (partie de la clé)
+            max_entries: Nombre maximal de vecteurs conservés
+        """
+        slug = re.sub(r'[^A-Za-z0-9_.-]+', '_', model_name)
+        self.directory = Path(cache_dir) / slug
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._vectors = None
+        self._keys = None
+        self._ticks = None
+        self._slots: Dict[bytes, int] = {}
+        self._tick = 0
+        self._lock_file = None
+
+        self._open_existing()
+
+    @property
+    def dim(self) -> Optional[int]:
+        """Dimension des vecteurs (None tant que le cache est vide)."""
+        return None if self._vectors is None else self._vectors.shape[1]
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool) -> Iterator[None]:
+        """
+        Verrou partagé avec les autres processus ouverts sur le même cache.
+
+        Args:
+            exclusive: Verrou exclusif (écriture) ou partagé (lecture)
+        """
+        if fcntl is None:
+            yield
+            return
+        if self._lock_file is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._lock_file = open(self.directory / "lock", 'a+b')
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _open_existing(self) -> None:
+        """Ouvre les fichiers du cache s'ils existent déjà."""
+        meta_file = self.directory / "meta.json"
+        if not meta_file.exists():
+            return
+
+        with self._lock, self._file_lock(exclusive=True):
+            self._load(meta_file)
+
+    def _load(self, meta_file: Path) -> None:
+        """Mappe les fichiers du cache (à appeler avec les verrous)."""
+        try:
+            with open(meta_file, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            vectors = np.load(self.directory / "vectors.npy", mmap_mode='r+')
+            keys = np.load(self.directory / "keys.npy", mmap_mode='r+')
+            ticks = np.load(self.directory / "ticks.npy", mmap_mode='r+')
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Cache d'embeddings illisible, il sera recréé: {e}")
+            return
+
+        if meta.get('model_name') != self.model_name:
+            return
+
+        if len(keys) != self.max_entries:
+            # Capacité modifiée: conserver les entrées les plus récentes
+            order = np.argsort(ticks)[::-1][:self.max_entries]
+            order = order[ticks[order] >= 0]
+            kept = (np.array(vectors[order]), np.array(keys[order]), np.array(ticks[order]))
+            del vectors, keys, ticks
+
+            self._create(kept[0].shape[1])
+            n = len(order)
+            self._vectors[:n], self._keys[:n], self._ticks[:n] = kept
+        else:
+            self._vectors, self._keys, self._ticks = vectors, keys, ticks
+
+        self._slots = {
+            bytes(self._keys[i]).ljust(KEY_SIZE, b'\x00'): int(i)
+            for i in np.flatnonzero(self._ticks >= 0)
+        }
+        self._tick = int(self._ticks.max(initial=0)) + 1
+
+    def _create(self, dim: int) -> None:
+        """
+        Crée des fichiers vides pour des vecteurs de dimension dim (à appeler
+        avec les verrous).
+
+        Les fichiers sont écrits sous des noms temporaires puis renommés: un
+        autre processus qui mappe encore les anciens n'est pas affecté.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        open_memmap = np.lib.format.open_memmap
+        shapes = {
+            'vectors': (np.float32, (self.max_entries, dim)),
+            'keys': (f'S{KEY_SIZE}', (self.max_entries,)),
+            'ticks': (np.int64, (self.max_entries,)),
+        }
+
+        arrays = {}
+        for name, (dtype, shape) in shapes.items():
+            arrays[name] = open_memmap(self.directory / f"{name}.tmp.npy", mode='w+', dtype=dtype, shape=shape)
+        arrays['ticks'][:] = -1
+        for name, array in arrays.items():
+            array.flush()
+            (self.directory / f"{name}.tmp.npy").replace(self.directory / f"{name}.npy")
+
+        self._vectors, self._keys, self._ticks = arrays['vectors'], arrays['keys'], arrays['ticks']
+        self._slots = {}
+        self._tick = 0
+
+        tmp_meta = self.directory / "meta.tmp.json"
+        with open(tmp_meta, 'w', encoding='utf-8') as f:
+            json.dump({'model_name': self.model_name, 'dim': dim}, f)
+        tmp_meta.replace(self.directory / "meta.json")
+
+    def _slot_of(self, key: bytes) -> Optional[int]:
+        """
+        Retourne l'emplacement d'une clé, si elle l'occupe toujours (à appeler
+        avec les verrous): un autre processus a pu évincer l'entrée et
+        réattribuer l'emplacement.
+        """
+        slot = self._slots.get(key)
+        if slot is None:
+            return None
+        if bytes(self._keys[slot]).ljust(KEY_SIZE, b'\x00') != key:
+            del self._slots[key]
+            return None
+        return slot
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """
+        Recherche les embeddings de plusieurs textes.
+
+        Args:
+            texts: Textes à rechercher
+
+        Returns:
+            Liste de vecteurs (None pour les textes absents du cache)
+        """
+        results: List[Optional[np.ndarray]] = []
+        if self._vectors is None:
+            self.misses += len(texts)
+            return [None] * len(texts)
+        with self._lock, self._file_lock(exclusive=False):
+            for text in texts:
+                slot = self._slot_of(embedding_key(self.model_name, text))
+                if slot is None:
+                    self.misses += 1
+                    results.append(None)
+                    continue
+                self.hits += 1
+                self._ticks[slot] = self._tick
+                self._tick += 1
+                results.append(np.array(self._vectors[slot]))
+        return results
+
+    def put_many(self, texts: Sequence[str], vectors: np.ndarray) -> None:
+        """
+        Ajoute des embeddings au cache, en évinçant les plus anciens si besoin.
+
+        Args:
+            texts: Textes encodés
+            vectors: Embeddings correspondants (len(texts) x dim)
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(texts) == 0:
+            return
+
+        with self._lock, self._file_lock(exclusive=True):
+            if self._vectors is None or self._vectors.shape[1] != vectors.shape[1]:
+                self._create(vectors.shape[1])
+
+            pending = {}
+            for text, vector in zip(texts, vectors):
+                pending[embedding_key(self.model_name, text)] = vector
+
+            # Rafraîchir les entrées existantes avant de choisir les victimes
+            for key in pending:
+                slot = self._slot_of(key)
+                if slot is not None:
+                    self._ticks[slot] = self._tick
+                    self._tick += 1
+
+            new_keys = [key for key in pending if key not in self._slots]
+            free_slots = self._allocate(len(new_keys))
+
+            for key, slot in zip(new_keys, free_slots):
+                self._slots[key] = slot
+                self._keys[slot] = key
+
+            for key, vector in pending.items():
+                slot = self._slots.get(key)
+                if slot is None:
+                    continue  # Plus de textes que de capacité
+                self._vectors[slot] = vector
+                self._ticks[slot] = self._tick
+                self._tick += 1
+
+    def _allocate(self, n: int) -> List[int]:
+        """
+        Réserve n emplacements en évinçant les entrées les moins récentes
+        (à appeler avec les verrous).
+
+        Args:
+            n: Nombre d'emplacements demandés
+
+        Returns:
+            Indices des emplacements libérés (au plus max_entries)
+        """
+        n = min(n, self.max_entries)
+        if n == 0:
+            return []
+
+        # Les emplacements vides ont un tick de -1 et sont donc choisis en premier
+        slots = np.argpartition(self._ticks, n - 1)[:n] if n < self.max_entries \
+            else np.arange(self.max_entries)
+        for slot in slots:
+            key = bytes(self._keys[slot]).ljust(KEY_SIZE, b'\x00')
+            if self._slots.get(key) == slot:
+                del self._slots[key]
+            self._ticks[slot] = -1
+        return [int(slot) for slot in slots]
+
+    def encode(self, texts: Sequence[str], encode_fn: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """
+        Retourne les embeddings des textes en n'encodant que les absents.
+
+        Args:
+            texts: Textes à encoder
+            encode_fn: Fonction d'encodage appelée sur les textes manquants
+
+        Returns:
+            Embeddings (len(texts) x dim), dans l'ordre des textes
+        """
+        cached = self.get_many(texts)
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+
+        if missing:
+            computed = np.asarray(encode_fn([texts[i] for i in missing]), dtype=np.float32)
+            self.put_many([texts[i] for i in missing], computed)
+            for i, vector in zip(missing, computed):
+                cached[i] = vector
+
+        if not cached:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        return np.stack(cached)
+
+    def flush(self) -> None:
+        """Écrit les pages modifiées sur disque."""
+        with self._lock:
+            for array in (self._vectors, self._keys, self._ticks):
+                if array is not None:
+                    array.flush()
+
+
+class LRUCache:
+    """Cache LRU en mémoire, borné et thread-safe, avec compteurs de hits/misses."""
+
+    def __init__(self, max_size: int = 1024):
+        """
+        Initialise le cache.
+
+        Args:
+            max_size: Nombre maximal d'entrées (0 pour désactiver le cache)
+        """
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Retourne la valeur associée à la clé, ou None.
+
+        Args:
+            key: Clé recherchée
+
+        Returns:
+            Valeur en cache ou None
+        """
+        with self._lock:
+            if key not in self._data:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """
+        Ajoute une entrée, en évinçant la moins récemment utilisée si besoin.
+
+        Args:
+            key: Clé
+            value: Valeur à conserver
+        """
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        """Vide le cache."""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Retourne les statistiques du cache."""
+        return {'size': len(self._data), 'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,234 @@
+"""
+Encodeurs de texte pour les embeddings.
+Backends disponibles (EMBEDDING_BACKEND):
+- "torch": SentenceTransformer de référence (PyTorch, float32)
+- "torch-int8": même modèle, couches linéaires quantifiées dynamiquement en int8
+- "onnx": export ONNX exécuté par ONNX Runtime (mis en cache sous MODELS_DIR)
+- "onnx-int8": export ONNX quantifié dynamiquement en int8
+"""
+
+import json
+import re
+from pathlib import Path
+from typing import Sequence
+
+import numpy as np
+
+
+ENCODER_BACKENDS = ("torch", "torch-int8", "onnx", "onnx-int8")
+
+
+def _pooling_config(model) -> dict:
+    """
+    Extrait la configuration de pooling d'un SentenceTransformer.
+
+    Args:
+        model: Instance de SentenceTransformer
+
+    Returns:
+        Dictionnaire {'pooling': 'cls'|'mean'|'max', 'normalize': bool}
+    """
+    pooling = 'mean'
+    normalize = False
+    for module in model:
+        if hasattr(module, 'pooling_mode_cls_token'):
+            if module.pooling_mode_cls_token:
+                pooling = 'cls'
+            elif module.pooling_mode_max_tokens:
+                pooling = 'max'
+        if type(module).__name__ == 'Normalize':
+            normalize = True
+    return {'pooling': pooling, 'normalize': normalize}
+
+
+class OnnxEncoder:
+    """
+    Encodeur ONNX Runtime reproduisant un SentenceTransformer
+    (tokenizer, transformer, pooling et normalisation éventuelle).
+    """
+
+    def __init__(self, model_dir: Path, quantized: bool = False):
+        """
+        Charge un modèle exporté par export_onnx.
+
+        Args:
+            model_dir: Répertoire de l'export
+            quantized: Utiliser la variante int8
+        """
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        with open(model_dir / "encoder.json", 'r', encoding='utf-8') as f:
+            self.config = json.load(f)
+
+        self.tokenizer = AutoTokenizer.from_pretrained(str(model_dir))
+        model_file = model_dir / ("model.int8.onnx" if quantized else "model.onnx")
+        self.session = ort.InferenceSession(str(model_file), providers=["CPUExecutionProvider"])
+        self.max_seq_length = self.config['max_seq_length']
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.config['dim']
+
+    def encode(
+        self,
+        texts: Sequence[str],
+        batch_size: int = 32,
+        show_progress_bar: bool = False,
+        **kwargs
+    ) -> np.ndarray:
+        """
+        Encode des textes (même interface que SentenceTransformer.encode).
+
+        Les textes sont regroupés par longueur pour limiter le padding.
+
+        Args:
+            texts: Textes à encoder
+            batch_size: Taille des lots
+            show_progress_bar: Ignoré (compatibilité)
+
+        Returns:
+            Embeddings float32 (len(texts) x dim)
+        """
+        if isinstance(texts, str):
+            texts = [texts]
+        texts = list(texts)
+        embeddings = np.zeros((len(texts), self.config['dim']), dtype=np.float32)
+        order = np.argsort([-len(text) for text in texts], kind='stable')
+
+        for start in range(0, len(texts), batch_size):
+            batch = order[start:start + batch_size]
+            inputs = self.tokenizer(
+                [texts[i] for i in batch],
+                padding=True,
+                truncation=True,
+                max_length=self.max_seq_length,
+                return_tensors='np'
+            )
+            mask = inputs['attention_mask'].astype(np.int64)
+            hidden = self.session.run(None, {
+                'input_ids': inputs['input_ids'].astype(np.int64),
+                'attention_mask': mask,
+            })[0]
+
+            if self.config['pooling'] == 'cls':
+                pooled = hidden[:, 0]
+            elif self.config['pooling'] == 'max':
+                pooled = np.where(mask[..., None] > 0, hidden, -1e9).max(axis=1)
+            else:
+                pooled = (hidden * mask[..., None]).sum(axis=1) / np.maximum(mask.sum(axis=1, keepdims=True), 1)
+
+            if self.config['normalize']:
+                pooled = pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+            embeddings[batch] = pooled
+
+        return embeddings
+
+
+def onnx_export_dir(model_name: str, models_dir: Path) -> Path:
+    """Retourne le répertoire d'export ONNX d'un modèle."""
+    return Path(models_dir) / "onnx" / re.sub(r"[^\w.-]+", "_", model_name)
+
+
+def export_onnx(model_name: str, models_dir: Path, quantize: bool = False) -> Path:
+    """
+    Exporte un SentenceTransformer en ONNX (une seule fois, puis mis en cache).
+
+    Args:
+        model_name: Nom du modèle SentenceTransformer
+        models_dir: Répertoire des modèles (MODELS_DIR)
+        quantize: Produire aussi la variante quantifiée int8
+
+    Returns:
+        Répertoire de l'export
+    """
+    export_dir = onnx_export_dir(model_name, models_dir)
+    model_file = export_dir / "model.onnx"
+
+    if not model_file.exists():
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        print(f"📦 Export ONNX de {model_name} vers {export_dir}")
+        export_dir.mkdir(parents=True, exist_ok=True)
+        model = SentenceTransformer(model_name, device='cpu')
+        transformer = model[0]
+
+        class HiddenStates(torch.nn.Module):
+            def __init__(self, auto_model):
+                super().__init__()
+                self.auto_model = auto_model
+
+            def forward(self, input_ids, attention_mask):
+                return self.auto_model(input_ids=input_ids, attention_mask=attention_mask)[0]
+
+        dummy = transformer.tokenizer(["export onnx"], return_tensors='pt')
+        tmp_file = export_dir / "model.tmp.onnx"
+        torch.onnx.export(
+            HiddenStates(transformer.auto_model).eval(),
+            (dummy['input_ids'], dummy['attention_mask']),
+            str(tmp_file),
+            input_names=['input_ids', 'attention_mask'],
+            output_names=['last_hidden_state'],
+            dynamic_axes={
+                'input_ids': {0: 'batch', 1: 'sequence'},
+                'attention_mask': {0: 'batch', 1: 'sequence'},
+                'last_hidden_state': {0: 'batch', 1: 'sequence'},
+            },
+            opset_version=14
+        )
+        transformer.tokenizer.save_pretrained(str(export_dir))
+        with open(export_dir / "encoder.json", 'w', encoding='utf-8') as f:
+            json.dump(dict(
+                _pooling_config(model),
+                model_name=model_name,
+                max_seq_length=model.max_seq_length,
+                dim=model.get_sentence_embedding_dimension()
+            ), f, indent=2)
+        tmp_file.replace(model_file)
+
+    int8_file = export_dir / "model.int8.onnx"
+    if quantize and not int8_file.exists():
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        print(f"📦 Quantification int8 de {model_file}")
+        quantize_dynamic(str(model_file), str(int8_file), weight_type=QuantType.QInt8)
+
+    return export_dir
+
+
+def load_encoder(model_name: str, backend: str = "torch", models_dir: Path = Path("./models")):
+    """
+    Charge l'encodeur demandé.
+
+    Args:
+        model_name: Nom du modèle SentenceTransformer
+        backend: Backend d'exécution (voir ENCODER_BACKENDS)
+        models_dir: Répertoire de cache des modèles exportés
+
+    Returns:
+        Objet exposant encode(texts, batch_size=..., show_progress_bar=...)
+    """
+    if backend == "torch":
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_name)
+
+    if backend == "torch-int8":
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        model = SentenceTransformer(model_name, device='cpu')
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    if backend in ("onnx", "onnx-int8"):
+        quantized = backend == "onnx-int8"
+        return OnnxEncoder(export_onnx(model_name, models_dir, quantize=quantized), quantized=quantized)
+
+    raise ValueError(f"Backend d'encodeur inconnu: {backend} (choix: {', '.join(ENCODER_BACKENDS)})")
+
+
+def encoder_cache_name(model_name: str, backend: str) -> str:
+    """
+    Nom utilisé pour le cache d'embeddings: les vecteurs d'un backend quantifié
+    diffèrent légèrement de ceux du modèle de référence.
+    """
+    return model_name if backend == "torch" else f"{model_name}@{backend}"
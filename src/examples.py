@@ -95,13 +95,12 @@ def example_batch_processing():
         "Как осуществляется маркировка?"
     ]
     
-    responses = []
-    for question in questions:
-        response = rag.query(question, n_results=3)
-        responses.append({
-            'question': question,
-            'response': response
-        })
+    # Un seul encodage, une seule requête ChromaDB, générations en parallèle
+    answers = rag.query_batch(questions, n_results=3, max_concurrency=4)
+    responses = [
+        {'question': question, 'response': response}
+        for question, response in zip(questions, answers)
+    ]
     
     # Sauvegarder les résultats
     import json
@@ -146,12 +145,12 @@ def example_similarity_analysis():
 
 def example_export_chunks():
     """Exporter les chunks dans différents formats."""
-    from chunking import load_chunks_from_txt
+    from chunk_store import ChunkStore
     import json
     import csv
     
     # Charger les chunks
-    chunks = load_chunks_from_txt('data/chunks.txt')
+    chunks = list(ChunkStore('data/chunk_store'))
     
     # Export JSON
     with open('chunks.json', 'w', encoding='utf-8') as f:
@@ -173,10 +172,10 @@ def example_export_chunks():
 
 def example_regulation_statistics():
     """Analyser les statistiques du règlement."""
-    from chunking import load_chunks_from_txt
+    from chunk_store import ChunkStore
     from collections import Counter
     
-    chunks = load_chunks_from_txt('data/chunks.txt')
+    chunks = list(ChunkStore('data/chunk_store'))
     
     # Statistiques
     total_chunks = len(chunks)
@@ -248,8 +247,13 @@ def example_interactive_cli():
 # ==============================================================================
 
 def example_rest_api():
-    """Créer une API REST simple avec FastAPI."""
+    """
+    Créer une API REST simple avec FastAPI.
+    
+    Pour la production (file d'admission, délais, lots), utiliser service.py.
+    """
     try:
+        from typing import List, Optional
         from fastapi import FastAPI, HTTPException
         from pydantic import BaseModel
         from rag_system import RAGSystem
@@ -260,6 +264,7 @@ def example_rest_api():
         class Query(BaseModel):
             question: str
             n_results: int = 5
+            doc_ids: Optional[List[str]] = None  # Règlements où chercher (corpus)
         
         class Response(BaseModel):
             question: str
@@ -269,11 +274,23 @@ def example_rest_api():
         async def query_endpoint(query: Query):
             """Endpoint pour poser une question."""
             try:
-                response = rag.query(query.question, query.n_results)
+                response = await rag.aquery(query.question, query.n_results, query.doc_ids)
                 return Response(question=query.question, answer=response)
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
         
+        @app.post("/query/stream")
+        async def query_stream_endpoint(query: Query):
+            """Endpoint de streaming (Server-Sent Events): deltas puis sources."""
+            import json
+            from fastapi.responses import StreamingResponse
+            
+            async def events():
+                async for event in rag.astream_events(query.question, query.n_results, query.doc_ids):
+                    yield f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+            
+            return StreamingResponse(events(), media_type="text/event-stream")
+        
         @app.get("/health")
         async def health():
             """Endpoint de santé."""
@@ -2,26 +2,45 @@
 Script pour initialiser la base de données avec le règlement technique.
 """
 
+import argparse
 import os
 import sys
-from chunking import download_regulation, parse_regulation_to_chunks, save_chunks_to_txt
+import time
+from chunking import download_regulation, iter_regulation_file
+from chunk_store import ChunkStoreWriter
+from corpus import iter_corpus_chunks, list_documents
+from config import CHUNK_STORE_PATH, CORPUS_PARSE_WORKERS
 from rag_system import RAGSystem
 
 
 def main():
-    """Initialise la base de données avec le règlement."""
+    """Initialise la base de données avec le règlement (ou un corpus de règlements)."""
+    parser = argparse.ArgumentParser(description="Initialisation de la base de données RAG")
+    parser.add_argument(
+        "--corpus-dir",
+        type=str,
+        default=None,
+        help="Répertoire de règlements (.txt) à indexer à la place du règlement unique"
+    )
+    args = parser.parse_args()
     
     # ID du fichier Google Drive (extrait du lien fourni)
     file_id = "1DhT50DonrOVzt5bX_JgCScvM03L9GOIK"
     regulation_file = "./data/regulation.txt"
-    chunks_file = "./data/chunks.txt"
+    chunk_store_path = str(CHUNK_STORE_PATH)
     
     print("=" * 80)
     print("🚀 INITIALISATION DE LA BASE DE DONNÉES RAG")
     print("=" * 80)
     
     # Étape 1: Télécharger le règlement
-    if not os.path.exists(regulation_file):
+    if args.corpus_dir:
+        documents = list_documents(args.corpus_dir)
+        print(f"\n✅ Étape 1/4: Corpus de {len(documents)} règlements: {args.corpus_dir}")
+        if not documents:
+            print("❌ Aucun fichier .txt trouvé dans le corpus")
+            return
+    elif not os.path.exists(regulation_file):
         print("\n📥 Étape 1/4: Téléchargement du règlement depuis Google Drive...")
         try:
             download_regulation(file_id, regulation_file)
@@ -32,31 +51,47 @@ def main():
     else:
         print(f"\n✅ Étape 1/4: Règlement déjà téléchargé: {regulation_file}")
     
-    # Étape 2: Parser le règlement en chunks
-    print("\n🔍 Étape 2/4: Parsing du règlement en chunks...")
-    with open(regulation_file, 'r', encoding='utf-8') as f:
-        text = f.read()
+    # Étapes 2 à 4 en pipeline: le règlement est lu ligne par ligne, chaque
+    # chunk est sauvegardé puis indexé au fil de l'eau (mémoire bornée)
+    print("\n🔍 Étape 2/4: Parsing du règlement en chunks (lecture incrémentale)...")
+    print(f"💾 Étape 3/4: Sauvegarde des chunks dans le chunk store {chunk_store_path}")
+    print("🔄 Étape 4/4: Indexation dans la base vectorielle...")
+    
+    # Indexation seulement: ni chargement du LLM, ni préchauffage, ni pings
+    # (les composants utilisés se chargent à la demande)
+    rag = RAGSystem(preload=False, warmup=False)
+    n_chunks = 0
     
-    chunks = parse_regulation_to_chunks(text)
-    print(f"✅ {len(chunks)} chunks créés")
+    if args.corpus_dir:
+        # Parsing des documents en parallèle, un processus par cœur
+        source = iter_corpus_chunks(args.corpus_dir, workers=CORPUS_PARSE_WORKERS or None, documents=documents)
+    else:
+        source = iter_regulation_file(regulation_file)
     
-    # Étape 3: Sauvegarder les chunks
-    print("\n💾 Étape 3/4: Sauvegarde des chunks...")
-    save_chunks_to_txt(chunks, chunks_file)
+    def parsed_chunks():
+        nonlocal n_chunks
+        with ChunkStoreWriter(chunk_store_path) as writer:
+            for chunk in source:
+                writer.add(chunk)
+                n_chunks += 1
+                yield chunk
     
-    # Étape 4: Indexer dans ChromaDB
-    print("\n🔄 Étape 4/4: Indexation dans ChromaDB...")
-    rag = RAGSystem()
-    rag.index_chunks(chunks, force_reindex=True)
+    start = time.perf_counter()
+    rag.index_chunks(parsed_chunks(), sync=True)
+    rag.reload_chunk_store()
+    elapsed = time.perf_counter() - start
     
     print("\n" + "=" * 80)
     print("✅ INITIALISATION TERMINÉE AVEC SUCCÈS!")
     print("=" * 80)
     print(f"\n📊 Statistiques:")
-    print(f"   - Chunks créés: {len(chunks)}")
-    print(f"   - Fichier du règlement: {regulation_file}")
-    print(f"   - Fichier des chunks: {chunks_file}")
-    print(f"   - Base de données: ./data/chroma_db/")
+    print(f"   - Chunks créés: {n_chunks} ({n_chunks / max(elapsed, 1e-9):.0f} chunks/s)")
+    if args.corpus_dir:
+        print(f"   - Corpus: {args.corpus_dir} ({len(documents)} règlements)")
+    else:
+        print(f"   - Fichier du règlement: {regulation_file}")
+    print(f"   - Chunk store: {chunk_store_path}")
+    print(f"   - Base de données ({rag.vector_store_backend}): {rag.vector_store_path}")
     print("\n🎉 Vous pouvez maintenant lancer l'application avec: python app.py\n")
 
 
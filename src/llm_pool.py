@@ -0,0 +1,425 @@
+"""
+Pool de serveurs LLM (Ollama) avec répartition de charge et bilans de santé.
+
+Chaque génération est envoyée au serveur ayant le moins de générations en
+cours (rapporté à sa capacité), dans la limite de max_concurrency par
+serveur (0: pas de limite); au-delà, elle attend qu'une place se libère sur
+n'importe quel serveur. Un serveur injoignable est écarté pendant retry_after secondes et
+la génération repart sur un autre serveur tant qu'aucun token n'a été
+produit (après, la réponse partielle ne peut pas être reprise: l'erreur est
+propagée). Des bilans de santé périodiques (GET /api/version) écartent et
+réintègrent les serveurs. Si tous les serveurs sont écartés, ils restent
+essayés en dernier recours.
+
+Chaque serveur garde le même client LLM (et donc ses connexions HTTP)
+pour toutes les générations.
+"""
+
+import asyncio
+import threading
+import time
+import urllib.request
+from collections import deque
+from typing import AsyncIterator, Callable, Deque, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from metrics import RAGMetrics
+
+try:
+    import httpx
+    HOST_ERRORS: Tuple[type, ...] = (OSError, httpx.TransportError)
+except ImportError:
+    HOST_ERRORS = (OSError,)
+
+
+class NoBackendAvailable(RuntimeError):
+    """Aucun serveur LLM n'a pu traiter la génération."""
+
+
+def parse_host(spec: str, default_max_concurrency: int) -> Tuple[str, int]:
+    """
+    Lit une adresse de serveur, éventuellement suivie de sa capacité.
+
+    Args:
+        spec: "http://hôte:11434" ou "http://hôte:11434=8"
+        default_max_concurrency: Capacité si elle n'est pas précisée
+
+    Returns:
+        Tuple (URL, générations simultanées au plus)
+    """
+    url, _, capacity = spec.strip().rpartition("=")
+    if url and capacity.isdigit():
+        return url.rstrip("/"), int(capacity)
+    return spec.strip().rstrip("/"), default_max_concurrency
+
+
+class LLMBackend:
+    """Un serveur LLM du pool."""
+
+    def __init__(self, host: str, llm, ping_llm=None, max_concurrency: int = 4):
+        """
+        Args:
+            host: URL du serveur
+            llm: Client de génération (interface stream/astream/invoke de LangChain)
+            ping_llm: Client des pings de maintien en mémoire (par défaut, llm)
+            max_concurrency: Générations simultanées au plus sur ce serveur (0: pas de limite)
+        """
+        self.host = host
+        self.llm = llm
+        self.ping_llm = ping_llm or llm
+        self.max_concurrency = max(0, max_concurrency)
+        self.outstanding = 0
+        self.served = 0
+        self.failures = 0
+        self.down_until = 0.0
+        self.last_error: Optional[str] = None
+
+    @property
+    def has_capacity(self) -> bool:
+        return not self.max_concurrency or self.outstanding < self.max_concurrency
+
+    @property
+    def load(self) -> float:
+        """Générations en cours rapportées à la capacité."""
+        return self.outstanding / (self.max_concurrency or 1)
+
+    @property
+    def healthy(self) -> bool:
+        return self.down_until <= time.monotonic()
+
+    def stats(self) -> Dict:
+        return {
+            'host': self.host,
+            'healthy': self.healthy,
+            'outstanding': self.outstanding,
+            'max_concurrency': self.max_concurrency,
+            'served': self.served,
+            'failures': self.failures,
+            'last_error': self.last_error,
+        }
+
+
+class LLMPool:
+    """Répartit les générations entre plusieurs serveurs LLM (threads et asyncio)."""
+
+    def __init__(
+        self,
+        backends: Sequence[LLMBackend],
+        queue_timeout: float = 60.0,
+        retry_after: float = 10.0,
+        metrics: Optional[RAGMetrics] = None
+    ):
+        """
+        Args:
+            backends: Serveurs du pool
+            queue_timeout: Attente maximale d'une place libre (secondes)
+            retry_after: Durée pendant laquelle un serveur en échec est écarté (secondes)
+            metrics: Métriques où publier l'état des serveurs (optionnel)
+        """
+        if not backends:
+            raise ValueError("Le pool LLM doit contenir au moins un serveur")
+        self.backends = list(backends)
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self._condition = threading.Condition()
+        self._async_waiters: Deque[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = deque()
+        self._health_stop = threading.Event()
+        self._health_thread: Optional[threading.Thread] = None
+
+        self._metrics = None
+        if metrics is not None:
+            registry = metrics.registry
+            self._metrics = (
+                registry.gauge("rag_llm_backend_outstanding", "Générations en cours, par serveur LLM", ("host",)),
+                registry.gauge("rag_llm_backend_healthy", "Serveur LLM disponible (1) ou écarté (0)", ("host",)),
+                registry.counter("rag_llm_failovers_total", "Générations reprises sur un autre serveur, par serveur en échec", ("host",)),
+            )
+            for backend in self.backends:
+                self._publish(backend)
+
+    def __len__(self) -> int:
+        return len(self.backends)
+
+    def _publish(self, backend: LLMBackend) -> None:
+        if self._metrics is not None:
+            self._metrics[0].set(backend.outstanding, host=backend.host)
+            self._metrics[1].set(1 if backend.healthy else 0, host=backend.host)
+
+    def _pick(self, exclude: Sequence[str]) -> Optional[LLMBackend]:
+        """Choisit un serveur avec une place libre (à appeler avec le verrou)."""
+        usable = [backend for backend in self.backends if backend.host not in exclude]
+        # Serveurs écartés: seulement en dernier recours
+        candidates = [
+            backend for backend in [b for b in usable if b.healthy] or usable
+            if backend.has_capacity
+        ]
+        if not candidates:
+            return None
+        backend = min(candidates, key=lambda b: (b.load, b.served))
+        backend.outstanding += 1
+        backend.served += 1
+        self._publish(backend)
+        return backend
+
+    def _check_exhausted(self, exclude: Sequence[str]) -> None:
+        if all(backend.host in exclude for backend in self.backends):
+            raise NoBackendAvailable("Tous les serveurs LLM ont échoué")
+
+    def _wake(self) -> None:
+        """Réveille les générations en attente d'une place (à appeler avec le verrou)."""
+        self._condition.notify_all()
+        while self._async_waiters:
+            loop, future = self._async_waiters.popleft()
+            loop.call_soon_threadsafe(_resolve, future)
+
+    def acquire(self, exclude: Sequence[str] = ()) -> LLMBackend:
+        """
+        Attend une place sur le serveur le moins chargé.
+
+        Args:
+            exclude: Serveurs à ne pas utiliser (déjà en échec pour cette génération)
+
+        Returns:
+            Serveur choisi (à libérer avec release)
+
+        Raises:
+            NoBackendAvailable: Tous les serveurs exclus, ou attente trop longue
+        """
+        deadline = time.monotonic() + self.queue_timeout
+        with self._condition:
+            while True:
+                self._check_exhausted(exclude)
+                backend = self._pick(exclude)
+                if backend is not None:
+                    return backend
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise NoBackendAvailable(f"Aucune place libre sur les serveurs LLM après {self.queue_timeout:.0f}s")
+                self._condition.wait(remaining)
+
+    async def aacquire(self, exclude: Sequence[str] = ()) -> LLMBackend:
+        """Version asynchrone de acquire (n'occupe pas de thread pendant l'attente)."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.queue_timeout
+        while True:
+            with self._condition:
+                self._check_exhausted(exclude)
+                backend = self._pick(exclude)
+                if backend is not None:
+                    return backend
+                future = loop.create_future()
+                self._async_waiters.append((loop, future))
+            remaining = deadline - loop.time()
+            try:
+                await asyncio.wait_for(future, max(0.0, remaining))
+            except asyncio.TimeoutError:
+                raise NoBackendAvailable(
+                    f"Aucune place libre sur les serveurs LLM après {self.queue_timeout:.0f}s"
+                ) from None
+            finally:
+                with self._condition:
+                    if (loop, future) in self._async_waiters:
+                        self._async_waiters.remove((loop, future))
+
+    def release(self, backend: LLMBackend) -> None:
+        """Libère la place d'une génération terminée."""
+        with self._condition:
+            backend.outstanding -= 1
+            self._publish(backend)
+            self._wake()
+
+    def mark_down(self, backend: LLMBackend, error: BaseException) -> None:
+        """Écarte un serveur pendant retry_after secondes."""
+        with self._condition:
+            backend.failures += 1
+            backend.last_error = f"{type(error).__name__}: {error}"
+            backend.down_until = time.monotonic() + self.retry_after
+            self._publish(backend)
+            # Les générations en attente peuvent ne plus avoir de serveur possible
+            self._wake()
+
+    def mark_up(self, backend: LLMBackend) -> None:
+        """Réintègre un serveur."""
+        with self._condition:
+            was_down = not backend.healthy
+            backend.down_until = 0.0
+            self._publish(backend)
+            if was_down:
+                self._wake()
+
+    def _failover(self, backend: LLMBackend, error: BaseException) -> None:
+        self.mark_down(backend, error)
+        if self._metrics is not None:
+            self._metrics[2].inc(host=backend.host)
+        print(f"⚠️  Serveur LLM {backend.host} en échec ({error}), génération reprise ailleurs")
+
+    def stream(self, prompt, on_acquire: Optional[Callable[[], None]] = None, **kwargs) -> Iterator[str]:
+        """
+        Génère une réponse en streaming sur le serveur le moins chargé.
+
+        Args:
+            prompt: Prompt complet
+            on_acquire: Fonction appelée quand la génération obtient une place
+                (fin de l'attente, début du prefill; à nouveau après une reprise)
+
+        Yields:
+            Tokens générés
+        """
+        tried: List[str] = []
+        last_error = None
+        while True:
+            try:
+                backend = self.acquire(tried)
+            except NoBackendAvailable as e:
+                raise e from last_error
+            if on_acquire is not None:
+                on_acquire()
+            started = False
+            tokens = None
+            try:
+                tokens = backend.llm.stream(prompt, **kwargs)
+                for token in tokens:
+                    started = True
+                    yield token
+                return
+            except HOST_ERRORS as e:
+                if started:
+                    self.mark_down(backend, e)
+                    raise
+                self._failover(backend, e)
+                tried.append(backend.host)
+                last_error = e
+            finally:
+                if hasattr(tokens, 'close'):
+                    tokens.close()
+                self.release(backend)
+
+    async def astream(self, prompt, on_acquire: Optional[Callable[[], None]] = None, **kwargs) -> AsyncIterator[str]:
+        """Version asynchrone de stream."""
+        tried: List[str] = []
+        last_error = None
+        while True:
+            try:
+                backend = await self.aacquire(tried)
+            except NoBackendAvailable as e:
+                raise e from last_error
+            if on_acquire is not None:
+                on_acquire()
+            started = False
+            tokens = None
+            try:
+                tokens = backend.llm.astream(prompt, **kwargs)
+                async for token in tokens:
+                    started = True
+                    yield token
+                return
+            except HOST_ERRORS as e:
+                if started:
+                    self.mark_down(backend, e)
+                    raise
+                self._failover(backend, e)
+                tried.append(backend.host)
+                last_error = e
+            finally:
+                if hasattr(tokens, 'aclose'):
+                    await tokens.aclose()
+                self.release(backend)
+
+    def invoke(self, prompt, **kwargs) -> str:
+        """Génère une réponse complète."""
+        if hasattr(prompt, 'to_string'):
+            prompt = prompt.to_string()
+        return "".join(self.stream(prompt, **kwargs))
+
+    def ping(self, prompt: str = "OK") -> Dict[str, float]:
+        """
+        Envoie une génération minimale à chaque serveur (chargement du modèle).
+
+        Returns:
+            Durée du ping de chaque serveur joignable (secondes)
+
+        Raises:
+            Exception: Erreur du dernier serveur si aucun n'a répondu
+        """
+        durations, error = {}, None
+        for backend in self.backends:
+            start = time.perf_counter()
+            try:
+                backend.ping_llm.invoke(prompt)
+            except Exception as e:
+                error = e
+                if isinstance(e, HOST_ERRORS):
+                    self.mark_down(backend, e)
+                continue
+            durations[backend.host] = time.perf_counter() - start
+        if not durations and error is not None:
+            raise error
+        return durations
+
+    def check_health(self, timeout: float = 2.0, probe: Optional[Callable[[str, float], None]] = None) -> Dict[str, bool]:
+        """
+        Vérifie que chaque serveur répond, et met à jour son état.
+
+        Args:
+            timeout: Délai de réponse maximal (secondes)
+            probe: Fonction (URL, timeout) levant une exception si le serveur
+                ne répond pas (par défaut, GET /api/version)
+
+        Returns:
+            État de chaque serveur
+        """
+        probe = probe or _probe_version
+        states = {}
+        for backend in self.backends:
+            try:
+                probe(backend.host, timeout)
+            except Exception as e:
+                if backend.healthy:
+                    print(f"⚠️  Serveur LLM {backend.host} injoignable: {e}")
+                self.mark_down(backend, e)
+                states[backend.host] = False
+            else:
+                if not backend.healthy:
+                    print(f"✅ Serveur LLM {backend.host} de nouveau disponible")
+                self.mark_up(backend)
+                states[backend.host] = True
+        return states
+
+    def start_health_checks(self, interval: float) -> None:
+        """
+        Démarre les bilans de santé périodiques.
+
+        Args:
+            interval: Intervalle entre deux bilans (secondes)
+        """
+        if self._health_thread is not None and self._health_thread.is_alive():
+            return
+
+        def check():
+            while not self._health_stop.wait(interval):
+                self.check_health()
+
+        self._health_stop.clear()
+        self._health_thread = threading.Thread(target=check, name="rag-llm-health", daemon=True)
+        self._health_thread.start()
+
+    def stop_health_checks(self) -> None:
+        """Arrête les bilans de santé périodiques."""
+        self._health_stop.set()
+        if self._health_thread is not None:
+            self._health_thread.join()
+            self._health_thread = None
+
+    def stats(self) -> List[Dict]:
+        """État de chaque serveur (pour /health)."""
+        with self._condition:
+            return [backend.stats() for backend in self.backends]
+
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+def _probe_version(host: str, timeout: float) -> None:
+    with urllib.request.urlopen(f"{host}/api/version", timeout=timeout) as response:
+        response.read()
@@ -0,0 +1,425 @@
+"""
+Métriques du système RAG exposées au format texte de Prometheus.
+Compteurs, jauges et histogrammes à labels (sans dépendance externe),
+et mesures propres au RAG: durée de chaque étape d'une requête, délai
+avant le premier token, débit de génération, caches et taille du prompt.
+"""
+
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Bornes des histogrammes
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_RATE_BUCKETS = (1, 2, 5, 10, 20, 30, 50, 75, 100, 200, 500)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 10, 15, 20, 50)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+PROMPT_TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+# Étapes d'une requête (label 'stage' de rag_stage_seconds)
+STAGES = (
+    'answer_cache',   # Recherche d'une réponse en cache
+    'route',          # Accès direct aux articles/points cités
+    'encode',         # Encodage des questions
+    'vector_search',  # Requête à la base vectorielle
+    'hydrate',        # Lecture du texte des chunks dans le chunk store
+    'context',        # Construction du contexte (budget de tokens)
+    'prompt',         # Formatage du prompt
+    'llm_queue',      # Attente d'une place sur un serveur LLM (LLMPool)
+    'llm_prefill',    # Envoi du prompt jusqu'au premier token du LLM
+    'llm_decode',     # Premier au dernier token du LLM
+)
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    escaped = (
+        str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for value in values
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+
+class _Metric:
+    """Base des métriques: valeurs indexées par les valeurs de leurs labels."""
+
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], object] = {}
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Labels attendus pour {self.name}: {self.labelnames}, reçus: {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        """Rend la métrique au format texte de Prometheus."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Compteur croissant."""
+
+    type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in items]
+
+
+class Gauge(Counter):
+    """Valeur instantanée (par exemple, requêtes en cours)."""
+
+    type = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """Histogramme à bornes fixes (compte cumulé par borne, somme et nombre)."""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['counts'][i] += 1
+                    break
+            state['sum'] += value
+            state['count'] += 1
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """Mesure la durée du bloc (en secondes)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def snapshot(self, **labels) -> Dict:
+        """
+        Retourne l'état d'une série.
+
+        Returns:
+            Dictionnaire {'count', 'sum', 'buckets': [(borne, compte cumulé)]}
+        """
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            if state is None:
+                return {'count': 0, 'sum': 0.0, 'buckets': []}
+            cumulative, total = [], 0
+            for bound, count in zip(self.buckets, state['counts']):
+                total += count
+                cumulative.append((bound, total))
+            return {'count': state['count'], 'sum': state['sum'], 'buckets': cumulative}
+
+    def label_values(self) -> List[Tuple[str, ...]]:
+        """Valeurs des labels des séries observées."""
+        with self._lock:
+            return sorted(self._values)
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key in self.label_values():
+            state = self.snapshot(**dict(zip(self.labelnames, key)))
+            names = self.labelnames + ("le",)
+            for bound, count in state['buckets']:
+                lines.append(f"{self.name}_bucket{_format_labels(names, key + (_format_value(bound),))} {count}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(state['sum'])}")
+            lines.append(f"{self.name}_count{labels} {state['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    """Ensemble de métriques rendues ensemble (/metrics)."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Métrique déjà enregistrée: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """Rend toutes les métriques au format texte de Prometheus."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+class RequestTimer:
+    """Mesure d'une requête en cours (voir RAGMetrics.request)."""
+
+    def __init__(self, metrics: "RAGMetrics", mode: str):
+        self.metrics = metrics
+        self.mode = mode
+        self.start = time.perf_counter()
+        self.first_token_at: Optional[float] = None
+
+    def first_token(self) -> None:
+        """Enregistre l'envoi de la première partie de la réponse (TTFT)."""
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+            self.metrics.ttft_seconds.observe(self.first_token_at - self.start, mode=self.mode)
+
+
+class GenerationTimer:
+    """Mesure d'une génération du LLM (voir RAGMetrics.timed_tokens)."""
+
+    def __init__(self, metrics: "RAGMetrics"):
+        self.metrics = metrics
+        self.start = time.perf_counter()
+
+    def acquired(self) -> None:
+        """Enregistre l'attente d'une place sur un serveur LLM; le prefill démarre ensuite."""
+        now = time.perf_counter()
+        self.metrics.stage_seconds.observe(now - self.start, stage='llm_queue')
+        self.start = now
+
+
+class RAGMetrics:
+    """Métriques d'un système RAG."""
+
+    def __init__(self, registry: Optional[MetricsRegistry] = None):
+        """
+        Args:
+            registry: Registre où déclarer les métriques (par défaut, un registre propre)
+        """
+        self.registry = registry or MetricsRegistry()
+        r = self.registry
+        self.requests = r.counter(
+            "rag_requests_total", "Requêtes traitées, par mode et statut", ("mode", "status")
+        )
+        self.in_flight = r.gauge("rag_requests_in_flight", "Requêtes en cours", ("mode",))
+        self.request_seconds = r.histogram(
+            "rag_request_seconds", "Durée totale des requêtes (secondes)", ("mode",)
+        )
+        self.ttft_seconds = r.histogram(
+            "rag_time_to_first_token_seconds", "Délai avant la première partie de la réponse (secondes)", ("mode",)
+        )
+        self.stage_seconds = r.histogram(
+            "rag_stage_seconds", "Durée de chaque étape d'une requête (secondes)", ("stage",)
+        )
+        self.tokens_per_second = r.histogram(
+            "rag_llm_tokens_per_second", "Débit de génération du LLM après le premier token", (),
+            TOKEN_RATE_BUCKETS
+        )
+        self.generated_tokens = r.counter("rag_llm_generated_tokens_total", "Tokens générés par le LLM")
+        self.single_flight = r.counter(
+            "rag_single_flight_total",
+            "Requêtes ayant démarré une génération (leader) ou rejoint une génération en cours (follower)",
+            ("role",)
+        )
+        self.micro_batch_size = r.histogram(
+            "rag_micro_batch_size", "Questions traitées par appel regroupé, par opération", ("op",),
+            BATCH_SIZE_BUCKETS
+        )
+        self.cache_lookups = r.counter(
+            "rag_cache_lookups_total", "Consultations des caches, par cache et résultat", ("cache", "result")
+        )
+        self.chunks_retrieved = r.histogram(
+            "rag_chunks_retrieved", "Chunks placés dans le contexte, par question", (), COUNT_BUCKETS
+        )
+        self.prompt_prefix_tokens = r.gauge(
+            "rag_prompt_prefix_tokens", "Tokens du préfixe constant du prompt (réutilisable par le cache KV du LLM)"
+        )
+        self.prompt_tokens = r.histogram(
+            "rag_prompt_context_tokens", "Taille du contexte envoyé au LLM (tokens)", (), PROMPT_TOKEN_BUCKETS
+        )
+
+    def stage(self, name: str):
+        """Context manager mesurant la durée d'une étape (voir STAGES)."""
+        return self.stage_seconds.time(stage=name)
+
+    def cache_lookup(self, cache: str, hit: bool, count: int = 1) -> None:
+        """Compte des consultations d'un cache."""
+        if count:
+            self.cache_lookups.inc(count, cache=cache, result="hit" if hit else "miss")
+
+    @contextmanager
+    def request(self, mode: str) -> Iterator[RequestTimer]:
+        """
+        Mesure une requête: durée, requêtes en cours et statut.
+
+        Une requête interrompue (générateur fermé, tâche annulée) a le statut
+        'cancelled', une exception le statut 'error'.
+
+        Args:
+            mode: Mode de la requête ('query', 'stream' ou 'batch')
+
+        Yields:
+            RequestTimer (pour enregistrer le premier token)
+        """
+        timer = RequestTimer(self, mode)
+        self.in_flight.inc(mode=mode)
+        status = "ok"
+        try:
+            yield timer
+        except (GeneratorExit, asyncio.CancelledError):
+            status = "cancelled"
+            raise
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            self.in_flight.dec(mode=mode)
+            self.requests.inc(mode=mode, status=status)
+            self.request_seconds.observe(time.perf_counter() - timer.start, mode=mode)
+
+    def observe_generation(self, start: float, first: Optional[float], n_tokens: int) -> None:
+        """
+        Enregistre une génération du LLM.
+
+        Args:
+            start: Instant d'envoi du prompt (perf_counter)
+            first: Instant du premier token (None si aucun token)
+            n_tokens: Nombre de tokens reçus
+        """
+        end = time.perf_counter()
+        self.generated_tokens.inc(n_tokens)
+        if first is None:
+            return
+        self.stage_seconds.observe(first - start, stage='llm_prefill')
+        self.stage_seconds.observe(end - first, stage='llm_decode')
+        if n_tokens > 1 and end > first:
+            self.tokens_per_second.observe((n_tokens - 1) / (end - first))
+
+    def generation(self) -> GenerationTimer:
+        """
+        Crée la mesure d'une génération, à passer à timed_tokens.
+
+        Sa méthode acquired est à appeler quand la génération obtient une
+        place sur un serveur (on_acquire de LLMPool.stream): l'attente est
+        alors comptée dans l'étape 'llm_queue' et non dans le prefill.
+        """
+        return GenerationTimer(self)
+
+    def timed_tokens(self, tokens, timer: Optional[GenerationTimer] = None):
+        """
+        Transmet les tokens d'une génération en mesurant prefill, décodage et débit.
+
+        Args:
+            tokens: Itérateur de tokens du LLM (la génération démarre à la première lecture)
+            timer: Mesure de la génération (voir generation), optionnelle
+
+        Yields:
+            Tokens inchangés
+        """
+        timer = timer or self.generation()
+        timer.start = time.perf_counter()
+        first = None
+        count = 0
+        try:
+            for token in tokens:
+                if first is None:
+                    first = time.perf_counter()
+                count += 1
+                yield token
+        finally:
+            self.observe_generation(timer.start, first, count)
+
+    async def atimed_tokens(self, tokens, timer: Optional[GenerationTimer] = None):
+        """Version asynchrone de timed_tokens."""
+        timer = timer or self.generation()
+        timer.start = time.perf_counter()
+        first = None
+        count = 0
+        try:
+            async for token in tokens:
+                if first is None:
+                    first = time.perf_counter()
+                count += 1
+                yield token
+        finally:
+            self.observe_generation(timer.start, first, count)
+
+    def stage_summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        Résume la durée des étapes (pour les benchmarks et les journaux).
+
+        Returns:
+            Dictionnaire {étape: {'count', 'mean_ms'}}
+        """
+        summary = {}
+        for (stage,) in self.stage_seconds.label_values():
+            state = self.stage_seconds.snapshot(stage=stage)
+            summary[stage] = {'count': state['count'], 'mean_ms': state['sum'] / max(state['count'], 1) * 1000}
+        return summary
+
+    def render(self) -> str:
+        """Rend les métriques au format texte de Prometheus."""
+        return self.registry.render()
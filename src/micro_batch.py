@@ -0,0 +1,104 @@
+"""
+Regroupement dynamique (micro-batching) des appels concurrents.
+Les éléments soumis par plusieurs threads sont rassemblés par un thread
+dédié pendant au plus max_wait_ms (ou jusqu'à max_batch_size éléments),
+traités en un seul appel, puis chaque appelant reçoit son résultat.
+Utilisé pour l'encodage des questions et la recherche vectorielle.
+
+Avec max_wait_ms=0, un lot contient les éléments arrivés pendant le
+traitement du lot précédent: aucune latence ajoutée à faible charge, des
+lots d'autant plus grands que la charge est forte.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Optional, Sequence
+
+
+class MicroBatcher:
+    """Regroupe les éléments soumis en lots traités par une seule fonction."""
+
+    def __init__(
+        self,
+        fn: Callable[[List], Sequence],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 0.0,
+        name: str = "rag-batch",
+        on_batch: Optional[Callable[[int], None]] = None
+    ):
+        """
+        Args:
+            fn: Fonction traitant un lot (liste d'éléments -> résultats dans le même ordre)
+            max_batch_size: Taille maximale d'un lot
+            max_wait_ms: Attente maximale d'autres éléments après le premier
+                (0: seulement ceux déjà en attente)
+            name: Nom du thread de traitement
+            on_batch: Fonction appelée avec la taille de chaque lot (métriques)
+        """
+        self.fn = fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.name = name
+        self.on_batch = on_batch
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                    self._thread.start()
+
+    def submit(self, item) -> Future:
+        """
+        Soumet un élément.
+
+        Returns:
+            Future du résultat de l'élément
+        """
+        self._ensure_started()
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def map(self, items: Sequence) -> List:
+        """
+        Soumet plusieurs éléments et attend leurs résultats.
+
+        Returns:
+            Résultats, dans l'ordre des éléments
+        """
+        futures = [self.submit(item) for item in items]
+        return [future.result() for future in futures]
+
+    def _collect(self) -> List:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            if self.on_batch is not None:
+                self.on_batch(len(batch))
+            try:
+                results = self.fn([item for item, _ in batch])
+                if len(results) != len(batch):
+                    # Sans ce contrôle, les appelants sans résultat attendraient indéfiniment
+                    raise ValueError(f"{self.name}: {len(results)} résultats pour un lot de {len(batch)} éléments")
+            except BaseException as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
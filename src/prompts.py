@@ -0,0 +1,79 @@
+"""
+Prompts du LLM.
+
+Disposition "prefix": toutes les consignes forment un long
+préfixe identique d'une requête à l'autre, placé avant la documentation.
+Ollama (llama.cpp) réutilise le cache KV du plus long préfixe commun avec le
+prompt précédent d'un slot: ce préfixe n'est évalué qu'une fois par slot au
+lieu d'une fois par requête, et des consignes détaillées n'ajoutent presque
+rien au prefill (et donc au TTFT). Les chunks de la documentation étant triés
+par position dans le règlement (voir build_context), deux questions sur les
+mêmes articles partagent aussi son début; les sources affichées restent dans
+l'ordre de pertinence.
+
+Disposition "legacy" (par défaut): prompt d'origine (consigne courte,
+chunks par ordre de pertinence).
+"""
+
+from typing import Dict
+
+
+SYSTEM_PREFIX = """Vous êtes un expert en règlements techniques. Vous répondez aux questions des utilisateurs à partir de la documentation fournie, extraite du règlement technique.
+
+Consignes:
+1. Répondez uniquement à partir de la documentation fournie. N'ajoutez pas d'exigences, de chiffres ni de délais qui n'y figurent pas.
+2. Si la documentation ne permet pas de répondre, dites-le clairement et indiquez quelles informations manquent.
+3. Citez les articles et points sur lesquels repose la réponse (par exemple "Статья 5, пункт 2"). N'inventez jamais de numéro d'article ou de point.
+4. Répondez dans la langue de la question: en français si la question est en français, en russe si elle est en russe.
+5. Commencez par une réponse directe en une ou deux phrases, puis détaillez les exigences applicables. Utilisez une liste lorsque plusieurs exigences s'appliquent.
+6. Reformulez les exigences au lieu de recopier la documentation, sauf pour une définition ou une formulation dont les termes exacts importent.
+7. Si plusieurs passages se contredisent ou s'appliquent à des cas différents, présentez chaque cas séparément.
+
+La documentation est découpée en sections séparées par ---SECTION---, classées par article et par point (et non par pertinence)."""
+
+PROMPT_TEMPLATES: Dict[str, str] = {
+    'prefix': SYSTEM_PREFIX + """
+
+Documentation:
+{context}
+
+Question: {question}
+
+Réponse:""",
+    'legacy': """Vous êtes un expert en règlements techniques. Basé sur la documentation fournie, répondez à la question de manière claire et précise en français ou en russe selon la langue de la question.
+
+Documentation:
+{context}
+
+Question: {question}
+
+Réponse (soyez précis, citez les articles et points pertinents):""",
+}
+
+
+def prompt_template(layout: str) -> str:
+    """
+    Retourne le template du prompt d'une disposition.
+
+    Args:
+        layout: Disposition ("prefix" ou "legacy")
+
+    Returns:
+        Template avec les variables {context} et {question}
+    """
+    if layout not in PROMPT_TEMPLATES:
+        raise ValueError(f"Disposition de prompt inconnue: {layout} (attendu: {', '.join(PROMPT_TEMPLATES)})")
+    return PROMPT_TEMPLATES[layout]
+
+
+def stable_prefix(layout: str) -> str:
+    """
+    Partie du prompt commune à toutes les requêtes (avant la documentation).
+
+    Args:
+        layout: Disposition ("prefix" ou "legacy")
+
+    Returns:
+        Préfixe constant du prompt
+    """
+    return prompt_template(layout).split("{context}", 1)[0]
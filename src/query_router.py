@@ -0,0 +1,143 @@
+"""
+Routage des questions citant explicitement un article ou un point.
+Les références ("статья 5", "пункт 3 статьи 5", "article 5, point 3"...)
+sont résolues via un index des métadonnées, sans passer par l'encodeur.
+"""
+
+import re
+from collections import defaultdict
+from typing import Collection, Dict, List, Optional, Sequence, Tuple
+
+
+ARTICLE_PATTERN = re.compile(
+    r"(?<!\w)(?:стать[а-яё]*|ст\.?|articles?|art\.?)\s*№?\s*"
+    r"(\d+(?:\s*(?:,|и|et|-)\s*\d+)*)",
+    re.IGNORECASE
+)
+POINT_PATTERN = re.compile(
+    r"(?<!\w)(?:пункт[а-яё]*|п\.|points?|paragraphes?|alinéas?|§)\s*(\d+)(?:\.(\d+))?",
+    re.IGNORECASE
+)
+
+Reference = Tuple[str, Optional[str]]
+
+
+def parse_references(question: str) -> List[Reference]:
+    """
+    Extrait les références d'articles et de points d'une question.
+
+    Un point est rattaché à la mention d'article la plus proche; la notation
+    "пункт 5.3" / "point 5.3" désigne le point 3 de l'article 5.
+
+    Args:
+        question: Question de l'utilisateur (russe ou français)
+
+    Returns:
+        Liste ordonnée de (article_num, point_num ou None)
+    """
+    articles = []  # (position, numéro)
+    for match in ARTICLE_PATTERN.finditer(question):
+        for number in re.findall(r"\d+", match.group(1)):
+            articles.append((match.start(), number))
+
+    references: List[Reference] = []
+    articles_with_points = set()
+    for match in POINT_PATTERN.finditer(question):
+        if match.group(2):
+            references.append((match.group(1), match.group(2)))
+            continue
+        if not articles:
+            continue
+        position, article = min(articles, key=lambda a: abs(a[0] - match.start()))
+        references.append((article, match.group(1)))
+        articles_with_points.add(position)
+
+    for position, article in articles:
+        if position not in articles_with_points:
+            references.append((article, None))
+
+    unique = []
+    for reference in references:
+        if reference not in unique:
+            unique.append(reference)
+    return unique
+
+
+class MetadataIndex:
+    """
+    Index article_num -> IDs et (article_num, point_num) -> IDs des chunks indexés.
+
+    Chaque entrée garde le document du chunk (doc_id, "" hors corpus) pour
+    restreindre le routage à une partie des documents.
+    """
+
+    def __init__(self, ids: Sequence[str] = (), metadatas: Sequence[Dict] = ()):
+        """
+        Construit l'index.
+
+        Args:
+            ids: IDs des chunks dans la base vectorielle
+            metadatas: Métadonnées correspondantes
+        """
+        self.articles: Dict[str, List[Tuple[str, str, str]]] = defaultdict(list)
+        self.points: Dict[Reference, List[Tuple[str, str]]] = defaultdict(list)
+
+        for doc_id, metadata in zip(ids, metadatas):
+            article = str(metadata.get('article_num'))
+            point = str(metadata.get('point_num'))
+            document = str(metadata.get('doc_id', ''))
+            self.articles[article].append((document, point, doc_id))
+            self.points[(article, point)].append((document, doc_id))
+
+        for entries in self.articles.values():
+            entries.sort(key=lambda entry: (entry[0], int(entry[1]) if entry[1].isdigit() else 0))
+
+    def __len__(self) -> int:
+        return sum(len(ids) for ids in self.points.values())
+
+    def article_ids(self, article_num: str, documents: Optional[Collection[str]] = None) -> List[str]:
+        """Retourne les IDs des chunks d'un article, dans l'ordre des points."""
+        return [
+            doc_id for document, _, doc_id in self.articles.get(article_num, [])
+            if documents is None or document in documents
+        ]
+
+    def point_ids(self, article_num: str, point_num: str, documents: Optional[Collection[str]] = None) -> List[str]:
+        """Retourne les IDs des chunks d'un point d'article."""
+        return [
+            doc_id for document, doc_id in self.points.get((article_num, point_num), [])
+            if documents is None or document in documents
+        ]
+
+    def plan(self, references: Sequence[Reference], n_results: int, documents: Optional[Collection[str]] = None) -> Dict:
+        """
+        Résout des références en chunks à récupérer directement.
+
+        Un point connu ou un article suffisamment court est récupéré
+        directement; les articles plus longs sont laissés à la recherche
+        dense, restreinte à ces articles.
+
+        Args:
+            references: Références extraites de la question
+            n_results: Nombre maximal de chunks
+            documents: Documents autorisés (None pour tous)
+
+        Returns:
+            Dictionnaire {'ids': IDs à récupérer directement,
+            'articles': articles à chercher par similarité}
+        """
+        direct_ids: List[str] = []
+        dense_articles: List[str] = []
+
+        for article, point in references:
+            ids = self.point_ids(article, point, documents) if point else []
+            if not ids:
+                ids = self.article_ids(article, documents)
+                if len(ids) > n_results:
+                    dense_articles.append(article)
+                    continue
+            for doc_id in ids:
+                if doc_id not in direct_ids:
+                    direct_ids.append(doc_id)
+
+        return {'ids': direct_ids[:n_results], 'articles': dense_articles}
@@ -1,18 +1,52 @@
 """
 Système RAG principal pour le règlement technique.
-Combine chunking, embeddings, ChromaDB et LLM pour répondre aux questions.
+Combine chunking, embeddings, base vectorielle (ChromaDB ou NumPy) et LLM
+pour répondre aux questions.
 """
 
 import os
+import re
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import List, Dict, Tuple
-from sentence_transformers import SentenceTransformer, util
-import chromadb
-from chromadb.config import Settings
-from langchain_ollama import OllamaLLM
-from langchain_core.prompts import PromptTemplate
+from typing import Callable, Iterable, Iterator, List, Dict, Sequence, Tuple, Optional
+import numpy as np
 
-from chunking import parse_regulation_to_chunks, load_chunks_from_txt, save_chunks_to_txt
+from config import (
+    EMBEDDING_CACHE_DIR, EMBEDDING_CACHE_ENABLED, EMBEDDING_CACHE_MAX_ENTRIES,
+    QUERY_EMBEDDING_CACHE_SIZE, ANSWER_CACHE_ENABLED, ANSWER_CACHE_SIMILARITY_THRESHOLD,
+    ANSWER_CACHE_TTL_SECONDS, ANSWER_CACHE_MAX_ENTRIES, RAG_BATCH_MAX_CONCURRENCY,
+    RAG_EXECUTOR_WORKERS, VECTOR_STORE_BACKEND, NUMPY_STORE_PATH, QUERY_ROUTER_ENABLED,
+    VECTOR_QUANTIZATION, VECTOR_RESCORE_FACTOR,
+    RAG_CONTEXT_MAX_TOKENS, RAG_CONTEXT_MAX_LENGTH, CONTEXT_TOKENIZER,
+    STREAM_FLUSH_INTERVAL_MS, STREAM_FLUSH_MAX_TOKENS, OLLAMA_KEEP_ALIVE,
+    WARMUP_ENABLED, KEEP_WARM_INTERVAL_SECONDS, EMBEDDING_BACKEND, MODELS_DIR,
+    INDEX_BATCH_SIZE, INDEX_ENCODE_PROCESSES, INDEX_MULTIPROCESS_MIN_CHUNKS, INDEX_STREAM_WINDOW,
+    CHUNK_STORE_PATH, VECTOR_STORE_DOCUMENTS, SINGLE_FLIGHT_ENABLED,
+    MICRO_BATCH_ENABLED, MICRO_BATCH_MAX_WAIT_MS, MICRO_BATCH_MAX_SIZE,
+    OLLAMA_HOSTS, OLLAMA_HOST_MAX_CONCURRENCY, LLM_QUEUE_TIMEOUT_SECONDS, LLM_HOST_RETRY_SECONDS,
+    LLM_HEALTH_CHECK_INTERVAL_SECONDS, PROMPT_LAYOUT
+)
+from answer_cache import SemanticAnswerCache
+from chunk_store import ChunkStore
+from llm_pool import LLMBackend, LLMPool, parse_host
+from metrics import RAGMetrics
+from micro_batch import MicroBatcher
+from single_flight import SingleFlight
+from encoders import encoder_cache_name, load_encoder
+from vector_store import VectorStore, create_vector_store
+from query_router import MetadataIndex, parse_references
+from context_builder import CONTEXT_SEPARATOR, TokenCounter, build_context, position_key
+from prompts import prompt_template, stable_prefix
+from streaming import coalesce_tokens, acoalesce_tokens
+from embedding_cache import EmbeddingCache, LRUCache, normalize_text
+from chunking import (
+    parse_regulation_to_chunks, iter_regulation_file, load_chunks_from_txt, save_chunks_to_txt,
+    compute_chunk_uid
+)
 
 
 class RAGSystem:
@@ -22,67 +56,400 @@ class RAGSystem:
         self, 
         embedding_model: str = 'multi-qa-mpnet-base-dot-v1',
         llm_model: str = 'llama3.2:latest',
-        chroma_db_path: str = './data/chroma_db'
+        ollama_hosts: Sequence[str] = OLLAMA_HOSTS,
+        chroma_db_path: str = './data/chroma_db',
+        embedding_backend: str = EMBEDDING_BACKEND,
+        embedding_cache_dir: Optional[str] = str(EMBEDDING_CACHE_DIR) if EMBEDDING_CACHE_ENABLED else None,
+        vector_store_backend: str = VECTOR_STORE_BACKEND,
+        numpy_store_path: str = str(NUMPY_STORE_PATH),
+        vector_quantization: str = VECTOR_QUANTIZATION,
+        chunk_store_path: str = str(CHUNK_STORE_PATH),
+        preload: bool = True,
+        warmup: bool = WARMUP_ENABLED
     ):
         """
         Initialise le système RAG.
         
+        Les composants lourds (modèle d'embeddings, base vectorielle, LLM) sont
+        importés et chargés en parallèle, en arrière-plan: le constructeur
+        retourne immédiatement et chaque composant est attendu à sa première
+        utilisation.
+        
         Args:
             embedding_model: Modèle SentenceTransformer pour les embeddings
             llm_model: Modèle Ollama pour la génération de réponses
+            ollama_hosts: URLs des serveurs Ollama (générations réparties entre
+                eux, capacité optionnelle après "=", ex. "http://gpu1:11434=8")
             chroma_db_path: Chemin de la base de données ChromaDB
+            embedding_backend: Backend de l'encodeur ("torch", "torch-int8",
+                "onnx" ou "onnx-int8")
+            embedding_cache_dir: Répertoire du cache persistant des embeddings
+                (None pour le désactiver)
+            vector_store_backend: Base vectorielle ("chroma" ou "numpy")
+            numpy_store_path: Répertoire de la base NumPy
+            vector_quantization: Codes parcourus par la base NumPy ("none",
+                "float16", "int8" ou "binary", candidats re-classés en float32)
+            chunk_store_path: Répertoire du chunk store (texte des chunks lu à
+                la demande si VECTOR_STORE_DOCUMENTS est désactivé)
+            preload: Démarrer immédiatement le chargement des composants
+                (sinon, au premier besoin)
+            warmup: Préchauffer l'encodeur et le LLM une fois chargés, puis
+                les maintenir en mémoire par des pings périodiques
         """
         print("🔄 Initialisation du système RAG...")
         
-        # Modèle d'embeddings
-        print(f"📦 Chargement du modèle d'embeddings: {embedding_model}")
-        self.embedding_model = SentenceTransformer(embedding_model)
+        self.embedding_model_name = embedding_model
+        self.embedding_backend = embedding_backend
+        self.llm_model_name = llm_model
+        self.ollama_hosts = list(ollama_hosts)
+        self.vector_store_backend = vector_store_backend
+        self.vector_store_path = chroma_db_path if vector_store_backend == "chroma" else numpy_store_path
+        self.vector_quantization = vector_quantization
+        self.collection_name = "regulation_collection"
+        
+        # Texte des chunks: dans la base vectorielle ou dans le chunk store
+        self.store_documents = VECTOR_STORE_DOCUMENTS
+        self.chunk_store_path = chunk_store_path
+        self._chunk_store: Optional[ChunkStore] = None
         
-        # ChromaDB
-        print(f"💾 Initialisation de ChromaDB: {chroma_db_path}")
-        self.chroma_client = chromadb.PersistentClient(
-            path=chroma_db_path,
-            settings=Settings(anonymized_telemetry=False)
+        # Composants chargés en arrière-plan
+        self._loaders = {
+            'embedding_model': self._load_embedding_model,
+            'vector_store': self._load_vector_store,
+            'llm': self._load_llm,
+        }
+        if warmup:
+            self._loaders['warmup'] = self.warm_up
+        self._components: Dict[str, Future] = {}
+        self._components_lock = threading.Lock()
+        self._loader_pool = ThreadPoolExecutor(
+            max_workers=len(self._loaders), thread_name_prefix="rag-init"
         )
         
-        # Collection ChromaDB
-        self.collection_name = "regulation_collection"
-        try:
-            self.collection = self.chroma_client.get_collection(name=self.collection_name)
-            print(f"✅ Collection existante chargée: {self.collection_name}")
-        except:
-            self.collection = self.chroma_client.create_collection(
-                name=self.collection_name,
-                metadata={"hnsw:space": "cosine"}
+        # Cache persistant des embeddings
+        self.embedding_cache = None
+        if embedding_cache_dir:
+            self.embedding_cache = EmbeddingCache(
+                embedding_cache_dir,
+                model_name=encoder_cache_name(embedding_model, embedding_backend),
+                max_entries=EMBEDDING_CACHE_MAX_ENTRIES
             )
-            print(f"✅ Nouvelle collection créée: {self.collection_name}")
+            print(f"🗃️  Cache d'embeddings: {len(self.embedding_cache)} vecteurs en cache")
+        
+        # Cache LRU des embeddings de questions
+        self.query_embedding_cache = LRUCache(QUERY_EMBEDDING_CACHE_SIZE)
+        
+        # Pool de threads pour les étapes bloquantes des API asynchrones
+        self._executor = ThreadPoolExecutor(
+            max_workers=RAG_EXECUTOR_WORKERS, thread_name_prefix="rag-cpu"
+        )
+        
+        # Cache sémantique des réponses
+        self.answer_cache = SemanticAnswerCache(
+            similarity_threshold=ANSWER_CACHE_SIMILARITY_THRESHOLD,
+            ttl_seconds=ANSWER_CACHE_TTL_SECONDS,
+            max_entries=ANSWER_CACHE_MAX_ENTRIES if ANSWER_CACHE_ENABLED else 0
+        )
+        
+        # Routage des questions citant un article/point (index construit à la demande)
+        self.query_router_enabled = QUERY_ROUTER_ENABLED
+        self._metadata_index: Optional[MetadataIndex] = None
+        
+        # Budget du contexte envoyé au LLM
+        self.token_counter = TokenCounter(CONTEXT_TOKENIZER or None)
+        self.context_max_tokens = RAG_CONTEXT_MAX_TOKENS
+        self.context_max_chars = RAG_CONTEXT_MAX_LENGTH
+        
+        # Disposition du prompt ("prefix": préfixe constant réutilisé par le cache KV du LLM)
+        self.prompt_layout = PROMPT_LAYOUT
+        
+        # Regroupement des tokens en trames de streaming
+        self.stream_flush_interval = STREAM_FLUSH_INTERVAL_MS / 1000
+        self.stream_flush_max_tokens = STREAM_FLUSH_MAX_TOKENS
+        
+        # Préchauffage et maintien en mémoire du LLM
+        self.keep_alive = OLLAMA_KEEP_ALIVE
+        self.keep_warm_interval = KEEP_WARM_INTERVAL_SECONDS
+        self.warmup_timings: Dict[str, float] = {}
+        self._keep_warm_stop = threading.Event()
+        self._keep_warm_thread: Optional[threading.Thread] = None
+        
+        # Durées par étape, TTFT, débit du LLM et caches (format Prometheus)
+        self.metrics = RAGMetrics()
+        
+        # Questions identiques en cours: une seule recherche et une seule génération
+        self.single_flight_enabled = SINGLE_FLIGHT_ENABLED
+        self.single_flight = SingleFlight()
+        
+        # Questions de requêtes concurrentes encodées et cherchées ensemble
+        self.micro_batch_enabled = MICRO_BATCH_ENABLED
+        self.query_encoder = MicroBatcher(
+            self._encode_query_batch, MICRO_BATCH_MAX_SIZE, MICRO_BATCH_MAX_WAIT_MS,
+            name="rag-encode", on_batch=lambda n: self.metrics.micro_batch_size.observe(n, op="encode")
+        )
+        self.query_searcher = MicroBatcher(
+            self._search_batch, MICRO_BATCH_MAX_SIZE, MICRO_BATCH_MAX_WAIT_MS,
+            name="rag-search", on_batch=lambda n: self.metrics.micro_batch_size.observe(n, op="search")
+        )
+        
+        if preload:
+            self.start_loading()
+        
+        print("✅ Système RAG initialisé (composants en cours de chargement)\n")
+    
+    def _load_embedding_model(self):
+        """Importe et charge le modèle d'embeddings avec le backend configuré."""
+        print(f"📦 Chargement du modèle d'embeddings: {self.embedding_model_name} ({self.embedding_backend})")
+        model = load_encoder(self.embedding_model_name, self.embedding_backend, MODELS_DIR)
+        print(f"✅ Modèle d'embeddings chargé: {self.embedding_model_name}")
+        return model
+    
+    def _load_vector_store(self):
+        """Ouvre la base vectorielle."""
+        print(f"💾 Initialisation de la base vectorielle ({self.vector_store_backend}): {self.vector_store_path}")
+        return create_vector_store(
+            self.vector_store_backend, self.vector_store_path, self.collection_name,
+            quantization=self.vector_quantization, rescore_factor=VECTOR_RESCORE_FACTOR
+        )
+    
+    def _load_llm(self):
+        """Importe LangChain et construit le pool de serveurs LLM, le prompt et la chaîne."""
+        print(f"🤖 Initialisation du LLM: {self.llm_model_name}")
+        from langchain_ollama import OllamaLLM
+        from langchain_core.prompts import PromptTemplate
         
-        # LLM
-        print(f"🤖 Initialisation du LLM: {llm_model}")
-        self.llm = OllamaLLM(model=llm_model, temperature=0.1)
+        # Un client par serveur, réutilisé (connexions HTTP conservées)
+        backends = []
+        for spec in self.ollama_hosts:
+            host, max_concurrency = parse_host(spec, OLLAMA_HOST_MAX_CONCURRENCY)
+            backends.append(LLMBackend(
+                host,
+                OllamaLLM(model=self.llm_model_name, base_url=host, temperature=0.1, keep_alive=self.keep_alive),
+                # Génération d'un seul token, pour le préchauffage et les pings
+                OllamaLLM(model=self.llm_model_name, base_url=host, num_predict=1, keep_alive=self.keep_alive),
+                max_concurrency
+            ))
+        llm = LLMPool(backends, LLM_QUEUE_TIMEOUT_SECONDS, LLM_HOST_RETRY_SECONDS, self.metrics)
+        if len(backends) > 1:
+            print(f"🖧  {len(backends)} serveurs LLM: {', '.join(b.host for b in backends)}")
+        # Aussi avec un seul serveur: un serveur injoignable apparaît dans /health
+        # sans attendre l'échec d'une requête (il reste essayé en dernier recours)
+        if LLM_HEALTH_CHECK_INTERVAL_SECONDS > 0:
+            llm.start_health_checks(LLM_HEALTH_CHECK_INTERVAL_SECONDS)
         
-        # Prompt template
-        self.prompt_template = PromptTemplate(
+        # Prompt template (voir prompts.py)
+        self._prompt_template = PromptTemplate(
             input_variables=["context", "question"],
-            template="""Vous êtes un expert en règlements techniques. Basé sur la documentation fournie, répondez à la question de manière claire et précise en français ou en russe selon la langue de la question.
-
-Documentation:
-{context}
-
-Question: {question}
-
-Réponse (soyez précis, citez les articles et points pertinents):"""
+            template=prompt_template(self.prompt_layout)
         )
+        self.metrics.prompt_prefix_tokens.set(self.token_counter.count(stable_prefix(self.prompt_layout)))
         
         # Chaîne de traitement
-        self.chain = self.prompt_template | self.llm
+        self._chain = self._prompt_template | llm.invoke
+        
+        return llm
+    
+    def warm_up(self) -> Dict[str, float]:
+        """
+        Préchauffe l'encodeur et le LLM pour éviter la latence de la première requête.
+        
+        Exécute un encodage factice (première passe du modèle) et une génération
+        minimale (chargement du modèle par Ollama), puis démarre les pings de
+        maintien en mémoire. Un échec est signalé sans interrompre le service.
+        
+        Returns:
+            Durées des étapes (secondes)
+        """
+        print("🔥 Préchauffage des modèles...")
+        
+        start = time.perf_counter()
+        self._component('embedding_model').encode(["préchauffage"], show_progress_bar=False)
+        self.warmup_timings['encoder'] = time.perf_counter() - start
+        print(f"⏱️  Encodeur préchauffé en {self.warmup_timings['encoder']:.2f}s")
+        
+        self._component('llm')
+        try:
+            self.warmup_timings['llm'] = self._ping()
+            print(f"⏱️  LLM préchauffé en {self.warmup_timings['llm']:.2f}s (keep_alive={self.keep_alive})")
+        except Exception as e:
+            print(f"⚠️  Préchauffage du LLM impossible: {e}")
+        
+        if self.keep_warm_interval > 0:
+            self.start_keep_warm(self.keep_warm_interval)
+        
+        return dict(self.warmup_timings)
+    
+    def _ping(self) -> float:
+        """
+        Envoie une génération d'un token à chaque serveur LLM (recharge le
+        modèle si nécessaire). Le prompt du ping est le préfixe constant des
+        prompts: son cache KV est prêt pour la requête suivante.
+        
+        Returns:
+            Durée du ping le plus long (secondes)
+        """
+        return max(self.llm.ping(stable_prefix(self.prompt_layout)).values())
+    
+    def start_keep_warm(self, interval: float) -> None:
+        """
+        Démarre les pings périodiques qui maintiennent le LLM en mémoire.
+        
+        Args:
+            interval: Intervalle entre deux pings (secondes)
+        """
+        if self._keep_warm_thread is not None and self._keep_warm_thread.is_alive():
+            return
+        
+        def keep_warm():
+            while not self._keep_warm_stop.wait(interval):
+                try:
+                    duration = self._ping()
+                    print(f"⏱️  Ping keep-warm du LLM: {duration:.2f}s")
+                except Exception as e:
+                    print(f"⚠️  Ping keep-warm du LLM en échec: {e}")
+        
+        self._keep_warm_stop.clear()
+        self._keep_warm_thread = threading.Thread(target=keep_warm, name="rag-keep-warm", daemon=True)
+        self._keep_warm_thread.start()
+        print(f"♨️  Pings keep-warm toutes les {interval:.0f}s")
+    
+    def stop_keep_warm(self) -> None:
+        """Arrête les pings périodiques."""
+        self._keep_warm_stop.set()
+        if self._keep_warm_thread is not None:
+            self._keep_warm_thread.join()
+            self._keep_warm_thread = None
+    
+    def start_loading(self) -> None:
+        """Démarre en parallèle le chargement de tous les composants non encore lancés."""
+        with self._components_lock:
+            for name, loader in self._loaders.items():
+                if name not in self._components:
+                    self._components[name] = self._loader_pool.submit(loader)
+    
+    def _component(self, name: str):
+        """
+        Retourne un composant, en attendant la fin de son chargement.
+        
+        Args:
+            name: Nom du composant ('embedding_model', 'vector_store' ou 'llm')
+            
+        Returns:
+            Composant chargé
+        """
+        future = self._components.get(name)
+        if future is None:
+            self.start_loading()
+            future = self._components[name]
+        return future.result()
+    
+    def _set_component(self, name: str, value) -> None:
+        """Remplace un composant par une instance déjà construite."""
+        future = Future()
+        future.set_result(value)
+        with self._components_lock:
+            self._components[name] = future
+    
+    @property
+    def embedding_model(self):
+        """Modèle d'embeddings (SentenceTransformer)."""
+        return self._component('embedding_model')
+    
+    @embedding_model.setter
+    def embedding_model(self, value) -> None:
+        self._set_component('embedding_model', value)
+    
+    @property
+    def vector_store(self) -> VectorStore:
+        """Base vectorielle."""
+        return self._component('vector_store')
+    
+    @vector_store.setter
+    def vector_store(self, value: VectorStore) -> None:
+        self._set_component('vector_store', value)
+    
+    @property
+    def llm(self):
+        """Pool des serveurs LLM Ollama (LLMPool)."""
+        return self._component('llm')
+    
+    @property
+    def prompt_template(self):
+        """Prompt template du LLM."""
+        self._component('llm')
+        return self._prompt_template
+    
+    @property
+    def chain(self):
+        """Chaîne prompt | LLM."""
+        self._component('llm')
+        return self._chain
+    
+    def readiness(self) -> Dict:
+        """
+        Retourne l'état de chargement des composants (pour les health checks).
+        
+        Returns:
+            Dictionnaire {'ready': bool, 'components': {nom: état}}, l'état étant
+            'idle', 'loading', 'ready' ou 'error: ...' (le préchauffage
+            apparaît comme composant 'warmup' s'il est activé), plus
+            'llm_backends' (état de chaque serveur LLM) une fois le LLM chargé
+        """
+        components = {}
+        for name in self._loaders:
+            future = self._components.get(name)
+            if future is None:
+                components[name] = 'idle'
+            elif not future.done():
+                components[name] = 'loading'
+            elif future.exception() is not None:
+                components[name] = f"error: {future.exception()}"
+            else:
+                components[name] = 'ready'
         
-        print("✅ Système RAG initialisé avec succès!\n")
+        status = {
+            'ready': all(state == 'ready' for state in components.values()),
+            'components': components,
+        }
+        if components['llm'] == 'ready':
+            status['llm_backends'] = self.llm.stats()
+        return status
+    
+    def wait_until_ready(self, timeout: Optional[float] = None) -> bool:
+        """
+        Attend la fin du chargement de tous les composants.
+        
+        Args:
+            timeout: Délai maximal d'attente (secondes)
+            
+        Returns:
+            True si tous les composants sont prêts
+        """
+        self.start_loading()
+        done, not_done = wait(list(self._components.values()), timeout=timeout)
+        return not not_done and all(future.exception() is None for future in done)
+    
+    async def aensure_ready(self) -> None:
+        """
+        Attend, sans bloquer la boucle d'événements, le chargement des composants
+        utilisés par une requête.
+        
+        Le préchauffage n'est pas attendu (un modèle froid se charge à la
+        première génération) et son échec ne fait pas échouer les requêtes:
+        il n'apparaît que dans readiness().
+        """
+        self.start_loading()
+        for name in ('embedding_model', 'vector_store', 'llm'):
+            await asyncio.wrap_future(self._components[name])
     
     def load_regulation(self, regulation_file: str) -> List[Dict]:
         """
         Charge et parse le règlement.
         
+        Pour les gros fichiers, préférer iter_regulation_file (chunking), qui
+        produit les chunks au fil de la lecture et peut être passé directement
+        à index_chunks.
+        
         Args:
             regulation_file: Chemin vers le fichier du règlement
             
@@ -91,108 +458,606 @@ Réponse (soyez précis, citez les articles et points pertinents):"""
         """
         print(f"📖 Chargement du règlement: {regulation_file}")
         
-        with open(regulation_file, 'r', encoding='utf-8') as f:
-            text = f.read()
-        
         print("🔍 Parsing du règlement en chunks...")
-        chunks = parse_regulation_to_chunks(text)
+        chunks = list(iter_regulation_file(regulation_file))
         print(f"✅ {len(chunks)} chunks créés")
         
         return chunks
     
-    def index_chunks(self, chunks: List[Dict], force_reindex: bool = False) -> None:
+    def index_chunks(self, chunks: Iterable[Dict], force_reindex: bool = False, sync: bool = False) -> None:
         """
-        Indexe les chunks dans ChromaDB avec leurs embeddings.
+        Indexe les chunks dans la base vectorielle avec leurs embeddings.
+        
+        Les chunks peuvent être fournis par un générateur (iter_regulation_file):
+        ils sont alors encodés et écrits par fenêtres de INDEX_STREAM_WINDOW
+        chunks, sans jamais matérialiser le règlement complet.
         
         Args:
-            chunks: Liste de chunks à indexer
+            chunks: Chunks à indexer (liste ou itérable)
             force_reindex: Si True, réindexe même si la collection n'est pas vide
+            sync: Si True, synchronise incrémentalement la collection avec les chunks
+                (seuls les chunks nouveaux ou modifiés sont encodés, les chunks
+                disparus sont supprimés)
         """
+        if sync:
+            self.sync_chunks(chunks)
+            return
+        
         # Vérifier si la collection est déjà remplie
-        if self.collection.count() > 0 and not force_reindex:
-            print(f"ℹ️  Collection déjà indexée avec {self.collection.count()} documents")
+        if self.vector_store.count() > 0 and not force_reindex:
+            print(f"ℹ️  Collection déjà indexée avec {self.vector_store.count()} documents")
             return
         
-        print(f"🔄 Indexation de {len(chunks)} chunks...")
+        # Repartir d'une collection vide pour une réindexation complète
+        existing_ids = self.vector_store.get_ids()
+        if existing_ids:
+            print(f"🗑️  Suppression de {len(existing_ids)} documents existants...")
+            self.vector_store.delete(existing_ids)
         
-        # Extraire les textes
-        documents = [chunk['text'] for chunk in chunks]
+        print("🔄 Indexation des chunks...")
+        seen = set()
+        with self._index_encoder() as encode_fn:
+            for ids, window in self._chunk_windows(chunks, seen):
+                self._upsert_chunks(ids, window, encode_fn)
+        self.answer_cache.clear()
+        self.rebuild_metadata_index()
         
-        # Générer les embeddings
-        print("🧮 Génération des embeddings...")
-        embeddings = self.embedding_model.encode(documents, show_progress_bar=True)
+        print(f"✅ {len(seen)} chunks indexés\n")
+    
+    def sync_chunks(self, chunks: Iterable[Dict]) -> Dict[str, int]:
+        """
+        Synchronise la collection avec une nouvelle version des chunks.
         
-        # Préparer les métadonnées
-        metadatas = [
-            {
-                'id': chunk['id'],
-                'article_num': chunk['article_num'],
-                'article_title': chunk['article_title'],
-                'point_num': chunk['point_num']
-            }
-            for chunk in chunks
-        ]
+        Les IDs sont dérivés de l'ID du chunk (article.point) et d'un hash de
+        son contenu: un chunk inchangé garde son ID et n'est pas réencodé.
+        Les chunks nouveaux ou modifiés sont écrits au fil de l'itération; les
+        chunks obsolètes sont supprimés à la fin.
+        
+        Args:
+            chunks: Chunks complets du règlement (liste ou itérable)
+            
+        Returns:
+            Statistiques {'added': ..., 'deleted': ..., 'unchanged': ...}
+        """
+        existing_ids = set(self.vector_store.get_ids())
+        seen = set()
+        added = 0
+        
+        print("🔄 Synchronisation de la collection...")
+        with self._index_encoder() as encode_fn:
+            for ids, window in self._chunk_windows(chunks, seen, skip=existing_ids):
+                self._upsert_chunks(ids, window, encode_fn)
+                added += len(window)
         
-        # IDs uniques
-        ids = [f"chunk_{i}" for i in range(len(chunks))]
+        stale_ids = list(existing_ids.difference(seen))
+        unchanged = len(seen) - added
         
-        # Ajouter à ChromaDB
-        print("💾 Ajout à ChromaDB...")
-        self.collection.add(
-            embeddings=embeddings.tolist(),
-            documents=documents,
-            metadatas=metadatas,
-            ids=ids
+        print(
+            f"🔄 Synchronisation: {added} chunks nouveaux/modifiés, "
+            f"{len(stale_ids)} obsolètes, {unchanged} inchangés"
         )
         
-        print(f"✅ {len(chunks)} chunks indexés dans ChromaDB\n")
+        if stale_ids:
+            self.vector_store.delete(stale_ids)
+        
+        # Les réponses en cache peuvent citer des chunks modifiés
+        if added or stale_ids:
+            self.answer_cache.clear()
+            self.rebuild_metadata_index()
+        
+        print(f"✅ Collection synchronisée ({self.vector_store.count()} documents)\n")
+        
+        return {'added': added, 'deleted': len(stale_ids), 'unchanged': unchanged}
+    
+    def _chunk_windows(
+        self,
+        chunks: Iterable[Dict],
+        seen: set,
+        skip: frozenset = frozenset()
+    ) -> Iterator[Tuple[List[str], List[Dict]]]:
+        """
+        Regroupe un flux de chunks en fenêtres à indexer, avec leurs IDs stables.
+        
+        Les doublons exacts sont ignorés. La NumPy store réécrivant ses fichiers
+        à chaque écriture, elle reçoit une seule fenêtre.
+        
+        Args:
+            chunks: Chunks (liste ou itérable)
+            seen: Ensemble complété avec les IDs de tous les chunks rencontrés
+            skip: IDs déjà indexés, à ne pas réencoder
+            
+        Yields:
+            Tuples (ids, chunks) à encoder et écrire
+        """
+        window_size = INDEX_STREAM_WINDOW if self.vector_store.max_batch_size() is not None else None
+        ids, window, duplicates = [], [], 0
+        
+        for chunk in chunks:
+            uid = compute_chunk_uid(chunk)
+            if uid in seen:
+                duplicates += 1
+                continue
+            seen.add(uid)
+            if uid in skip:
+                continue
+            ids.append(uid)
+            window.append(chunk)
+            if window_size and len(window) >= window_size:
+                yield ids, window
+                ids, window = [], []
+        
+        if window:
+            yield ids, window
+        
+        if duplicates:
+            print(f"⚠️  {duplicates} chunks en double ignorés")
+    
+    def _upsert_chunks(
+        self,
+        ids: List[str],
+        chunks: List[Dict],
+        encode_fn: Optional[Callable[[List[str]], np.ndarray]] = None
+    ) -> None:
+        """
+        Encode des chunks et les écrit dans la base vectorielle, par lots.
+        
+        Les chunks sont triés par longueur (moins de padding dans chaque lot
+        du modèle), encodés par lots de INDEX_BATCH_SIZE, éventuellement sur
+        plusieurs processus, et chaque lot est écrit dans la base par un
+        thread dédié pendant l'encodage du lot suivant.
+        
+        Args:
+            ids: IDs stables des chunks
+            chunks: Chunks correspondants
+            encode_fn: Fonction d'encodage de l'indexation (voir _index_encoder)
+        """
+        if encode_fn is None:
+            with self._index_encoder() as encode_fn:
+                return self._upsert_chunks(ids, chunks, encode_fn)
+        
+        order = sorted(range(len(chunks)), key=lambda i: len(chunks[i]['text']), reverse=True)
+        
+        # Les écritures respectent la taille de lot maximale de la base
+        store_batch = self.vector_store.max_batch_size()
+        encode_batch = INDEX_BATCH_SIZE if store_batch is None else min(INDEX_BATCH_SIZE, store_batch)
+        write_batch = store_batch or len(order)
+        
+        print(f"🧮 Génération des embeddings ({len(order)} chunks, lots de {encode_batch})...")
+        start = time.perf_counter()
+        pending = None
+        buffer = {'ids': [], 'embeddings': [], 'documents': [], 'metadatas': []}
+        
+        def submit(writer):
+            embeddings = np.concatenate(buffer['embeddings'])
+            # Sans texte dans la base vectorielle, seuls IDs, embeddings et métadonnées y sont écrits
+            documents = buffer['documents'] if self.store_documents else [""] * len(buffer['ids'])
+            future = writer.submit(
+                self.vector_store.upsert, buffer['ids'], embeddings, documents, buffer['metadatas']
+            )
+            for key in buffer:
+                buffer[key] = []
+            return future
+        
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="rag-index-writer") as writer:
+            for done in range(0, len(order), encode_batch):
+                batch = [chunks[i] for i in order[done:done + encode_batch]]
+                documents = [chunk['text'] for chunk in batch]
+                
+                buffer['ids'].extend(ids[i] for i in order[done:done + encode_batch])
+                buffer['embeddings'].append(self.encode_texts(documents, encode_fn=encode_fn))
+                buffer['documents'].extend(documents)
+                buffer['metadatas'].extend(chunk_metadata(chunk) for chunk in batch)
+                
+                if len(buffer['ids']) >= write_batch:
+                    if pending is not None:
+                        pending.result()
+                    pending = submit(writer)
+                
+                encoded = min(done + encode_batch, len(order))
+                rate = encoded / max(time.perf_counter() - start, 1e-9)
+                print(f"   {encoded}/{len(order)} chunks encodés ({rate:.0f} chunks/s)")
+            
+            if pending is not None:
+                pending.result()
+            if buffer['ids']:
+                print("💾 Ajout à la base vectorielle...")
+                submit(writer).result()
+        
+        if self.embedding_cache is not None:
+            self.embedding_cache.flush()
+    
+    @contextmanager
+    def _index_encoder(self):
+        """
+        Fournit la fonction d'encodage d'une indexation.
+        
+        Dès que l'indexation atteint INDEX_MULTIPROCESS_MIN_CHUNKS textes à
+        encoder, et si le modèle le permet (SentenceTransformer), l'encodage
+        est réparti sur un pool de processus (un par cœur par défaut), arrêté
+        à la fin de l'indexation.
+        
+        Yields:
+            Fonction d'encodage d'une liste de textes
+        """
+        model = self.embedding_model
+        processes = INDEX_ENCODE_PROCESSES or os.cpu_count() or 1
+        
+        if processes <= 1 or not hasattr(model, 'start_multi_process_pool'):
+            yield lambda texts: model.encode(texts, show_progress_bar=False)
+            return
+        
+        pool = None
+        encoded = 0
+        
+        def encode(texts: List[str]) -> np.ndarray:
+            nonlocal pool, encoded
+            encoded += len(texts)
+            if pool is None and encoded < INDEX_MULTIPROCESS_MIN_CHUNKS:
+                return model.encode(texts, show_progress_bar=False)
+            # Démarrage au premier lot d'une grande indexation (inutile si tout est en cache)
+            if pool is None:
+                print(f"🧵 Encodage sur {processes} processus")
+                pool = model.start_multi_process_pool(target_devices=['cpu'] * processes)
+            return model.encode_multi_process(texts, pool)
+        
+        try:
+            yield encode
+        finally:
+            if pool is not None:
+                model.stop_multi_process_pool(pool)
+    
+    def encode_texts(
+        self,
+        texts: List[str],
+        show_progress_bar: bool = False,
+        encode_fn: Optional[Callable[[List[str]], np.ndarray]] = None
+    ) -> np.ndarray:
+        """
+        Encode des textes en réutilisant le cache persistant des embeddings.
+        
+        Args:
+            texts: Textes à encoder
+            show_progress_bar: Afficher la progression de l'encodage
+            encode_fn: Fonction d'encodage à utiliser (par défaut, le modèle)
+            
+        Returns:
+            Embeddings (len(texts) x dim)
+        """
+        def encode(batch: List[str]) -> np.ndarray:
+            return self.embedding_model.encode(batch, show_progress_bar=show_progress_bar)
+        
+        encode = encode_fn or encode
+        
+        if self.embedding_cache is None:
+            return np.asarray(encode(list(texts)), dtype=np.float32)
+        
+        return self.embedding_cache.encode(list(texts), encode)
+    
+    def embed_query(self, question: str) -> np.ndarray:
+        """
+        Calcule l'embedding d'une question, avec cache LRU en mémoire.
+        
+        Args:
+            question: Question de l'utilisateur
+            
+        Returns:
+            Embedding de la question (1 x dim)
+        """
+        return self.embed_queries([question])[:1]
     
-    def retrieve_context(self, question: str, n_results: int = 5) -> Tuple[str, List[str], List[Dict]]:
+    def embed_queries(self, questions: List[str]) -> np.ndarray:
+        """
+        Calcule les embeddings de plusieurs questions en un seul appel au modèle.
+        
+        Les questions présentes dans le cache LRU ne sont pas réencodées.
+        
+        Args:
+            questions: Questions des utilisateurs
+            
+        Returns:
+            Embeddings des questions (len(questions) x dim)
+        """
+        keys = [normalize_text(question) for question in questions]
+        embeddings = [self.query_embedding_cache.get(key) for key in keys]
+        
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        self.metrics.cache_lookup('query_embedding', True, len(questions) - len(missing))
+        self.metrics.cache_lookup('query_embedding', False, len(missing))
+        if missing:
+            texts = [questions[i] for i in missing]
+            with self.metrics.stage('encode'):
+                if self.micro_batch_enabled:
+                    computed = self.query_encoder.map(texts)
+                else:
+                    computed = self.encode_texts(texts)
+            for i, embedding in zip(missing, computed):
+                embeddings[i] = embedding[None, :]
+                self.query_embedding_cache.put(keys[i], embeddings[i])
+        
+        return np.concatenate(embeddings, axis=0)
+    
+    def _encode_query_batch(self, questions: List[str]) -> np.ndarray:
+        """Encode un lot de questions regroupé par query_encoder."""
+        return self.encode_texts(questions)
+    
+    def search_queries(
+        self,
+        query_embeddings: np.ndarray,
+        n_results: int,
+        where: Optional[Dict] = None
+    ) -> List[Dict]:
+        """
+        Recherche les chunks les plus proches de plusieurs questions.
+        
+        Avec le micro-batching, les recherches de requêtes concurrentes ayant
+        le même filtre sont faites en une seule requête à la base vectorielle.
+        
+        Args:
+            query_embeddings: Embeddings des questions (n x dim)
+            n_results: Nombre de résultats par question
+            where: Filtre de métadonnées
+            
+        Returns:
+            Résultats {'ids', 'documents', 'metadatas', 'distances'}, un par question
+        """
+        with self.metrics.stage('vector_search'):
+            if self.micro_batch_enabled:
+                return self.query_searcher.map(
+                    [(query_embedding, n_results, where) for query_embedding in query_embeddings]
+                )
+            return split_results(self.vector_store.query(query_embeddings, n_results, where=where))
+    
+    def _search_batch(self, searches: List[Tuple[np.ndarray, int, Optional[Dict]]]) -> List[Dict]:
+        """Recherche un lot regroupé par query_searcher: une requête par (n_results, filtre)."""
+        groups: Dict[Tuple[int, str], List[int]] = {}
+        for i, (_, n_results, where) in enumerate(searches):
+            groups.setdefault((n_results, repr(where)), []).append(i)
+        
+        rows: List[Optional[Dict]] = [None] * len(searches)
+        for (n_results, _), indices in groups.items():
+            results = self.vector_store.query(
+                np.stack([searches[i][0] for i in indices]), n_results, where=searches[indices[0]][2]
+            )
+            for i, row in zip(indices, split_results(results)):
+                rows[i] = row
+        return rows
+    
+    def retrieve_context(self, question: str, n_results: int = 5, doc_ids: Optional[Sequence[str]] = None) -> Tuple[str, List[str], List[Dict]]:
         """
         Récupère le contexte pertinent pour une question.
         
         Args:
             question: Question de l'utilisateur
             n_results: Nombre de résultats à retourner
+            doc_ids: Documents du corpus dans lesquels chercher (None pour tous)
             
         Returns:
             Tuple (context, documents, metadatas)
         """
-        # Générer l'embedding de la question
-        query_embedding = self.embedding_model.encode([question])
+        plan = self.prepare_queries([question], n_results, use_cache=False, doc_ids=doc_ids)[0]
+        return plan['context'], plan['documents'], plan['metadatas']
+    
+    @property
+    def metadata_index(self) -> MetadataIndex:
+        """Index des articles et points indexés (construit à la demande)."""
+        if self._metadata_index is None:
+            self.rebuild_metadata_index()
+        return self._metadata_index
+    
+    def rebuild_metadata_index(self) -> None:
+        """Reconstruit l'index article/point à partir de la base vectorielle."""
+        # Métadonnées seulement: le texte de tout le corpus n'est pas chargé
+        records = self.vector_store.get(include=["metadatas"])
+        self._metadata_index = MetadataIndex(records['ids'], records['metadatas'])
+    
+    def prepare_queries(
+        self,
+        questions: List[str],
+        n_results: int = 5,
+        use_cache: bool = True,
+        doc_ids: Optional[Sequence[str]] = None
+    ) -> List[Dict]:
+        """
+        Prépare la génération de plusieurs questions: cache, routage et recherche.
         
-        # Rechercher dans ChromaDB
-        results = self.collection.query(
-            query_embeddings=query_embedding.tolist(),
-            n_results=n_results,
-            include=["documents", "metadatas", "distances"]
-        )
+        Pour chaque question, dans l'ordre:
+        1. réponse en cache pour la même question (sans encodage);
+        2. récupération directe des articles/points cités dans la question;
+        3. recherche dense pour le reste (un seul encodage et une requête à la
+           base vectorielle par filtre, pour toutes les questions, regroupés
+           avec ceux des requêtes concurrentes si micro_batch_enabled).
+        
+        Args:
+            questions: Questions des utilisateurs
+            n_results: Nombre de chunks par question
+            use_cache: Consulter le cache sémantique des réponses
+            doc_ids: Documents du corpus dans lesquels chercher (None pour tous)
+            
+        Returns:
+            Liste de plans {'question', 'cached', 'context', 'context_tokens',
+            'documents', 'metadatas', 'query_embedding', 'routed'}, un par question
+        """
+        documents = sorted(set(doc_ids)) if doc_ids else None
+        scope = ",".join(documents) if documents else ""
+        
+        plans = []
+        dense = []
+        for question in questions:
+            plan = {
+                'question': question, 'cached': None, 'query_embedding': None, 'routed': False,
+                'ids': [], 'documents': [], 'metadatas': [], 'remaining': n_results,
+                'doc_ids': documents, 'scope': scope, 'where': metadata_filter(doc_ids=documents),
+            }
+            plans.append(plan)
+            
+            if use_cache:
+                with self.metrics.stage('answer_cache'):
+                    plan['cached'] = self.answer_cache.lookup_exact(question, n_results, scope)
+                self.metrics.cache_lookup('answer_exact', plan['cached'] is not None)
+                if plan['cached'] is not None:
+                    continue
+            
+            if self.query_router_enabled:
+                with self.metrics.stage('route'):
+                    self._route(plan, n_results)
+            if plan['remaining'] > 0:
+                dense.append(plan)
+        
+        if dense:
+            query_embeddings = self.embed_queries([plan['question'] for plan in dense])
+            
+            searches: Dict[str, List[Dict]] = {}
+            for plan, query_embedding in zip(dense, query_embeddings):
+                plan['query_embedding'] = query_embedding
+                # Les questions citant un article ne sont jamais servies par similarité
+                if use_cache and not plan['routed']:
+                    with self.metrics.stage('answer_cache'):
+                        plan['cached'] = self.answer_cache.lookup(query_embedding, n_results, scope)
+                    self.metrics.cache_lookup('answer_semantic', plan['cached'] is not None)
+                    if plan['cached'] is not None:
+                        continue
+                searches.setdefault(repr(plan['where']), []).append(plan)
+            
+            # Une requête à la base vectorielle par filtre de métadonnées
+            for group in searches.values():
+                rows = self.search_queries(
+                    np.stack([plan['query_embedding'] for plan in group]), n_results, group[0]['where']
+                )
+                for plan, row in zip(group, rows):
+                    for doc_id, document, metadata in zip(row['ids'], row['documents'], row['metadatas']):
+                        if len(plan['ids']) >= n_results:
+                            break
+                        if doc_id not in plan['ids']:
+                            plan['ids'].append(doc_id)
+                            plan['documents'].append(document)
+                            plan['metadatas'].append(metadata)
+        
+        for plan in plans:
+            if plan['cached'] is not None:
+                plan['documents'] = plan['cached']['documents']
+                plan['metadatas'] = plan['cached']['metadatas']
+                plan['context'] = CONTEXT_SEPARATOR.join(plan['documents'])
+                plan['context_tokens'] = 0
+                continue
+            
+            self._hydrate(plan)
+            
+            # Créer le contexte: chunks entiers, dans le budget de tokens
+            with self.metrics.stage('context'):
+                packed = build_context(
+                    plan['documents'], plan['metadatas'],
+                    max_tokens=self.context_max_tokens,
+                    counter=self.token_counter,
+                    max_chars=self.context_max_chars,
+                    sort_key=position_key if self.prompt_layout == 'prefix' else None
+                )
+            plan['context'] = packed['context']
+            plan['documents'] = packed['documents']
+            plan['metadatas'] = packed['metadatas']
+            plan['context_tokens'] = packed['tokens']
+            self.metrics.chunks_retrieved.observe(len(plan['documents']))
+            self.metrics.prompt_tokens.observe(plan['context_tokens'])
+        
+        return plans
+    
+    @property
+    def chunk_store(self) -> Optional[ChunkStore]:
+        """Chunk store (ouvert à la demande, None s'il n'existe pas)."""
+        if self._chunk_store is None and ChunkStore.exists(self.chunk_store_path):
+            self._chunk_store = ChunkStore(self.chunk_store_path)
+        return self._chunk_store
+    
+    def reload_chunk_store(self) -> None:
+        """Rouvre le chunk store (après sa réécriture par init_database)."""
+        if self._chunk_store is not None:
+            self._chunk_store.close()
+        self._chunk_store = None
+    
+    def _hydrate(self, plan: Dict) -> None:
+        """
+        Complète depuis le chunk store le texte des chunks absent de la base vectorielle.
+        
+        Args:
+            plan: Plan de la question (modifié sur place)
+        """
+        missing = [i for i, document in enumerate(plan['documents']) if not document]
+        if not missing:
+            return
         
-        # Extraire les résultats
-        documents = results["documents"][0]
-        metadatas = results["metadatas"][0]
+        store = self.chunk_store
+        if store is None:
+            raise RuntimeError(
+                f"Texte des chunks absent de la base vectorielle et chunk store introuvable: {self.chunk_store_path}"
+            )
+        with self.metrics.stage('hydrate'):
+            chunks = store.get_many([plan['ids'][i] for i in missing])
+        for i, chunk in zip(missing, chunks):
+            if chunk is not None:
+                plan['documents'][i] = chunk['text']
+    
+    def _route(self, plan: Dict, n_results: int) -> None:
+        """
+        Récupère directement les articles/points cités dans la question.
         
-        # Créer le contexte
-        context = "\n\n---SECTION---\n\n".join(documents)
+        Args:
+            plan: Plan de la question (modifié sur place)
+            n_results: Nombre de chunks par question
+        """
+        references = parse_references(plan['question'])
+        if not references:
+            return
         
-        return context, documents, metadatas
+        route = self.metadata_index.plan(references, n_results, plan['doc_ids'])
+        if not route['ids'] and not route['articles']:
+            return
+        
+        plan['routed'] = True
+        if route['ids']:
+            fetched = self.vector_store.get(ids=route['ids'])
+            records = dict(zip(fetched['ids'], zip(fetched['documents'], fetched['metadatas'])))
+            for doc_id in route['ids']:
+                if doc_id in records:
+                    plan['ids'].append(doc_id)
+                    plan['documents'].append(records[doc_id][0])
+                    plan['metadatas'].append(records[doc_id][1])
+        
+        # Les articles trop longs sont cherchés par similarité, filtrés sur l'article
+        if route['articles']:
+            plan['where'] = metadata_filter(articles=route['articles'], doc_ids=plan['doc_ids'])
+            plan['remaining'] = n_results - len(plan['ids'])
+        else:
+            plan['remaining'] = 0
+    
+    def _remember_answer(self, plan: Dict, n_results: int, answer: str) -> None:
+        """
+        Enregistre une réponse générée dans le cache des réponses.
+        
+        Args:
+            plan: Plan de la question (voir prepare_queries)
+            n_results: Nombre de chunks utilisés
+            answer: Réponse du LLM
+        """
+        query_embedding = None if plan['routed'] else plan['query_embedding']
+        self.answer_cache.store(
+            query_embedding, n_results, plan['question'], answer, plan['documents'], plan['metadatas'],
+            scope=plan['scope']
+        )
     
     def get_llm_answer(self, question: str, context: str) -> str:
         """
         Génère une réponse en utilisant le LLM.
         
+        La réponse est lue en streaming puis assemblée: le délai avant le
+        premier token et le débit de génération sont ainsi mesurés.
+        
         Args:
             question: Question de l'utilisateur
-            context: Contexte récupéré
+            context: Contexte récupéré (déjà borné par build_context)
             
         Returns:
             Réponse générée
         """
-        answer = self.chain.invoke({
-            "context": context[:4000],  # Limiter le contexte
-            "question": question
-        })
-        return answer
+        return "".join(self.stream_llm_answer(question, context))
     
     def stream_llm_answer(self, question: str, context: str):
         """
@@ -200,15 +1065,16 @@ Réponse (soyez précis, citez les articles et points pertinents):"""
         
         Args:
             question: Question de l'utilisateur
-            context: Contexte récupéré
+            context: Contexte récupéré (déjà borné par build_context)
             
         Yields:
             Tokens de la réponse
         """
-        for token in self.llm.stream(
-            self.prompt_template.format(context=context[:4000], question=question)
-        ):
-            yield token
+        with self.metrics.stage('prompt'):
+            prompt = self.prompt_template.format(context=context, question=question)
+        # Prefill mesuré à partir de l'obtention d'une place sur un serveur LLM
+        timer = self.metrics.generation()
+        yield from self.metrics.timed_tokens(self.llm.stream(prompt, on_acquire=timer.acquired), timer)
     
     def format_response(
         self, 
@@ -231,62 +1097,411 @@ Réponse (soyez précis, citez les articles et points pertinents):"""
         """
         response = f"**Question:** {question}\n\n"
         response += f"**Réponse:** {answer}\n\n"
-        response += "**Sources:**\n"
+        response += self.format_sources(source_chunks, metadatas)
+        
+        return response
+    
+    def format_sources(self, source_chunks: List[str], metadatas: List[Dict]) -> str:
+        """
+        Formate la liste des sources d'une réponse.
+        
+        Args:
+            source_chunks: Chunks sources
+            metadatas: Métadonnées des chunks
+            
+        Returns:
+            Section "Sources" en Markdown
+        """
+        response = "**Sources:**\n"
         
-        for i, (chunk, metadata) in enumerate(zip(source_chunks[:3], metadatas[:3]), 1):
-            article = metadata.get('article_num', 'N/A')
-            point = metadata.get('point_num', 'N/A')
-            title = metadata.get('article_title', 'N/A')
-            preview = chunk[:150].replace("\n", " ") + "..."
-            response += f"\n{i}. **Article {article}, Point {point}** ({title})\n"
-            response += f"   {preview}\n"
+        for i, source in enumerate(self._sources(source_chunks, metadatas), 1):
+            document = f"{source['doc_id']}, " if source.get('doc_id') else ""
+            response += f"\n{i}. **{document}Article {source['article_num']}, Point {source['point_num']}** ({source['article_title']})\n"
+            response += f"   {source['preview']}\n"
         
         return response
     
-    def query(self, question: str, n_results: int = 5) -> str:
+    def _sources(self, source_chunks: List[str], metadatas: List[Dict]) -> List[Dict]:
+        """Retourne les 3 premières sources sous forme structurée."""
+        return [
+            {
+                'article_num': metadata.get('article_num', 'N/A'),
+                'point_num': metadata.get('point_num', 'N/A'),
+                'article_title': metadata.get('article_title', 'N/A'),
+                'doc_id': metadata.get('doc_id'),
+                'preview': chunk[:150].replace("\n", " ") + "...",
+            }
+            for chunk, metadata in zip(source_chunks[:3], metadatas[:3])
+        ]
+    
+    def _sources_event(self, plan: Dict) -> Dict:
+        """Construit l'événement final 'sources' d'un flux de deltas."""
+        return {
+            'type': 'sources',
+            'sources': self._sources(plan['documents'], plan['metadatas']),
+            'markdown': self.format_sources(plan['documents'], plan['metadatas']),
+        }
+    
+    def _answer_items(self, question: str, n_results: int, doc_ids: Optional[Sequence[str]]) -> Iterator:
+        """
+        Produit le plan de la question puis les tokens de sa réponse.
+        
+        Une réponse en cache est rejouée; une réponse générée jusqu'au bout
+        est enregistrée dans le cache des réponses.
+        
+        Yields:
+            Plan (voir prepare_queries), puis tokens de la réponse
+        """
+        plan = self.prepare_queries([question], n_results, doc_ids=doc_ids)[0]
+        yield plan
+        if plan['cached'] is not None:
+            yield from replay_tokens(plan['cached']['answer'])
+            return
+        
+        parts = []
+        for token in self.stream_llm_answer(question, plan['context']):
+            parts.append(token)
+            yield token
+        self._remember_answer(plan, n_results, "".join(parts))
+    
+    async def _aanswer_items(self, question: str, n_results: int, doc_ids: Optional[Sequence[str]]):
+        """Version asynchrone de _answer_items."""
+        plans = await self._run_in_executor(self.prepare_queries, [question], n_results, True, doc_ids)
+        plan = plans[0]
+        yield plan
+        if plan['cached'] is not None:
+            for token in replay_tokens(plan['cached']['answer']):
+                yield token
+            return
+        
+        parts = []
+        async for token in self.astream_llm_answer(question, plan['context']):
+            parts.append(token)
+            yield token
+        self._remember_answer(plan, n_results, "".join(parts))
+    
+    def _flight_key(self, question: str, n_results: int, doc_ids: Optional[Sequence[str]]) -> Tuple:
+        """Clé de regroupement: question normalisée, nombre de chunks et documents."""
+        return normalize_text(question), n_results, ",".join(sorted(set(doc_ids))) if doc_ids else ""
+    
+    def _answer_flight(self, question: str, n_results: int, doc_ids: Optional[Sequence[str]]) -> Iterator:
+        """
+        Plan puis tokens de la réponse, partagés avec les requêtes identiques en cours.
+        
+        Un abonné arrivé en cours de génération reçoit d'abord les tokens déjà produits.
+        """
+        if not self.single_flight_enabled:
+            return self._answer_items(question, n_results, doc_ids)
+        items, leader = self.single_flight.stream(
+            self._flight_key(question, n_results, doc_ids),
+            lambda: self._answer_items(question, n_results, doc_ids)
+        )
+        self.metrics.single_flight.inc(role="leader" if leader else "follower")
+        return items
+    
+    def _aanswer_flight(self, question: str, n_results: int, doc_ids: Optional[Sequence[str]]):
+        """Version asynchrone de _answer_flight."""
+        if not self.single_flight_enabled:
+            return self._aanswer_items(question, n_results, doc_ids)
+        items, leader = self.single_flight.astream(
+            self._flight_key(question, n_results, doc_ids),
+            lambda: self._aanswer_items(question, n_results, doc_ids)
+        )
+        self.metrics.single_flight.inc(role="leader" if leader else "follower")
+        return items
+    
+    def query(self, question: str, n_results: int = 5, doc_ids: Optional[Sequence[str]] = None) -> str:
         """
         Interroge le système RAG avec une question.
         
         Args:
             question: Question de l'utilisateur
             n_results: Nombre de chunks à récupérer
+            doc_ids: Documents du corpus dans lesquels chercher (None pour tous)
             
         Returns:
             Réponse formatée
         """
-        # Récupérer le contexte
-        context, documents, metadatas = self.retrieve_context(question, n_results)
+        with self.metrics.request('query'):
+            # Contexte puis réponse (partagés avec les requêtes identiques en cours)
+            items = self._answer_flight(question, n_results, doc_ids)
+            plan = next(items)
+            answer = "".join(items)
+            
+            # Formater la réponse
+            return self.format_response(question, answer, plan['documents'], plan['metadatas'])
+    
+    def query_streaming(self, question: str, n_results: int = 5, doc_ids: Optional[Sequence[str]] = None):
+        """
+        Interroge le système RAG avec streaming.
         
-        # Générer la réponse
-        answer = self.get_llm_answer(question, context)
+        Args:
+            question: Question de l'utilisateur
+            n_results: Nombre de chunks à récupérer
+            doc_ids: Documents du corpus dans lesquels chercher (None pour tous)
+            
+        Yields:
+            Parties de la réponse
+        """
+        response = f"**Question:** {question}\n\n**Réponse:** "
         
-        # Formater la réponse
-        return self.format_response(question, answer, documents, metadatas)
+        for event in self.stream_events(question, n_results, doc_ids):
+            if event['type'] == 'delta':
+                response += event['text']
+                yield response
+            else:
+                # Ajouter les sources
+                yield response + "\n\n" + event['markdown']
     
-    def query_streaming(self, question: str, n_results: int = 5):
+    def stream_events(self, question: str, n_results: int = 5, doc_ids: Optional[Sequence[str]] = None):
         """
-        Interroge le système RAG avec streaming.
+        Interroge le système RAG en streaming par deltas.
+        
+        Seul le texte nouveau est émis, regroupé en trames (au plus toutes les
+        STREAM_FLUSH_INTERVAL_MS ms ou STREAM_FLUSH_MAX_TOKENS tokens); les
+        sources sont envoyées dans un dernier événement séparé.
         
         Args:
             question: Question de l'utilisateur
             n_results: Nombre de chunks à récupérer
+            doc_ids: Documents du corpus dans lesquels chercher (None pour tous)
+            
+        Yields:
+            Événements {'type': 'delta', 'text'} puis {'type': 'sources', 'sources', 'markdown'}
+        """
+        with self.metrics.request('stream') as request:
+            # Contexte puis tokens (partagés avec les requêtes identiques en cours)
+            items = self._answer_flight(question, n_results, doc_ids)
+            plan = next(items)
+            
+            for text in coalesce_tokens(items, self.stream_flush_interval, self.stream_flush_max_tokens):
+                request.first_token()
+                yield {'type': 'delta', 'text': text}
+            
+            yield self._sources_event(plan)
+    
+    def query_batch(
+        self,
+        questions: List[str],
+        n_results: int = 5,
+        max_concurrency: int = RAG_BATCH_MAX_CONCURRENCY,
+        doc_ids: Optional[Sequence[str]] = None
+    ) -> List[str]:
+        """
+        Interroge le système RAG avec plusieurs questions.
+        
+        Les questions sont encodées en un seul appel, le contexte est récupéré
+        avec une seule requête à la base vectorielle et les réponses sont
+        générées en parallèle avec une concurrence bornée.
+        
+        Args:
+            questions: Questions des utilisateurs
+            n_results: Nombre de chunks à récupérer par question
+            max_concurrency: Nombre maximal de générations LLM simultanées
+            doc_ids: Documents du corpus dans lesquels chercher (None pour tous)
+            
+        Returns:
+            Réponses formatées, dans l'ordre des questions
+        """
+        if not questions:
+            return []
+        
+        with self.metrics.request('batch'):
+            plans = self.prepare_queries(questions, n_results, doc_ids=doc_ids)
+            
+            def answer(plan: Dict) -> str:
+                if plan['cached'] is not None:
+                    llm_answer = plan['cached']['answer']
+                else:
+                    llm_answer = self.get_llm_answer(plan['question'], plan['context'])
+                    self._remember_answer(plan, n_results, llm_answer)
+                return self.format_response(plan['question'], llm_answer, plan['documents'], plan['metadatas'])
+            
+            with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as executor:
+                return list(executor.map(answer, plans))
+    
+    async def _run_in_executor(self, func, *args):
+        """Exécute une fonction bloquante (encodage, recherche) hors de la boucle asyncio."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+    
+    async def aretrieve_context(self, question: str, n_results: int = 5, doc_ids: Optional[Sequence[str]] = None) -> Tuple[str, List[str], List[Dict]]:
+        """
+        Version asynchrone de retrieve_context.
+        
+        Args:
+            question: Question de l'utilisateur
+            n_results: Nombre de résultats à retourner
+            doc_ids: Documents du corpus dans lesquels chercher (None pour tous)
+            
+        Returns:
+            Tuple (context, documents, metadatas)
+        """
+        return await self._run_in_executor(self.retrieve_context, question, n_results, doc_ids)
+    
+    async def aget_llm_answer(self, question: str, context: str) -> str:
+        """
+        Version asynchrone de get_llm_answer.
+        
+        Args:
+            question: Question de l'utilisateur
+            context: Contexte récupéré (déjà borné par build_context)
+            
+        Returns:
+            Réponse générée
+        """
+        return "".join([token async for token in self.astream_llm_answer(question, context)])
+    
+    async def astream_llm_answer(self, question: str, context: str):
+        """
+        Version asynchrone de stream_llm_answer.
+        
+        Args:
+            question: Question de l'utilisateur
+            context: Contexte récupéré (déjà borné par build_context)
+            
+        Yields:
+            Tokens de la réponse
+        """
+        with self.metrics.stage('prompt'):
+            prompt = self.prompt_template.format(context=context, question=question)
+        timer = self.metrics.generation()
+        async for token in self.metrics.atimed_tokens(self.llm.astream(prompt, on_acquire=timer.acquired), timer):
+            yield token
+    
+    async def aquery(self, question: str, n_results: int = 5, doc_ids: Optional[Sequence[str]] = None) -> str:
+        """
+        Version asynchrone de query, sans bloquer la boucle d'événements.
+        
+        Args:
+            question: Question de l'utilisateur
+            n_results: Nombre de chunks à récupérer
+            doc_ids: Documents du corpus dans lesquels chercher (None pour tous)
+            
+        Returns:
+            Réponse formatée
+        """
+        await self.aensure_ready()
+        with self.metrics.request('query'):
+            items = self._aanswer_flight(question, n_results, doc_ids)
+            plan = await items.__anext__()
+            answer = "".join([token async for token in items])
+            
+            return self.format_response(question, answer, plan['documents'], plan['metadatas'])
+    
+    async def astream_query(self, question: str, n_results: int = 5, doc_ids: Optional[Sequence[str]] = None):
+        """
+        Version asynchrone de query_streaming.
+        
+        Args:
+            question: Question de l'utilisateur
+            n_results: Nombre de chunks à récupérer
+            doc_ids: Documents du corpus dans lesquels chercher (None pour tous)
             
         Yields:
             Parties de la réponse
         """
-        # Récupérer le contexte
-        context, documents, metadatas = self.retrieve_context(question, n_results)
+        response = f"**Question:** {question}\n\n**Réponse:** "
         
-        # Générer la réponse en streaming
-        response_start = f"**Question:** {question}\n\n**Réponse:** "
-        answer = ""
+        async for event in self.astream_events(question, n_results, doc_ids):
+            if event['type'] == 'delta':
+                response += event['text']
+                yield response
+            else:
+                yield response + "\n\n" + event['markdown']
+    
+    async def astream_events(self, question: str, n_results: int = 5, doc_ids: Optional[Sequence[str]] = None):
+        """
+        Version asynchrone de stream_events.
         
-        for token in self.stream_llm_answer(question, context):
-            answer += token
-            yield response_start + answer
+        Args:
+            question: Question de l'utilisateur
+            n_results: Nombre de chunks à récupérer
+            doc_ids: Documents du corpus dans lesquels chercher (None pour tous)
+            
+        Yields:
+            Événements {'type': 'delta', 'text'} puis {'type': 'sources', 'sources', 'markdown'}
+        """
+        await self.aensure_ready()
+        with self.metrics.request('stream') as request:
+            items = self._aanswer_flight(question, n_results, doc_ids)
+            plan = await items.__anext__()
+            
+            async for text in acoalesce_tokens(items, self.stream_flush_interval, self.stream_flush_max_tokens):
+                request.first_token()
+                yield {'type': 'delta', 'text': text}
+            
+            yield self._sources_event(plan)
+
+
+def chunk_metadata(chunk: Dict) -> Dict:
+    """
+    Construit les métadonnées stockées avec un chunk.
+    
+    Args:
+        chunk: Chunk (avec doc_id et doc_version s'il provient d'un corpus)
+        
+    Returns:
+        Métadonnées du chunk
+    """
+    metadata = {
+        'id': chunk['id'],
+        'article_num': chunk['article_num'],
+        'article_title': chunk['article_title'],
+        'point_num': chunk['point_num']
+    }
+    for key in ('doc_id', 'doc_version'):
+        if key in chunk:
+            metadata[key] = chunk[key]
+    return metadata
+
+
+def metadata_filter(articles: Optional[Sequence[str]] = None, doc_ids: Optional[Sequence[str]] = None) -> Optional[Dict]:
+    """
+    Construit un filtre de métadonnées (format ChromaDB) sur les articles et documents.
+    
+    Args:
+        articles: Articles autorisés (None pour tous)
+        doc_ids: Documents autorisés (None pour tous)
+        
+    Returns:
+        Filtre, ou None si aucune restriction
+    """
+    conditions = []
+    if articles:
+        conditions.append({'article_num': {'$in': list(articles)}})
+    if doc_ids:
+        conditions.append({'doc_id': {'$in': list(doc_ids)}})
+    if not conditions:
+        return None
+    return conditions[0] if len(conditions) == 1 else {'$and': conditions}
+
+
+def split_results(results: Dict) -> List[Dict]:
+    """
+    Sépare les résultats d'une requête vectorielle à plusieurs questions.
+    
+    Args:
+        results: Résultats {'ids', 'documents', 'metadatas', 'distances'} (listes par question)
+        
+    Returns:
+        Résultats de chaque question (listes de chunks)
+    """
+    return [dict(zip(results, row)) for row in zip(*results.values())]
+
+
+def replay_tokens(text: str):
+    """
+    Découpe une réponse déjà générée en morceaux pour la rejouer en streaming.
+    
+    Args:
+        text: Réponse complète
         
-        # Ajouter les sources
-        yield self.format_response(question, answer, documents, metadatas)
+    Yields:
+        Mots de la réponse avec leurs espaces
+    """
+    for match in re.finditer(r"\S+\s*|\s+", text):
+        yield match.group(0)
 
 
 if __name__ == "__main__":
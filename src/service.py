@@ -0,0 +1,253 @@
+"""
+Service HTTP du système RAG (FastAPI), pour l'intégration avec d'autres systèmes.
+
+Un seul RAGSystem est partagé par toutes les requêtes; aucun endpoint ne
+bloque la boucle d'événements (encodage et recherche dans le pool de threads,
+LLM en streaming asynchrone). Les requêtes passent par une file d'admission
+bornée (429 si elle est pleine, 503 si l'attente est trop longue) et sont
+interrompues après SERVICE_REQUEST_TIMEOUT_SECONDS (504).
+
+Endpoints:
+- POST /v1/query: réponse complète et sources (JSON)
+- POST /v1/query/stream: réponse en Server-Sent Events (delta, sources, error)
+- POST /v1/batch: plusieurs questions, réponses dans l'ordre
+- GET /health: état de préparation et de la file d'admission
+- GET /metrics: métriques Prometheus
+
+Lancement:
+    python service.py --port 8000
+    uvicorn service:create_app --factory --host 0.0.0.0 --port 8000
+
+L'application Gradio (app.py) sert aussi ces endpoints, avec le même
+RAGSystem: c'est le déploiement Docker. Un service séparé ne doit pas
+ouvrir le même répertoire de données que l'application (base Chroma,
+cache d'embeddings et index des métadonnées propres à chaque processus).
+"""
+
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, List, Optional
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field
+
+from admission import AdmissionController, AdmissionRejected
+from config import (
+    SERVICE_HOST, SERVICE_PORT, SERVICE_MAX_CONCURRENCY, SERVICE_MAX_QUEUE,
+    SERVICE_QUEUE_TIMEOUT_SECONDS, SERVICE_REQUEST_TIMEOUT_SECONDS, SERVICE_BATCH_MAX_QUESTIONS,
+    RAG_BATCH_MAX_CONCURRENCY, METRICS_ENABLED
+)
+from metrics import CONTENT_TYPE
+from rag_system import RAGSystem
+
+
+class QueryRequest(BaseModel):
+    question: str = Field(..., description="Question de l'utilisateur")
+    n_results: int = Field(5, ge=1, le=20, description="Nombre de chunks à récupérer")
+    doc_ids: Optional[List[str]] = Field(None, description="Règlements où chercher (tout le corpus si absent)")
+
+
+class BatchRequest(BaseModel):
+    questions: List[str] = Field(..., description="Questions des utilisateurs")
+    n_results: int = Field(5, ge=1, le=20, description="Nombre de chunks à récupérer par question")
+    doc_ids: Optional[List[str]] = Field(None, description="Règlements où chercher (tout le corpus si absent)")
+
+
+class QueryResponse(BaseModel):
+    question: str
+    answer: str
+    sources: List[Dict]
+
+
+class BatchItem(BaseModel):
+    question: str
+    answer: Optional[str] = None
+    sources: List[Dict] = []
+    error: Optional[str] = None
+
+
+class BatchResponse(BaseModel):
+    results: List[BatchItem]
+
+
+def sse(event: str, data: Dict) -> str:
+    """Formate un événement Server-Sent Events."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def answer_question(rag: RAGSystem, question: str, n_results: int, doc_ids: Optional[List[str]]) -> Dict:
+    """
+    Génère la réponse complète à une question.
+
+    Returns:
+        Dictionnaire {'question', 'answer', 'sources'}
+    """
+    parts, sources = [], []
+    async for event in rag.astream_events(question, n_results, doc_ids):
+        if event['type'] == 'delta':
+            parts.append(event['text'])
+        else:
+            sources = event['sources']
+    return {'question': question, 'answer': "".join(parts), 'sources': sources}
+
+
+def create_app(
+    rag: Optional[RAGSystem] = None,
+    readiness: Optional[Callable[[], Dict]] = None
+) -> FastAPI:
+    """
+    Crée l'application FastAPI.
+
+    Args:
+        rag: Système RAG partagé (par défaut, un RAGSystem sur la base existante)
+        readiness: État de préparation pour /health (par défaut, rag.readiness)
+
+    Returns:
+        Application FastAPI
+    """
+    rag = rag or RAGSystem()
+    readiness = readiness or rag.readiness
+    admission = AdmissionController(
+        SERVICE_MAX_CONCURRENCY, SERVICE_MAX_QUEUE, SERVICE_QUEUE_TIMEOUT_SECONDS, rag.metrics
+    )
+    timeout = SERVICE_REQUEST_TIMEOUT_SECONDS
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        yield
+        rag.stop_keep_warm()
+
+    app = FastAPI(title="RAG - Règlement Technique", version="1.0", lifespan=lifespan)
+    app.state.rag = rag
+    app.state.admission = admission
+
+    @app.exception_handler(AdmissionRejected)
+    async def admission_rejected(request, exc: AdmissionRejected):
+        return JSONResponse(
+            {'detail': exc.reason},
+            status_code=exc.status_code,
+            headers={'Retry-After': str(exc.retry_after)}
+        )
+
+    @app.post("/v1/query", response_model=QueryResponse)
+    async def query(body: QueryRequest):
+        """Répond à une question (réponse complète)."""
+        if not body.question.strip():
+            raise HTTPException(status_code=422, detail="Question vide")
+        async with admission.slot():
+            try:
+                return await asyncio.wait_for(
+                    answer_question(rag, body.question, body.n_results, body.doc_ids), timeout
+                )
+            except asyncio.TimeoutError:
+                raise HTTPException(status_code=504, detail=f"Délai de {timeout:.0f}s dépassé") from None
+
+    @app.post("/v1/query/stream")
+    async def query_stream(body: QueryRequest):
+        """Répond à une question en Server-Sent Events: 'delta'*, puis 'sources' (ou 'error')."""
+        if not body.question.strip():
+            raise HTTPException(status_code=422, detail="Question vide")
+        # Admission avant la réponse: un refus reste un code HTTP (429/503)
+        await admission.acquire()
+
+        async def events():
+            try:
+                yield ": admis\n\n"
+                loop = asyncio.get_running_loop()
+                deadline = loop.time() + timeout
+                rag_events = rag.astream_events(body.question, body.n_results, body.doc_ids)
+                try:
+                    while True:
+                        event = await asyncio.wait_for(rag_events.__anext__(), max(0.0, deadline - loop.time()))
+                        yield sse(event['type'], event)
+                except StopAsyncIteration:
+                    pass
+                except asyncio.TimeoutError:
+                    yield sse('error', {'type': 'error', 'detail': f"Délai de {timeout:.0f}s dépassé"})
+                except Exception as e:
+                    yield sse('error', {'type': 'error', 'detail': str(e)})
+                finally:
+                    await rag_events.aclose()
+            finally:
+                admission.release()
+
+        # Démarrer le générateur tout de suite: la place est libérée même si
+        # le client se déconnecte avant le début de la réponse
+        stream = events()
+        first = await stream.__anext__()
+
+        async def body_iterator():
+            yield first
+            async for chunk in stream:
+                yield chunk
+
+        return StreamingResponse(
+            body_iterator(),
+            media_type="text/event-stream",
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+
+    @app.post("/v1/batch", response_model=BatchResponse)
+    async def batch(body: BatchRequest):
+        """
+        Répond à plusieurs questions (une place d'admission, au plus
+        RAG_BATCH_MAX_CONCURRENCY générations simultanées).
+        """
+        if not body.questions or len(body.questions) > SERVICE_BATCH_MAX_QUESTIONS:
+            raise HTTPException(
+                status_code=422, detail=f"Entre 1 et {SERVICE_BATCH_MAX_QUESTIONS} questions par lot"
+            )
+        semaphore = asyncio.Semaphore(max(1, RAG_BATCH_MAX_CONCURRENCY))
+
+        async def one(question: str) -> Dict:
+            async with semaphore:
+                return await answer_question(rag, question, body.n_results, body.doc_ids)
+
+        async with admission.slot():
+            try:
+                results = await asyncio.wait_for(
+                    asyncio.gather(*(one(question) for question in body.questions), return_exceptions=True),
+                    timeout
+                )
+            except asyncio.TimeoutError:
+                raise HTTPException(status_code=504, detail=f"Délai de {timeout:.0f}s dépassé") from None
+
+        return {'results': [
+            {'question': question, 'error': str(result)} if isinstance(result, Exception) else result
+            for question, result in zip(body.questions, results)
+        ]}
+
+    @app.get("/health")
+    async def health():
+        """État de préparation (200 si prêt, 503 sinon) et file d'admission."""
+        status = readiness()
+        status['admission'] = admission.stats()
+        return JSONResponse(status, status_code=200 if status['ready'] else 503)
+
+    if METRICS_ENABLED:
+        @app.get("/metrics")
+        async def metrics():
+            """Métriques Prometheus."""
+            return Response(rag.metrics.render(), media_type=CONTENT_TYPE)
+
+    return app
+
+
+def main():
+    """Point d'entrée: lance le service avec uvicorn."""
+    import argparse
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Service HTTP du système RAG")
+    parser.add_argument("--host", type=str, default=SERVICE_HOST, help="Adresse du serveur")
+    parser.add_argument("--port", type=int, default=SERVICE_PORT, help="Port du serveur")
+    args = parser.parse_args()
+
+    print(f"🌐 Service RAG sur http://{args.host}:{args.port} (documentation: /docs)")
+    uvicorn.run(create_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
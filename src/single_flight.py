@@ -0,0 +1,245 @@
+"""
+Regroupement (single-flight) des requêtes identiques en cours.
+La première requête d'une clé exécute le producteur (recherche puis
+génération du LLM) elle-même, pendant sa propre lecture et dans le thread
+qui la lit: aucun thread supplémentaire n'est démarré. Les requêtes
+identiques arrivées pendant ce temps s'y abonnent au lieu de tout
+recalculer. Les éléments produits sont conservés pendant le vol: un abonné
+tardif reçoit d'abord le préfixe déjà produit, puis la suite au fil de l'eau.
+
+Si la première requête part avant la fin alors que d'autres la suivent, le
+producteur est alors seulement confié à un thread, qui continue la
+production pour celles-ci. Si tous les abonnés partent avant la fin, le
+producteur est interrompu (la génération n'est plus utile à personne).
+
+Version asynchrone (astream): le producteur est une tâche de la boucle
+d'événements, à laquelle toutes les requêtes (la première comprise)
+s'abonnent.
+"""
+
+import asyncio
+import threading
+from typing import AsyncIterator, Callable, Dict, Hashable, Iterator, List, Optional, Tuple
+
+
+class _Flight:
+    """Éléments produits pour une clé, partagés par les abonnés."""
+
+    def __init__(self):
+        self.items: List = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.cancelled = False
+        self.task: Optional[asyncio.Task] = None
+        self._condition = threading.Condition()
+        self._changed: Optional[asyncio.Event] = None
+
+    def publish(self, item) -> None:
+        with self._condition:
+            self.items.append(item)
+            self._condition.notify_all()
+        self._notify_async()
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        with self._condition:
+            self.done = True
+            self.error = error
+            self._condition.notify_all()
+        self._notify_async()
+
+    def _notify_async(self) -> None:
+        if self._changed is not None:
+            self._changed.set()
+            self._changed = asyncio.Event()
+
+    def follow(self) -> Iterator:
+        """Lit les éléments depuis le début, en attendant les suivants (threads)."""
+        position = 0
+        while True:
+            with self._condition:
+                while position >= len(self.items) and not self.done:
+                    self._condition.wait()
+                batch = self.items[position:]
+                position += len(batch)
+                if not batch and self.error is not None:
+                    raise self.error
+                if not batch:
+                    return
+            yield from batch
+
+    async def afollow(self) -> AsyncIterator:
+        """Version asynchrone de follow (même boucle d'événements que le producteur)."""
+        position = 0
+        while True:
+            if position < len(self.items):
+                batch = self.items[position:]
+                position += len(batch)
+                for item in batch:
+                    yield item
+            elif self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            else:
+                await self._changed.wait()
+
+
+class SingleFlight:
+    """Registre des vols en cours (threads et boucles asyncio)."""
+
+    def __init__(self):
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    def _join(self, key: Hashable) -> Tuple[_Flight, bool]:
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            flight.subscribers += 1
+            return flight, leader
+
+    def _leave(self, key: Hashable, flight: _Flight) -> None:
+        """Désabonne; le dernier abonné d'un vol inachevé l'annule."""
+        with self._lock:
+            flight.subscribers -= 1
+            if flight.subscribers > 0 or flight.done:
+                return
+            flight.cancelled = True
+            # Les requêtes suivantes démarreront un nouveau vol
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        if flight.task is not None:
+            flight.task.get_loop().call_soon_threadsafe(flight.task.cancel)
+
+    def _hand_off(self, key: Hashable, flight: _Flight) -> bool:
+        """
+        Désabonne le meneur parti avant la fin du vol.
+
+        Returns:
+            True si d'autres abonnés attendent la suite (sinon, le vol est annulé)
+        """
+        with self._lock:
+            flight.subscribers -= 1
+            if flight.subscribers > 0:
+                return True
+            flight.cancelled = True
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            return False
+
+    def _land(self, key: Hashable, flight: _Flight, error: Optional[BaseException]) -> None:
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        flight.finish(error)
+
+    def stream(self, key: Hashable, producer: Callable[[], Iterator]) -> Tuple[Iterator, bool]:
+        """
+        S'abonne au vol d'une clé, ou le démarre.
+
+        Le meneur (première requête) exécute le producteur pendant sa propre
+        lecture: aucun thread supplémentaire, sauf s'il s'arrête avant la fin
+        alors que des abonnés attendent la suite. Un meneur qui cesse de lire
+        sans fermer son itérateur fait attendre ses abonnés.
+
+        Args:
+            key: Clé de la requête
+            producer: Fonction retournant l'itérateur des éléments à produire
+
+        Returns:
+            Tuple (itérateur des éléments, True si ce vol vient d'être démarré)
+        """
+        flight, leader = self._join(key)
+        if leader:
+            return self._lead(key, flight, producer), True
+        return self._subscribe(key, flight), False
+
+    def _lead(self, key: Hashable, flight: _Flight, producer: Callable[[], Iterator]) -> Iterator:
+        items = None
+        error = None
+        try:
+            items = producer()
+            for item in items:
+                flight.publish(item)
+                yield item
+        except GeneratorExit:
+            if self._hand_off(key, flight):
+                threading.Thread(
+                    target=self._run, args=(key, flight, items), name="rag-flight", daemon=True
+                ).start()
+                items = None
+            raise
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            if items is not None:
+                if hasattr(items, 'close'):
+                    items.close()
+                self._land(key, flight, error)
+
+    def _run(self, key: Hashable, flight: _Flight, items: Iterator) -> None:
+        """Poursuit pour les abonnés restants la production abandonnée par le meneur."""
+        error = None
+        try:
+            for item in items:
+                flight.publish(item)
+                if flight.cancelled:
+                    break
+        except BaseException as e:
+            error = e
+        finally:
+            if hasattr(items, 'close'):
+                items.close()
+            self._land(key, flight, error)
+
+    def _subscribe(self, key: Hashable, flight: _Flight) -> Iterator:
+        try:
+            yield from flight.follow()
+        finally:
+            self._leave(key, flight)
+
+    def astream(self, key: Hashable, producer: Callable[[], AsyncIterator]) -> Tuple[AsyncIterator, bool]:
+        """
+        Version asynchrone de stream: le producteur est une tâche de la boucle courante.
+
+        Args:
+            key: Clé de la requête
+            producer: Fonction retournant l'itérateur asynchrone des éléments
+
+        Returns:
+            Tuple (itérateur asynchrone des éléments, True si ce vol vient d'être démarré)
+        """
+        loop = asyncio.get_running_loop()
+        flight, leader = self._join((id(loop), key))
+        if leader:
+            flight._changed = asyncio.Event()
+            flight.task = loop.create_task(self._arun((id(loop), key), flight, producer))
+        return self._asubscribe((id(loop), key), flight), leader
+
+    async def _arun(self, key: Hashable, flight: _Flight, producer: Callable[[], AsyncIterator]) -> None:
+        error = None
+        items = producer()
+        try:
+            async for item in items:
+                flight.publish(item)
+        except asyncio.CancelledError:
+            error = asyncio.CancelledError()
+        except Exception as e:
+            error = e
+        finally:
+            await items.aclose()
+            self._land(key, flight, error)
+
+    async def _asubscribe(self, key: Hashable, flight: _Flight) -> AsyncIterator:
+        try:
+            async for item in flight.afollow():
+                yield item
+        finally:
+            self._leave(key, flight)
@@ -0,0 +1,143 @@
+"""
+Regroupement des tokens du LLM en trames pour le streaming.
+Au lieu d'émettre un message par token, les tokens sont accumulés et envoyés
+toutes les flush_interval secondes ou tous les max_tokens tokens. L'envoi ne
+dépend pas de l'arrivée du token suivant: si le LLM marque une pause, les
+tokens déjà reçus partent au plus tard flush_interval secondes après la
+trame précédente.
+"""
+
+import asyncio
+import queue
+import threading
+import time
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator
+
+
+def coalesce_tokens(
+    tokens: Iterable[str],
+    flush_interval: float = 0.03,
+    max_tokens: int = 16
+) -> Iterator[str]:
+    """
+    Regroupe un flux de tokens en trames.
+
+    Le premier token est émis immédiatement pour ne pas retarder le premier
+    affichage; les suivants sont regroupés. Les tokens sont lus par un thread
+    dédié et transmis par une file: l'attente du token suivant est bornée par
+    l'échéance de la trame en cours.
+
+    Args:
+        tokens: Flux de tokens
+        flush_interval: Délai maximal entre deux trames (secondes)
+        max_tokens: Nombre maximal de tokens par trame
+
+    Yields:
+        Trames de texte (concaténation de tokens)
+    """
+    items: "queue.Queue" = queue.Queue()
+    stop = threading.Event()
+
+    def pump():
+        try:
+            for token in tokens:
+                items.put(('token', token))
+                if stop.is_set():
+                    break
+        except BaseException as e:
+            items.put(('error', e))
+        finally:
+            # Fermé dans le thread qui l'exécute (un générateur ne peut l'être ailleurs)
+            if hasattr(tokens, 'close'):
+                tokens.close()
+            items.put(('end', None))
+
+    threading.Thread(target=pump, name="rag-coalesce", daemon=True).start()
+
+    buffer = []
+    last_flush = None
+    try:
+        while True:
+            timeout = max(0.0, last_flush + flush_interval - time.monotonic()) if buffer else None
+            try:
+                kind, value = items.get(timeout=timeout)
+            except queue.Empty:
+                # Pause du LLM: la trame en cours part sans attendre le token suivant
+                yield "".join(buffer)
+                buffer = []
+                last_flush = time.monotonic()
+                continue
+            if kind == 'end':
+                break
+            if kind == 'error':
+                raise value
+
+            buffer.append(value)
+            now = time.monotonic()
+            if last_flush is None or len(buffer) >= max_tokens or now - last_flush >= flush_interval:
+                yield "".join(buffer)
+                buffer = []
+                last_flush = now
+        if buffer:
+            yield "".join(buffer)
+    finally:
+        stop.set()
+
+
+async def acoalesce_tokens(
+    tokens: AsyncIterable[str],
+    flush_interval: float = 0.03,
+    max_tokens: int = 16
+) -> AsyncIterator[str]:
+    """
+    Version asynchrone de coalesce_tokens.
+
+    La lecture du token suivant est une tâche attendue jusqu'à l'échéance de
+    la trame en cours: à l'échéance, la trame part et la même lecture reste
+    en attente (elle n'est pas annulée, ce qui interromprait le flux).
+
+    Args:
+        tokens: Flux asynchrone de tokens
+        flush_interval: Délai maximal entre deux trames (secondes)
+        max_tokens: Nombre maximal de tokens par trame
+
+    Yields:
+        Trames de texte (concaténation de tokens)
+    """
+    iterator = tokens.__aiter__()
+    pending = None
+    buffer = []
+    last_flush = None
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(iterator.__anext__())
+            timeout = max(0.0, last_flush + flush_interval - time.monotonic()) if buffer else None
+            done, _ = await asyncio.wait({pending}, timeout=timeout)
+            if not done:
+                # Pause du LLM: la trame en cours part sans attendre le token suivant
+                yield "".join(buffer)
+                buffer = []
+                last_flush = time.monotonic()
+                continue
+
+            read, pending = pending, None
+            try:
+                token = read.result()
+            except StopAsyncIteration:
+                break
+
+            buffer.append(token)
+            now = time.monotonic()
+            if last_flush is None or len(buffer) >= max_tokens or now - last_flush >= flush_interval:
+                yield "".join(buffer)
+                buffer = []
+                last_flush = now
+        if buffer:
+            yield "".join(buffer)
+    finally:
+        if pending is not None:
+            pending.cancel()
+            await asyncio.wait({pending})
+        if hasattr(iterator, 'aclose'):
+            await iterator.aclose()
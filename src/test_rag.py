@@ -3,8 +3,10 @@ Tests unitaires pour le système RAG.
 """
 
 import unittest
+import tempfile
 from pathlib import Path
-from chunking import parse_regulation_to_chunks
+import numpy as np
+from chunking import parse_regulation_to_chunks, compute_chunk_uid
 
 
 class TestChunking(unittest.TestCase):
@@ -56,11 +58,809 @@ class TestChunking(unittest.TestCase):
         article_nums = [chunk['article_num'] for chunk in chunks]
         self.assertIn('5', article_nums)
         self.assertIn('6', article_nums)
+    
+    def test_chunk_uid_stability(self):
+        """Teste la stabilité des IDs dérivés du contenu."""
+        chunks = parse_regulation_to_chunks(self.sample_text)
+        edited = parse_regulation_to_chunks(
+            self.sample_text.replace("промаркирована", "маркирована")
+        )
+        
+        uids = [compute_chunk_uid(chunk) for chunk in chunks]
+        edited_uids = [compute_chunk_uid(chunk) for chunk in edited]
+        
+        # Un seul chunk modifié doit changer d'ID
+        self.assertEqual(len(set(uids) - set(edited_uids)), 1)
+        self.assertTrue(all(uid.startswith(chunk['id'] + '#') for uid, chunk in zip(uids, chunks)))
+    
+    def test_streaming_parser(self):
+        """Teste que le parseur incrémental produit les chunks au fil de la lecture."""
+        from chunking import iter_regulation_chunks
+        
+        lines = self.sample_text.splitlines(keepends=True)
+        read = []
+        
+        def reader():
+            for line in lines:
+                read.append(line)
+                yield line
+        
+        chunks = iter_regulation_chunks(reader())
+        first = next(chunks)
+        
+        # Les chunks de l'article 5 sont produits dès le début de l'article 6
+        self.assertEqual(first['id'], '5.1')
+        self.assertLess(len(read), len(lines))
+        self.assertEqual([first] + list(chunks), parse_regulation_to_chunks(self.sample_text))
+
+
+class TestEmbeddingCache(unittest.TestCase):
+    """Tests pour le cache persistant des embeddings."""
+    
+    def setUp(self):
+        """Initialisation des tests."""
+        from embedding_cache import EmbeddingCache
+        
+        self.cache_dir = tempfile.mkdtemp()
+        self.make_cache = lambda n: EmbeddingCache(self.cache_dir, 'test-model', max_entries=n)
+        self.calls = []
+    
+    def fake_encode(self, texts):
+        """Encodeur factice qui enregistre ses appels."""
+        self.calls.append(list(texts))
+        return np.array([[len(t), 1.0, 0.0] for t in texts], dtype=np.float32)
+    
+    def test_only_missing_texts_are_encoded(self):
+        """Teste que seuls les textes absents sont encodés."""
+        cache = self.make_cache(10)
+        first = cache.encode(["Статья 5", "Статья 6"], self.fake_encode)
+        second = cache.encode(["Статья  5 ", "Статья 7"], self.fake_encode)
+        
+        self.assertEqual(self.calls, [["Статья 5", "Статья 6"], ["Статья 7"]])
+        np.testing.assert_array_equal(first[0], second[0])
+    
+    def test_persistence_and_eviction(self):
+        """Teste la persistance sur disque et l'éviction LRU."""
+        cache = self.make_cache(2)
+        cache.encode(["a", "b"], self.fake_encode)
+        cache.get_many(["a"])
+        cache.encode(["c"], self.fake_encode)
+        cache.flush()
+        
+        reopened = self.make_cache(2)
+        found = [vector is not None for vector in reopened.get_many(["a", "b", "c"])]
+        self.assertEqual(found, [True, False, True])
+    
+    def test_slot_reused_by_another_process(self):
+        """Teste qu'un emplacement réattribué par une autre instance est un miss."""
+        first = self.make_cache(2)
+        first.encode(["x"], self.fake_encode)
+        second = self.make_cache(2)
+        second.encode(["yy", "zzz"], self.fake_encode)
+        
+        self.assertIsNone(first.get_many(["x"])[0])
+        self.assertEqual(first.encode(["zzz"], self.fake_encode)[0][0], 3)
+    
+    def test_lru_cache(self):
+        """Teste le cache LRU en mémoire et ses compteurs."""
+        from embedding_cache import LRUCache
+        
+        cache = LRUCache(max_size=2)
+        cache.put("q1", 1)
+        cache.put("q2", 2)
+        self.assertEqual(cache.get("q1"), 1)
+        cache.put("q3", 3)
+        
+        self.assertIsNone(cache.get("q2"))
+        self.assertEqual(cache.stats(), {'size': 2, 'hits': 1, 'misses': 1})
+
+
+class TestSemanticAnswerCache(unittest.TestCase):
+    """Tests pour le cache sémantique des réponses."""
+    
+    def test_similarity_threshold(self):
+        """Teste la recherche par similarité cosinus."""
+        from answer_cache import SemanticAnswerCache
+        
+        cache = SemanticAnswerCache(similarity_threshold=0.9, ttl_seconds=60, max_entries=4)
+        cache.store(np.array([1.0, 0.0, 0.0]), 5, "q", "réponse", ["doc"], [{'article_num': '5'}])
+        
+        hit = cache.lookup(np.array([0.99, 0.05, 0.0]), 5)
+        self.assertEqual(hit['answer'], "réponse")
+        self.assertIsNone(cache.lookup(np.array([0.0, 1.0, 0.0]), 5))
+        self.assertIsNone(cache.lookup(np.array([1.0, 0.0, 0.0]), 3))
+    
+    def test_exact_lookup_counts(self):
+        """Teste que les recherches exactes comptent leurs succès et leurs échecs."""
+        from answer_cache import SemanticAnswerCache
+        
+        cache = SemanticAnswerCache(similarity_threshold=0.9, ttl_seconds=60, max_entries=4)
+        cache.store(None, 5, "Статья 5?", "réponse", [], [])
+        
+        self.assertEqual(cache.lookup_exact("Статья  5? ", 5)['answer'], "réponse")
+        self.assertIsNone(cache.lookup_exact("Статья 6?", 5))
+        self.assertEqual(cache.stats(), {'size': 1, 'hits': 1, 'misses': 1})
+    
+    def test_ttl_eviction_and_clear(self):
+        """Teste l'expiration, l'éviction et l'invalidation."""
+        from answer_cache import SemanticAnswerCache
+        
+        cache = SemanticAnswerCache(similarity_threshold=0.9, ttl_seconds=60, max_entries=2)
+        for i in range(3):
+            cache.store(np.eye(3)[i], 5, f"q{i}", f"a{i}", [], [])
+        
+        self.assertIsNone(cache.lookup(np.eye(3)[0], 5))
+        self.assertEqual(cache.lookup(np.eye(3)[2], 5)['answer'], "a2")
+        
+        cache.ttl_seconds = 0
+        self.assertIsNone(cache.lookup(np.eye(3)[2], 5))
+        
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+
+class TestNumpyVectorStore(unittest.TestCase):
+    """Tests pour la base vectorielle NumPy."""
+    
+    def setUp(self):
+        """Initialisation des tests."""
+        from vector_store import NumpyVectorStore
+        
+        self.path = tempfile.mkdtemp()
+        self.store = NumpyVectorStore(self.path)
+        self.store.upsert(
+            ids=["5.1", "5.2", "6.1"],
+            embeddings=np.array([[1.0, 0.0], [0.7, 0.7], [0.0, 1.0]]),
+            documents=["a", "b", "c"],
+            metadatas=[{'article_num': '5'}, {'article_num': '5'}, {'article_num': '6'}]
+        )
+    
+    def test_exact_search(self):
+        """Teste l'ordre des résultats et les distances cosinus."""
+        results = self.store.query(np.array([[1.0, 0.1]]), n_results=2)
+        
+        self.assertEqual(results['ids'][0], ["5.1", "5.2"])
+        self.assertAlmostEqual(results['distances'][0][0], 1 - 1 / np.sqrt(1.01), places=5)
+    
+    def test_filter_and_persistence(self):
+        """Teste les filtres de métadonnées, la suppression et la réouverture."""
+        from vector_store import NumpyVectorStore
+        
+        self.store.delete(["5.1"])
+        reopened = NumpyVectorStore(self.path)
+        results = reopened.query(np.array([[1.0, 0.0]]), n_results=5, where={'article_num': '5'})
+        
+        self.assertEqual(reopened.count(), 2)
+        self.assertEqual(results['ids'][0], ["5.2"])
+        
+        # Métadonnées seulement (reconstruction de l'index des articles)
+        records = reopened.get(where={'article_num': '6'}, include=["metadatas"])
+        self.assertEqual(records, {'ids': ["6.1"], 'metadatas': [{'article_num': '6'}]})
+    
+    def test_quantized_search(self):
+        """Teste que les codes compacts suivis du rescoring donnent les résultats exacts."""
+        from vector_store import QUANTIZATIONS, NumpyVectorStore
+        
+        rng = np.random.default_rng(0)
+        vectors = rng.standard_normal((300, 64))
+        queries = vectors[:5] + 0.1 * rng.standard_normal((5, 64))
+        path = tempfile.mkdtemp()
+        base = NumpyVectorStore(path)
+        base.upsert([str(i) for i in range(300)], vectors, [""] * 300, [{}] * 300)
+        exact = base.query(queries, n_results=3)
+        
+        for quantization in QUANTIZATIONS[1:]:
+            # Binaire: préfiltre grossier, exact seulement si tous les vecteurs sont rescorés
+            factor = 100 if quantization == "binary" else 10
+            store = NumpyVectorStore(path, quantization=quantization, rescore_factor=factor)
+            results = store.query(queries, n_results=3)
+            
+            self.assertTrue((Path(path) / f"codes.{quantization}.1.npy").exists())
+            self.assertLess(store.storage_stats()['search_bytes'], base.storage_stats()['search_bytes'])
+            self.assertEqual(results['ids'], exact['ids'])
+            np.testing.assert_allclose(results['distances'], exact['distances'], atol=1e-5)
+        
+        # À l'écriture suivante, seuls les codes du mode courant sont conservés
+        store.delete(["299"])
+        self.assertEqual(sorted(p.name for p in Path(path).glob("codes.*")), ["codes.binary.2.npy"])
+    
+    def test_interrupted_write_keeps_previous_version(self):
+        """Teste qu'une écriture interrompue avant le manifeste laisse la version précédente."""
+        from vector_store import NumpyVectorStore
+        
+        # Fichiers d'une version 2 écrits, manifeste non remplacé
+        np.save(Path(self.path) / "vectors.2.npy", np.ones((5, 2), dtype=np.float32))
+        reopened = NumpyVectorStore(self.path)
+        self.assertEqual(reopened.get_ids(), ["5.1", "5.2", "6.1"])
+        
+        # Ancien format sans manifeste: vecteurs et enregistrements doivent correspondre
+        legacy = tempfile.mkdtemp()
+        np.save(Path(legacy) / "vectors.npy", np.ones((2, 2), dtype=np.float32))
+        (Path(legacy) / "records.json").write_text('{"ids": ["a"], "documents": [""], "metadatas": [{}]}')
+        with self.assertRaises(ValueError):
+            NumpyVectorStore(legacy)
+    
+    def test_queries_during_writes(self):
+        """Teste que les recherches restent cohérentes pendant des écritures concurrentes."""
+        import threading
+        
+        errors = []
+        stop = threading.Event()
+        
+        def reader():
+            while not stop.is_set():
+                try:
+                    results = self.store.query(np.array([[1.0, 0.0]]), n_results=50)
+                    for doc_id, document in zip(results['ids'][0], results['documents'][0]):
+                        assert document == f"doc {doc_id}" or doc_id in ("5.1", "5.2", "6.1"), doc_id
+                except Exception as e:
+                    errors.append(e)
+        
+        thread = threading.Thread(target=reader)
+        thread.start()
+        for i in range(30):
+            ids = [f"n{i}.{j}" for j in range(3)]
+            self.store.upsert(ids, np.random.rand(3, 2), [f"doc {x}" for x in ids], [{}] * 3)
+            self.store.delete(ids[:1])
+        stop.set()
+        thread.join()
+        
+        self.assertEqual(errors, [])
+        self.assertEqual(self.store.count(), 3 + 30 * 2)
+
+
+class TestQueryRouter(unittest.TestCase):
+    """Tests pour le routage des références d'articles et de points."""
+    
+    def test_parse_references(self):
+        """Teste l'extraction des références en russe et en français."""
+        from query_router import parse_references
+        
+        self.assertEqual(parse_references("Что говорится в статье 5?"), [('5', None)])
+        self.assertEqual(parse_references("Что сказано в пункте 3 статьи 5?"), [('5', '3')])
+        self.assertEqual(parse_references("Le point 2 de l'article 12"), [('12', '2')])
+        self.assertEqual(parse_references("art. 7 et 8"), [('7', None), ('8', None)])
+        self.assertEqual(parse_references("Какие документы необходимы?"), [])
+    
+    def test_metadata_index_plan(self):
+        """Teste la résolution directe et le repli sur la recherche filtrée."""
+        from query_router import MetadataIndex
+        
+        chunks = [
+            {'id': f"{article}.{point}", 'article_num': article, 'point_num': point}
+            for article, point in [('5', '1'), ('5', '2'), ('5', '3'), ('6', '1'), ('6', '2')]
+        ]
+        index = MetadataIndex([c['id'] for c in chunks], chunks)
+        
+        self.assertEqual(index.plan([('6', '2')], 5), {'ids': ['6.2'], 'articles': []})
+        self.assertEqual(index.plan([('5', None)], 5), {'ids': ['5.1', '5.2', '5.3'], 'articles': []})
+        self.assertEqual(index.plan([('5', None)], 2), {'ids': [], 'articles': ['5']})
+
+
+class TestContextBuilder(unittest.TestCase):
+    """Tests pour la construction du contexte sous budget de tokens."""
+    
+    def test_whole_chunks_within_budget(self):
+        """Teste que les chunks sont ajoutés entiers, sans doublons."""
+        from context_builder import TokenCounter, build_context
+        
+        counter = TokenCounter()
+        documents = ["Первый пункт статьи.", "Первый пункт статьи.", "Второй " * 200, "Третий пункт."]
+        packed = build_context(documents, [{'n': i} for i in range(4)], max_tokens=30, counter=counter)
+        
+        self.assertEqual(packed['documents'], ["Первый пункт статьи.", "Третий пункт."])
+        self.assertEqual([m['n'] for m in packed['metadatas']], [0, 3])
+        self.assertLessEqual(packed['tokens'], 30)
+        self.assertEqual(packed['tokens'], counter.count(packed['context']))
+    
+    def test_position_order(self):
+        """Teste le classement du contexte par article et point, les sources restant par pertinence."""
+        from context_builder import CONTEXT_SEPARATOR, TokenCounter, build_context, position_key
+        from prompts import prompt_template, stable_prefix
+        
+        metadatas = [
+            {'id': 'c', 'article_num': '10', 'point_num': '10.2'},
+            {'id': 'a', 'article_num': '2', 'point_num': '2.10'},
+            {'id': 'b', 'article_num': '2', 'point_num': '2.9'},
+        ]
+        packed = build_context(
+            ["Десятая статья.", "Пункт 2.10.", "Пункт 2.9."], metadatas,
+            max_tokens=100, counter=TokenCounter(), sort_key=position_key
+        )
+        
+        self.assertEqual(packed['context'].split(CONTEXT_SEPARATOR), ["Пункт 2.9.", "Пункт 2.10.", "Десятая статья."])
+        self.assertEqual([m['id'] for m in packed['metadatas']], ['c', 'a', 'b'])
+        self.assertEqual(packed['documents'][0], "Десятая статья.")
+        self.assertTrue(prompt_template('prefix').startswith(stable_prefix('prefix')))
+        self.assertNotIn("{", stable_prefix('prefix'))
+
+
+class TestStreaming(unittest.TestCase):
+    """Tests pour le regroupement des tokens en trames."""
+    
+    def test_coalesce_tokens(self):
+        """Teste que les trames conservent le texte et respectent max_tokens."""
+        from streaming import coalesce_tokens
+        
+        tokens = [f"t{i} " for i in range(10)]
+        frames = list(coalesce_tokens(tokens, flush_interval=60, max_tokens=4))
+        
+        self.assertEqual("".join(frames), "".join(tokens))
+        self.assertEqual(frames[0], "t0 ")  # Premier token émis immédiatement
+        self.assertEqual(len(frames), 4)
+    
+    def test_flush_during_stall(self):
+        """Teste que les tokens reçus partent à l'échéance même si le LLM marque une pause."""
+        import asyncio
+        import time
+        from streaming import acoalesce_tokens, coalesce_tokens
+        
+        def tokens():
+            yield "a"
+            yield "b"
+            time.sleep(0.5)
+            yield "c"
+        
+        async def atokens():
+            yield "a"
+            yield "b"
+            await asyncio.sleep(0.5)
+            yield "c"
+        
+        async def aframes():
+            return [(frame, time.monotonic() - start) async for frame in acoalesce_tokens(atokens(), 0.05, 16)]
+        
+        start = time.monotonic()
+        sync_frames = [(frame, time.monotonic() - start) for frame in coalesce_tokens(tokens(), 0.05, 16)]
+        start = time.monotonic()
+        async_frames = asyncio.run(aframes())
+        
+        for frames in (sync_frames, async_frames):
+            self.assertEqual([frame for frame, _ in frames], ["a", "b", "c"])
+            self.assertLess(frames[1][1], 0.3)  # "b" envoyé pendant la pause, avant "c"
+
+
+class TestCorpus(unittest.TestCase):
+    """Tests pour l'ingestion d'un corpus de règlements."""
+    
+    def setUp(self):
+        """Crée un corpus de deux règlements au texte identique."""
+        self.corpus_dir = Path(tempfile.mkdtemp())
+        text = "Статья 1. Общие положения\n\n1. Первый пункт.\n2. Второй пункт.\n"
+        (self.corpus_dir / "tr_a.txt").write_text(text, encoding='utf-8')
+        (self.corpus_dir / "tr_b.txt").write_text(text, encoding='utf-8')
+    
+    def test_parallel_parsing_tags_documents(self):
+        """Teste le parsing parallèle et l'unicité des IDs entre documents."""
+        from corpus import iter_corpus_chunks
+        
+        serial = list(iter_corpus_chunks(str(self.corpus_dir), workers=1))
+        parallel = list(iter_corpus_chunks(str(self.corpus_dir), workers=2))
+        
+        self.assertEqual(sorted(serial, key=compute_chunk_uid), sorted(parallel, key=compute_chunk_uid))
+        self.assertEqual({chunk['doc_id'] for chunk in serial}, {'tr_a', 'tr_b'})
+        self.assertEqual(len({compute_chunk_uid(chunk) for chunk in serial}), 4)
+    
+    def test_document_filter(self):
+        """Teste la restriction de la recherche à un document."""
+        from corpus import iter_corpus_chunks
+        from rag_system import chunk_metadata, metadata_filter
+        from vector_store import NumpyVectorStore
+        
+        chunks = list(iter_corpus_chunks(str(self.corpus_dir), workers=1))
+        store = NumpyVectorStore(tempfile.mkdtemp())
+        store.upsert(
+            [compute_chunk_uid(c) for c in chunks],
+            np.ones((len(chunks), 3), dtype=np.float32),
+            [c['text'] for c in chunks],
+            [chunk_metadata(c) for c in chunks]
+        )
+        
+        where = metadata_filter(articles=['1'], doc_ids=['tr_b'])
+        results = store.query(np.ones((1, 3)), n_results=4, where=where)
+        self.assertEqual(len(results['ids'][0]), 2)
+        self.assertTrue(all(m['doc_id'] == 'tr_b' for m in results['metadatas'][0]))
+
+
+class TestChunkStore(unittest.TestCase):
+    """Tests pour le chunk store (JSONL + index des offsets)."""
+    
+    def test_random_access_and_conversion(self):
+        """Teste l'accès par ID, l'itération et la conversion depuis chunks.txt."""
+        from chunk_store import ChunkStore, convert_txt_to_store, write_chunk_store
+        from chunking import save_chunks_to_txt
+        
+        chunks = parse_regulation_to_chunks(
+            "Статья 1. Общие положения\n\n1. Первый пункт.\n2. Второй пункт.\n\n"
+            "Статья 2. Требования\n\n1. Третий пункт.\n"
+        )
+        tricky = dict(chunks[0], point_num='9', text="Texte avec\n" + "-" * 80 + "\nséparateur")
+        path = tempfile.mkdtemp()
+        write_chunk_store(chunks + [tricky], path)
+        
+        store = ChunkStore(path)
+        self.assertEqual(len(store), 4)
+        self.assertEqual(list(store), chunks + [tricky])
+        self.assertEqual(store.get(compute_chunk_uid(chunks[2])), chunks[2])
+        self.assertEqual(store.get(compute_chunk_uid(tricky))['text'], tricky['text'])
+        self.assertIsNone(store.get("absent"))
+        store.close()
+        
+        txt_file = str(Path(tempfile.mkdtemp()) / "chunks.txt")
+        save_chunks_to_txt(chunks, txt_file)
+        converted = tempfile.mkdtemp()
+        convert_txt_to_store(txt_file, converted)
+        self.assertEqual(sorted(ChunkStore(converted).ids()), sorted(compute_chunk_uid(c) for c in chunks))
+    
+    def test_rewrite_keeps_readers_consistent(self):
+        """Teste qu'une réécriture (complète ou interrompue) ne mélange pas deux versions."""
+        from chunk_store import ChunkStore, ChunkStoreWriter, write_chunk_store
+        
+        chunks = parse_regulation_to_chunks("Статья 1. Общие\n\n1. Первый пункт.\n2. Второй пункт.\n")
+        edited = [dict(chunk, text=chunk['text'] + " (изм.)") for chunk in chunks]
+        path = tempfile.mkdtemp()
+        write_chunk_store(chunks, path)
+        before = ChunkStore(path)
+        
+        with self.assertRaises(RuntimeError):
+            with ChunkStoreWriter(path) as writer:
+                writer.add(edited[0])
+                raise RuntimeError("interruption")
+        self.assertEqual(list(ChunkStore(path)), chunks)
+        
+        write_chunk_store(edited, path)
+        after = ChunkStore(path)
+        self.assertEqual(list(before), chunks)
+        # Lecteur ouvert avant la réécriture: index et enregistrements de la même version
+        self.assertEqual(sorted(c['text'] for c in before.get_many(before.ids())), sorted(c['text'] for c in chunks))
+        self.assertEqual(sorted(c['text'] for c in after.get_many(after.ids())), sorted(c['text'] for c in edited))
+        self.assertEqual(sorted(p.name for p in Path(path).iterdir()), ["chunks.2.jsonl", "index.2.npy", "manifest.json"])
+        before.close(), after.close()
+
+
+class TestMetrics(unittest.TestCase):
+    """Tests pour les métriques Prometheus."""
+    
+    def test_histogram_rendering(self):
+        """Teste le rendu texte d'un histogramme à labels."""
+        from metrics import MetricsRegistry
+        
+        registry = MetricsRegistry()
+        histogram = registry.histogram("latency_seconds", "Latence", ("stage",), buckets=(0.1, 1.0))
+        histogram.observe(0.05, stage="encode")
+        histogram.observe(0.5, stage="encode")
+        histogram.observe(5.0, stage="encode")
+        
+        text = registry.render()
+        self.assertIn("# TYPE latency_seconds histogram", text)
+        self.assertIn('latency_seconds_bucket{stage="encode",le="0.1"} 1', text)
+        self.assertIn('latency_seconds_bucket{stage="encode",le="1"} 2', text)
+        self.assertIn('latency_seconds_bucket{stage="encode",le="+Inf"} 3', text)
+        self.assertIn('latency_seconds_count{stage="encode"} 3', text)
+    
+    def test_query_stages(self):
+        """Teste l'enregistrement des étapes, du TTFT et des tokens d'une requête."""
+        from rag_system import RAGSystem
+        from vector_store import NumpyVectorStore
+        
+        class ConstantEncoder:
+            def encode(self, texts, show_progress_bar=False):
+                return np.ones((len(texts), 2), dtype=np.float32)
+        
+        class TokenLLM:
+            def stream(self, prompt, **kwargs):
+                yield from ["Réponse ", "de ", "test."]
+        
+        class Template:
+            def format(self, **kwargs):
+                return "{context}\n{question}".format(**kwargs)
+        
+        rag = RAGSystem(embedding_cache_dir=None, preload=False, warmup=False)
+        rag.vector_store = NumpyVectorStore(tempfile.mkdtemp())
+        rag.embedding_model = ConstantEncoder()
+        rag._set_component('llm', TokenLLM())
+        rag._prompt_template = Template()
+        chunks = parse_regulation_to_chunks("Статья 1. Общие положения\n\n1. Первый пункт.\n2. Второй пункт.\n")
+        rag._upsert_chunks([compute_chunk_uid(c) for c in chunks], chunks)
+        
+        events = list(rag.stream_events("Общие положения?", n_results=2))
+        self.assertEqual(events[-1]['type'], 'sources')
+        
+        metrics = rag.metrics
+        for stage in ('encode', 'vector_search', 'context', 'prompt', 'llm_prefill', 'llm_decode'):
+            self.assertEqual(metrics.stage_seconds.snapshot(stage=stage)['count'], 1, stage)
+        self.assertEqual(metrics.ttft_seconds.snapshot(mode='stream')['count'], 1)
+        self.assertEqual(metrics.generated_tokens.value(), 3)
+        self.assertEqual(metrics.requests.value(mode='stream', status='ok'), 1)
+        self.assertEqual(metrics.cache_lookups.value(cache='answer_exact', result='miss'), 1)
+        self.assertIn('rag_chunks_retrieved_count 1', rag.metrics.render())
+
+
+class TestAdmission(unittest.TestCase):
+    """Tests pour la file d'admission du service HTTP."""
+    
+    def test_queue_full_and_timeout(self):
+        """Teste le refus 429 (file pleine), le refus 503 (attente) et la transmission des places."""
+        import asyncio
+        from admission import AdmissionController, AdmissionRejected
+        
+        async def scenario():
+            admission = AdmissionController(max_concurrency=1, max_queue=1, queue_timeout=0.05)
+            await admission.acquire()
+            
+            waiter = asyncio.ensure_future(admission.acquire())
+            await asyncio.sleep(0)
+            with self.assertRaises(AdmissionRejected) as full:
+                await admission.acquire()
+            self.assertEqual(full.exception.status_code, 429)
+            
+            with self.assertRaises(AdmissionRejected) as timeout:
+                await waiter
+            self.assertEqual(timeout.exception.status_code, 503)
+            
+            waiter = asyncio.ensure_future(admission.acquire())
+            await asyncio.sleep(0)
+            admission.release()
+            await waiter
+            self.assertEqual((admission.active, admission.waiting), (1, 0))
+            admission.release()
+            self.assertEqual(admission.active, 0)
+            return admission.stats()
+        
+        stats = asyncio.run(scenario())
+        self.assertEqual(stats['rejected'], {'queue_full': 1, 'queue_timeout': 1})
+
+
+class TestSingleFlight(unittest.TestCase):
+    """Tests pour le regroupement des requêtes identiques."""
+    
+    def test_late_joiner_gets_prefix(self):
+        """Teste qu'un abonné tardif reçoit le préfixe et que le producteur ne tourne qu'une fois, dans le thread du meneur."""
+        import threading
+        from single_flight import SingleFlight
+        
+        threads = []
+        resume = threading.Event()
+        
+        def producer():
+            threads.append(threading.current_thread())
+            yield "a"
+            yield "b"
+            resume.wait(5)
+            yield "c"
+        
+        flights = SingleFlight()
+        first, leader = flights.stream("clé", producer)
+        self.assertTrue(leader)
+        self.assertEqual([next(first), next(first)], ["a", "b"])
+        
+        late, leader = flights.stream("clé", producer)
+        self.assertFalse(leader)
+        received = []
+        follower = threading.Thread(target=lambda: received.extend(late))
+        follower.start()
+        resume.set()
+        
+        self.assertEqual(list(first), ["c"])
+        follower.join(5)
+        self.assertEqual(received, ["a", "b", "c"])
+        self.assertEqual(threads, [threading.current_thread()])
+        self.assertEqual(len(flights), 0)
+    
+    def test_leader_leaving_hands_off(self):
+        """Teste que la production continue pour les abonnés quand le meneur part avant la fin."""
+        import threading
+        from single_flight import SingleFlight
+        
+        resume = threading.Event()
+        
+        def producer():
+            yield "a"
+            resume.wait(5)
+            yield "b"
+        
+        flights = SingleFlight()
+        first, _ = flights.stream("clé", producer)
+        self.assertEqual(next(first), "a")
+        late, _ = flights.stream("clé", producer)
+        
+        first.close()
+        resume.set()
+        
+        self.assertEqual(list(late), ["a", "b"])
+        self.assertEqual(len(flights), 0)
+
+
+class TestMicroBatch(unittest.TestCase):
+    """Tests pour le regroupement des appels concurrents."""
+    
+    def test_concurrent_items_share_a_batch(self):
+        """Teste que les éléments soumis pendant l'attente sont traités en un appel, dans l'ordre."""
+        from micro_batch import MicroBatcher
+        
+        batches = []
+        
+        def square(items):
+            batches.append(list(items))
+            return [item * item for item in items]
+        
+        batcher = MicroBatcher(square, max_batch_size=4, max_wait_ms=200)
+        futures = [batcher.submit(i) for i in range(6)]
+        
+        self.assertEqual([future.result(5) for future in futures], [0, 1, 4, 9, 16, 25])
+        self.assertEqual(batches, [[0, 1, 2, 3], [4, 5]])
+        
+        failing = MicroBatcher(lambda items: 1 / 0, max_wait_ms=0)
+        with self.assertRaises(ZeroDivisionError):
+            failing.map([1, 2])
+    
+    def test_missing_results_fail_every_caller(self):
+        """Teste qu'un lot avec trop peu de résultats échoue pour tous les appelants."""
+        from micro_batch import MicroBatcher
+        
+        batcher = MicroBatcher(lambda items: items[:1], max_batch_size=3, max_wait_ms=200)
+        futures = [batcher.submit(i) for i in range(3)]
+        
+        for future in futures:
+            with self.assertRaises(ValueError):
+                future.result(5)
+
+
+class TestLLMPool(unittest.TestCase):
+    """Tests pour la répartition des générations entre serveurs LLM."""
+    
+    def test_least_outstanding_and_failover(self):
+        """Teste le choix du serveur le moins chargé et la reprise sur un autre serveur."""
+        from llm_pool import LLMBackend, LLMPool, NoBackendAvailable
+        
+        class FakeLLM:
+            def __init__(self, fail=False):
+                self.fail = fail
+                self.calls = 0
+            
+            def stream(self, prompt):
+                self.calls += 1
+                if self.fail:
+                    raise ConnectionError("refusé")
+                yield from prompt.split()
+        
+        a, b, c = FakeLLM(), FakeLLM(), FakeLLM(fail=True)
+        pool = LLMPool([LLMBackend("http://a", a), LLMBackend("http://b", b), LLMBackend("http://c", c)])
+        
+        # Deux générations en cours: la troisième va sur le serveur libre
+        first, second = pool.stream("un deux"), pool.stream("un deux")
+        next(first), next(second)
+        self.assertEqual((a.calls, b.calls), (1, 1))
+        self.assertEqual(pool.invoke("trois quatre"), "troisquatre")
+        self.assertEqual(c.calls, 1)
+        self.assertFalse(pool.backends[2].healthy)
+        self.assertEqual(a.calls + b.calls, 3)
+        first.close(), second.close()
+        self.assertEqual([backend.outstanding for backend in pool.backends], [0, 0, 0])
+        
+        # Serveur écarté: plus sollicité tant que les autres répondent
+        pool.invoke("cinq")
+        self.assertEqual(c.calls, 1)
+        
+        pool.check_health(probe=lambda host, timeout: None)
+        self.assertTrue(pool.backends[2].healthy)
+        
+        a.fail = b.fail = True
+        with self.assertRaises(NoBackendAvailable):
+            pool.invoke("six")
+    
+    def test_uncapped_backend(self):
+        """Teste qu'un serveur sans capacité (0) n'impose aucune attente."""
+        from llm_pool import LLMBackend, LLMPool, parse_host
+        
+        class FakeLLM:
+            def stream(self, prompt):
+                yield prompt
+        
+        self.assertEqual(parse_host("http://a:11434/", 0), ("http://a:11434", 0))
+        self.assertEqual(parse_host("http://a:11434=8", 0), ("http://a:11434", 8))
+        
+        pool = LLMPool([LLMBackend("http://a", FakeLLM(), None, 0)], queue_timeout=0.1)
+        streams = [pool.stream("x") for _ in range(20)]
+        for stream in streams:
+            next(stream)
+        self.assertEqual(pool.backends[0].outstanding, 20)
+        for stream in streams:
+            stream.close()
+        self.assertEqual(pool.backends[0].outstanding, 0)
+
+
+class TestEncoders(unittest.TestCase):
+    """Tests pour les backends de l'encodeur."""
+    
+    def test_onnx_pooling_preserves_order(self):
+        """Teste le pooling de l'encodeur ONNX et l'ordre des embeddings."""
+        from encoders import OnnxEncoder
+        
+        class Tokenizer:
+            def __call__(self, texts, **kwargs):
+                length = max(len(t) for t in texts)
+                ids = np.array([[len(t)] * length for t in texts])
+                mask = np.array([[1] * len(t) + [0] * (length - len(t)) for t in texts])
+                return {'input_ids': ids, 'attention_mask': mask}
+        
+        class Session:
+            def run(self, outputs, inputs):
+                # État caché = longueur du texte pour chaque token
+                return [inputs['input_ids'][..., None].astype(np.float32) * np.ones(2)]
+        
+        encoder = OnnxEncoder.__new__(OnnxEncoder)
+        encoder.config = {'pooling': 'mean', 'normalize': False, 'dim': 2}
+        encoder.tokenizer = Tokenizer()
+        encoder.session = Session()
+        encoder.max_seq_length = 128
+        
+        embeddings = encoder.encode(["a", "abc", "ab"], batch_size=2)
+        np.testing.assert_allclose(embeddings[:, 0], [1, 3, 2])
+
+
+class EchoLLM:
+    """LLM factice: répond en citant la question (dernière ligne du prompt) et mesure la concurrence."""
+    
+    def __init__(self, delay: float = 0.0):
+        import threading
+        
+        self.delay = delay
+        self.prompts = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+    
+    def stream(self, prompt):
+        import time
+        
+        with self._lock:
+            self.prompts.append(prompt)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(self.delay)
+            yield "réponse à "
+            yield prompt.rsplit("\n", 1)[-1]
+        finally:
+            with self._lock:
+                self.active -= 1
+    
+    async def astream(self, prompt):
+        import asyncio
+        
+        self.prompts.append(prompt)
+        for token in ("réponse à ", prompt.rsplit("\n", 1)[-1]):
+            await asyncio.sleep(self.delay)
+            yield token
 
 
 class TestRAGSystem(unittest.TestCase):
     """Tests pour le système RAG."""
     
+    def make_offline_rag(self, llm, max_concurrency: int = 8):
+        """Système RAG sans modèle ni serveur: encodeur, base NumPy et LLM factices."""
+        from rag_system import RAGSystem
+        from llm_pool import LLMBackend, LLMPool
+        from vector_store import NumpyVectorStore
+        
+        class HashEncoder:
+            """Vecteur pseudo-aléatoire par texte: des questions différentes ne se ressemblent pas."""
+            def encode(self, texts, show_progress_bar=False):
+                import zlib
+                return np.array(
+                    [np.random.default_rng(zlib.crc32(t.encode())).standard_normal(16) for t in texts],
+                    dtype=np.float32
+                )
+        
+        rag = RAGSystem(embedding_cache_dir=None, preload=False, warmup=False)
+        rag.vector_store = NumpyVectorStore(tempfile.mkdtemp())
+        rag.embedding_model = HashEncoder()
+        rag._set_component('llm', LLMPool([LLMBackend("http://a", llm, None, max_concurrency)]))
+        rag._prompt_template = "{context}\n{question}"
+        rag.index_chunks([{'id': '5.1', 'article_num': '5', 'article_title': 'T', 'point_num': '1', 'text': "Texte 5.1"}])
+        return rag
+    
     def test_embedding_generation(self):
         """Teste la génération d'embeddings."""
         from sentence_transformers import SentenceTransformer
@@ -73,6 +873,219 @@ class TestRAGSystem(unittest.TestCase):
         self.assertEqual(len(embedding.shape), 2)
         self.assertEqual(embedding.shape[0], 1)
         self.assertGreater(embedding.shape[1], 0)
+    
+    def test_lazy_components(self):
+        """Teste que les composants ne sont chargés qu'à la demande."""
+        from rag_system import RAGSystem
+        from vector_store import NumpyVectorStore
+        
+        rag = RAGSystem(embedding_cache_dir=None, preload=False)
+        self.assertFalse(rag.readiness()['ready'])
+        self.assertEqual(rag.readiness()['components']['vector_store'], 'idle')
+        
+        store = NumpyVectorStore(tempfile.mkdtemp())
+        rag.vector_store = store
+        self.assertIs(rag.vector_store, store)
+        self.assertEqual(rag.readiness()['components']['vector_store'], 'ready')
+    
+    def test_batched_indexing_alignment(self):
+        """Teste que l'indexation par lots triés garde chaque texte avec son embedding."""
+        from rag_system import RAGSystem
+        from vector_store import NumpyVectorStore
+        
+        class LengthEncoder:
+            def encode(self, texts, show_progress_bar=False):
+                return np.array([[len(t), 1.0] for t in texts], dtype=np.float32)
+        
+        chunks = [
+            {'id': f"1.{i}", 'article_num': '1', 'article_title': 'T', 'point_num': str(i), 'text': "x" * (i * 7 % 11 + 1)}
+            for i in range(9)
+        ]
+        rag = RAGSystem(embedding_cache_dir=None, preload=False, warmup=False)
+        rag.vector_store = NumpyVectorStore(tempfile.mkdtemp())
+        rag.embedding_model = LengthEncoder()
+        rag._upsert_chunks([c['id'] for c in chunks], chunks)
+        
+        results = rag.vector_store.query(np.array([[6.0, 1.0]]), n_results=1)
+        self.assertEqual(len(results['documents'][0][0]), 6)
+        self.assertEqual(rag.vector_store.count(), 9)
+    
+    def test_sync_chunks(self):
+        """Teste que la synchronisation ne réencode que les chunks nouveaux ou modifiés."""
+        from rag_system import RAGSystem
+        from vector_store import NumpyVectorStore
+        
+        class RecordingEncoder:
+            def __init__(self):
+                self.texts = []
+            
+            def encode(self, texts, show_progress_bar=False):
+                self.texts.extend(texts)
+                return np.array([[len(t), 1.0] for t in texts], dtype=np.float32)
+        
+        def chunk(point, text):
+            return {'id': f"5.{point}", 'article_num': '5', 'article_title': 'T', 'point_num': str(point), 'text': text}
+        
+        rag = RAGSystem(embedding_cache_dir=None, preload=False, warmup=False)
+        rag.vector_store = NumpyVectorStore(tempfile.mkdtemp())
+        rag.embedding_model = encoder = RecordingEncoder()
+        first = [chunk(1, "aaa"), chunk(2, "bbbbb"), chunk(3, "ccccccc")]
+        self.assertEqual(rag.sync_chunks(first), {'added': 3, 'deleted': 0, 'unchanged': 0})
+        
+        # 5.1 inchangé, 5.2 modifié, 5.3 disparu
+        encoder.texts.clear()
+        second = [chunk(1, "aaa"), chunk(2, "bbbbbb")]
+        stats = rag.sync_chunks(second)
+        
+        self.assertEqual(stats, {'added': 1, 'deleted': 2, 'unchanged': 1})
+        self.assertEqual(len(encoder.texts), 1)
+        self.assertIn("bbbbbb", encoder.texts[0])
+        self.assertEqual(sorted(rag.vector_store.get_ids()), sorted(compute_chunk_uid(c) for c in second))
+        self.assertEqual(rag.vector_store.get(ids=[compute_chunk_uid(second[1])])['documents'], ["bbbbbb"])
+    
+    def test_llm_queue_wait_is_not_prefill(self):
+        """Teste que l'attente d'une place sur le serveur LLM n'est pas comptée dans le prefill."""
+        import threading
+        import time
+        
+        rag = self.make_offline_rag(EchoLLM(), max_concurrency=1)
+        held = rag.llm.stream("occupé")
+        next(held)
+        
+        answers = []
+        thread = threading.Thread(target=lambda: answers.append(rag.query("Статья 5?", n_results=1)))
+        thread.start()
+        time.sleep(0.2)
+        held.close()
+        thread.join(5)
+        
+        self.assertIn("réponse à Статья 5?", answers[0])
+        queue = rag.metrics.stage_seconds.snapshot(stage='llm_queue')
+        prefill = rag.metrics.stage_seconds.snapshot(stage='llm_prefill')
+        self.assertEqual((queue['count'], prefill['count']), (1, 1))
+        self.assertGreaterEqual(queue['sum'], 0.15)
+        self.assertLess(prefill['sum'], 0.1)
+    
+    def test_prefix_layout_keeps_source_order(self):
+        """Teste qu'avec le prompt 'prefix', seul le contexte est classé par article."""
+        rag = self.make_offline_rag(EchoLLM())
+        
+        class TableEncoder:
+            """Similarité à la question fixée par le mot-clé du texte."""
+            vectors = {'девятой': [1.0, 0.0], 'третьей': [0.8, 0.6], 'седьмой': [0.6, 0.8], 'Что': [1.0, 0.0]}
+            
+            def encode(self, texts, show_progress_bar=False):
+                return np.array(
+                    [next((v for k, v in self.vectors.items() if k in t), [0.0, 1.0]) for t in texts],
+                    dtype=np.float32
+                )
+        
+        rag.vector_store = type(rag.vector_store)(tempfile.mkdtemp())
+        rag.embedding_model = TableEncoder()
+        rag.prompt_layout = 'prefix'
+        rag.index_chunks([
+            {'id': f'{n}.1', 'article_num': str(n), 'article_title': 'T', 'point_num': '1', 'text': f"Пункт {word} статьи"}
+            for n, word in ((3, 'третьей'), (7, 'седьмой'), (9, 'девятой'))
+        ])
+        
+        events = list(rag.stream_events("Что требуется?", n_results=3))
+        
+        # Sources par pertinence, contexte du prompt par position dans le règlement
+        self.assertEqual([source['article_num'] for source in events[-1]['sources']], ['9', '3', '7'])
+        prompt = rag.llm.backends[0].llm.prompts[0]
+        self.assertLess(prompt.index("третьей"), prompt.index("седьмой"))
+        self.assertLess(prompt.index("седьмой"), prompt.index("девятой"))
+    
+    def test_query_batch(self):
+        """Teste l'ordre des réponses, les réponses en cache et la concurrence bornée."""
+        llm = EchoLLM(delay=0.05)
+        rag = self.make_offline_rag(llm)
+        rag.answer_cache.store(None, 5, "q1", "réponse en cache", ["Texte 5.1"], [{}])
+        
+        questions = [f"q{i}" for i in range(6)]
+        answers = rag.query_batch(questions, n_results=5, max_concurrency=2)
+        
+        for i, answer in enumerate(answers):
+            self.assertTrue(answer.startswith(f"**Question:** q{i}\n"))
+            self.assertIn("réponse en cache" if i == 1 else f"réponse à q{i}", answer)
+        self.assertEqual(sorted(prompt.rsplit("\n", 1)[-1] for prompt in llm.prompts), ["q0", "q2", "q3", "q4", "q5"])
+        self.assertEqual(llm.max_active, 2)
+    
+    def test_indexing_clears_answer_cache(self):
+        """Teste qu'une réindexation ou une synchronisation qui modifie la base vide le cache des réponses."""
+        rag = self.make_offline_rag(EchoLLM())
+        chunk = {'id': '6.1', 'article_num': '6', 'article_title': 'T', 'point_num': '1', 'text': "Texte 6.1"}
+        
+        rag.answer_cache.store(None, 5, "q", "ancienne réponse", [], [])
+        rag.sync_chunks([chunk])
+        self.assertIsNone(rag.answer_cache.lookup_exact("q", 5))
+        
+        rag.answer_cache.store(None, 5, "q", "ancienne réponse", [], [])
+        rag.index_chunks([chunk], force_reindex=True)
+        self.assertIsNone(rag.answer_cache.lookup_exact("q", 5))
+    
+    def test_async_api(self):
+        """Teste aquery, astream_events et astream_query avec un LLM asynchrone factice."""
+        import asyncio
+        
+        llm = EchoLLM()
+        rag = self.make_offline_rag(llm)
+        
+        async def scenario():
+            answer = await rag.aquery("Quelles exigences ?")
+            events = [event async for event in rag.astream_events("Et le marquage ?")]
+            parts = [part async for part in rag.astream_query("Et le marquage ?")]
+            return answer, events, parts
+        
+        answer, events, parts = asyncio.run(scenario())
+        
+        self.assertIn("**Réponse:** réponse à Quelles exigences ?", answer)
+        self.assertEqual({event['type'] for event in events[:-1]}, {'delta'})
+        self.assertEqual("".join(event['text'] for event in events[:-1]), "réponse à Et le marquage ?")
+        self.assertEqual(events[-1]['type'], 'sources')
+        self.assertIn("réponse à Et le marquage ?", parts[-2])
+        self.assertTrue(parts[-1].endswith(events[-1]['markdown']))
+        # La question répétée est servie par le cache des réponses
+        self.assertEqual(len(llm.prompts), 2)
+    
+    def test_async_requests_do_not_wait_for_warmup(self):
+        """Teste que les requêtes asynchrones n'attendent pas le préchauffage, suivi par readiness()."""
+        import asyncio
+        import threading
+        
+        rag = self.make_offline_rag(EchoLLM())
+        release = threading.Event()
+        rag._loaders['warmup'] = lambda: release.wait(5)
+        
+        try:
+            answer = asyncio.run(asyncio.wait_for(rag.aquery("Quelles exigences ?"), timeout=2))
+            self.assertIn("réponse à Quelles exigences ?", answer)
+            self.assertEqual(rag.readiness()['components']['warmup'], 'loading')
+            self.assertFalse(rag.readiness()['ready'])
+        finally:
+            release.set()
+    
+    def test_keep_warm_pings(self):
+        """Teste que les pings keep-warm sollicitent périodiquement le LLM."""
+        import time
+        from rag_system import RAGSystem
+        
+        class PingLLM:
+            calls = 0
+            
+            def invoke(self, prompt):
+                PingLLM.calls += 1
+                return "OK"
+        
+        from llm_pool import LLMBackend, LLMPool
+        
+        rag = RAGSystem(embedding_cache_dir=None, preload=False)
+        rag._set_component('llm', LLMPool([LLMBackend("http://a", None, PingLLM())]))
+        rag.start_keep_warm(0.01)
+        time.sleep(0.2)
+        rag.stop_keep_warm()
+        
+        self.assertGreater(PingLLM.calls, 0)
 
 
 def run_tests():
@@ -81,6 +1094,20 @@ def run_tests():
     suite = unittest.TestSuite()
     
     suite.addTests(loader.loadTestsFromTestCase(TestChunking))
+    suite.addTests(loader.loadTestsFromTestCase(TestEmbeddingCache))
+    suite.addTests(loader.loadTestsFromTestCase(TestSemanticAnswerCache))
+    suite.addTests(loader.loadTestsFromTestCase(TestNumpyVectorStore))
+    suite.addTests(loader.loadTestsFromTestCase(TestQueryRouter))
+    suite.addTests(loader.loadTestsFromTestCase(TestContextBuilder))
+    suite.addTests(loader.loadTestsFromTestCase(TestStreaming))
+    suite.addTests(loader.loadTestsFromTestCase(TestCorpus))
+    suite.addTests(loader.loadTestsFromTestCase(TestChunkStore))
+    suite.addTests(loader.loadTestsFromTestCase(TestMetrics))
+    suite.addTests(loader.loadTestsFromTestCase(TestAdmission))
+    suite.addTests(loader.loadTestsFromTestCase(TestSingleFlight))
+    suite.addTests(loader.loadTestsFromTestCase(TestMicroBatch))
+    suite.addTests(loader.loadTestsFromTestCase(TestLLMPool))
+    suite.addTests(loader.loadTestsFromTestCase(TestEncoders))
     suite.addTests(loader.loadTestsFromTestCase(TestRAGSystem))
     
     runner = unittest.TextTestRunner(verbosity=2)
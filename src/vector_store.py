@@ -0,0 +1,685 @@
+"""
+Bases vectorielles du système RAG.
+Interface commune VectorStore avec deux implémentations:
+- ChromaVectorStore: collection ChromaDB persistante (index HNSW)
+- NumpyVectorStore: recherche exacte en mémoire sur une matrice float32
+  normalisée, mappée depuis le disque (un produit matriciel + argpartition),
+  ou recherche sur des codes compacts (float16, int8, binaire) suivie d'un
+  rescoring exact des meilleurs candidats
+"""
+
+import json
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+# Modes de stockage compact de NumpyVectorStore (octets par dimension: 2, 1, 1/8)
+QUANTIZATIONS = ("none", "float16", "int8", "binary")
+
+# Lignes traitées à la fois lors des passes sur les codes (copies float32 tenant en cache)
+_BLOCK_ROWS = 1024
+
+# Nombre de bits à 1 de chaque octet (distance de Hamming, NumPy < 2.0)
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def hamming_distances(codes: np.ndarray, query_code: np.ndarray) -> np.ndarray:
+    """
+    Distances de Hamming entre des codes binaires et le code d'une requête.
+
+    Args:
+        codes: Codes binaires (n x octets)
+        query_code: Code de la requête (octets)
+
+    Returns:
+        Distances (n,)
+    """
+    if codes.shape[1] % 8 == 0:
+        # Mots de 64 bits: 8 fois moins d'éléments à traiter
+        codes = np.ascontiguousarray(codes).view(np.uint64)
+        query_code = np.ascontiguousarray(query_code).view(np.uint64)
+    xor = np.bitwise_xor(codes, query_code)
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(xor).sum(axis=1, dtype=np.int32)
+    return _POPCOUNT[xor.view(np.uint8)].sum(axis=1, dtype=np.int32)
+
+
+def quantize(vectors: np.ndarray, quantization: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Calcule les codes compacts de vecteurs normalisés.
+
+    Args:
+        vectors: Vecteurs float32 normalisés (n x dim), éventuellement mappés depuis le disque
+        quantization: "float16", "int8" (échelle par vecteur) ou "binary" (signe, 1 bit par dimension)
+
+    Returns:
+        Tuple (codes, échelles des codes int8 ou None)
+    """
+    n, dim = vectors.shape
+    if quantization == "float16":
+        codes, scales = np.empty((n, dim), dtype=np.float16), None
+    elif quantization == "int8":
+        codes, scales = np.empty((n, dim), dtype=np.int8), np.empty(n, dtype=np.float32)
+    elif quantization == "binary":
+        codes, scales = np.empty((n, (dim + 7) // 8), dtype=np.uint8), None
+    else:
+        raise ValueError(f"Quantification inconnue: {quantization} (attendu: {', '.join(QUANTIZATIONS)})")
+
+    for start in range(0, n, _BLOCK_ROWS):
+        block = np.asarray(vectors[start:start + _BLOCK_ROWS], dtype=np.float32)
+        if quantization == "float16":
+            codes[start:start + len(block)] = block
+        elif quantization == "int8":
+            peak = np.abs(block).max(axis=1)
+            peak = np.where(peak > 0, peak, 1.0)
+            codes[start:start + len(block)] = np.rint(block / peak[:, None] * 127)
+            scales[start:start + len(block)] = peak / 127
+        else:
+            codes[start:start + len(block)] = np.packbits(block > 0, axis=1)
+    return codes, scales
+
+
+class VectorStore:
+    """Interface commune des bases vectorielles."""
+
+    def count(self) -> int:
+        """Retourne le nombre de documents indexés."""
+        raise NotImplementedError
+
+    def get_ids(self) -> List[str]:
+        """Retourne les IDs de tous les documents indexés."""
+        raise NotImplementedError
+
+    def max_batch_size(self) -> Optional[int]:
+        """
+        Retourne le nombre maximal de documents par écriture.
+
+        Returns:
+            Taille maximale d'un lot, ou None si une seule écriture est préférable
+        """
+        return None
+
+    def get(
+        self,
+        ids: Optional[Sequence[str]] = None,
+        where: Optional[Dict] = None,
+        include: Sequence[str] = ("documents", "metadatas")
+    ) -> Dict:
+        """
+        Récupère des documents par ID et/ou filtre de métadonnées.
+
+        Args:
+            ids: IDs recherchés (None pour tous)
+            where: Filtre de métadonnées au format ChromaDB
+            include: Champs retournés en plus des IDs ("documents", "metadatas")
+
+        Returns:
+            Dictionnaire {'ids', et les champs de include}
+        """
+        raise NotImplementedError
+
+    def upsert(
+        self,
+        ids: Sequence[str],
+        embeddings: np.ndarray,
+        documents: Sequence[str],
+        metadatas: Sequence[Dict]
+    ) -> None:
+        """
+        Ajoute ou remplace des documents.
+
+        Args:
+            ids: IDs des documents
+            embeddings: Embeddings (len(ids) x dim)
+            documents: Textes des documents
+            metadatas: Métadonnées des documents
+        """
+        raise NotImplementedError
+
+    def delete(self, ids: Sequence[str]) -> None:
+        """
+        Supprime des documents.
+
+        Args:
+            ids: IDs des documents à supprimer
+        """
+        raise NotImplementedError
+
+    def query(self, query_embeddings: np.ndarray, n_results: int, where: Optional[Dict] = None) -> Dict:
+        """
+        Recherche les plus proches voisins (distance cosinus).
+
+        Args:
+            query_embeddings: Embeddings des requêtes (n x dim)
+            n_results: Nombre de résultats par requête
+            where: Filtre de métadonnées au format ChromaDB
+
+        Returns:
+            Dictionnaire {'ids', 'documents', 'metadatas', 'distances'},
+            chaque valeur étant une liste par requête
+        """
+        raise NotImplementedError
+
+
+class ChromaVectorStore(VectorStore):
+    """Base vectorielle ChromaDB persistante."""
+
+    def __init__(self, path: str, collection_name: str = "regulation_collection"):
+        """
+        Ouvre (ou crée) la collection ChromaDB.
+
+        Args:
+            path: Chemin de la base de données ChromaDB
+            collection_name: Nom de la collection
+        """
+        import chromadb
+        from chromadb.config import Settings
+
+        self.client = chromadb.PersistentClient(
+            path=str(path),
+            settings=Settings(anonymized_telemetry=False)
+        )
+        self.collection_name = collection_name
+        try:
+            self.collection = self.client.get_collection(name=collection_name)
+            print(f"✅ Collection existante chargée: {collection_name}")
+        except Exception:
+            self.collection = self.client.create_collection(
+                name=collection_name,
+                metadata={"hnsw:space": "cosine"}
+            )
+            print(f"✅ Nouvelle collection créée: {collection_name}")
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def get_ids(self) -> List[str]:
+        return self.collection.get(include=[])["ids"]
+
+    def max_batch_size(self) -> Optional[int]:
+        # Limite imposée par le client ChromaDB (taille maximale d'un lot SQLite)
+        return getattr(self.client, 'max_batch_size', None) or 5000
+
+    def get(
+        self,
+        ids: Optional[Sequence[str]] = None,
+        where: Optional[Dict] = None,
+        include: Sequence[str] = ("documents", "metadatas")
+    ) -> Dict:
+        results = self.collection.get(
+            ids=list(ids) if ids is not None else None,
+            where=where,
+            include=list(include)
+        )
+        return {k: results[k] for k in ("ids", *include)}
+
+    def upsert(self, ids, embeddings, documents, metadatas) -> None:
+        self.collection.upsert(
+            embeddings=np.asarray(embeddings).tolist(),
+            documents=list(documents),
+            metadatas=list(metadatas),
+            ids=list(ids)
+        )
+
+    def delete(self, ids: Sequence[str]) -> None:
+        if ids:
+            self.collection.delete(ids=list(ids))
+
+    def query(self, query_embeddings: np.ndarray, n_results: int, where: Optional[Dict] = None) -> Dict:
+        results = self.collection.query(
+            query_embeddings=np.asarray(query_embeddings).tolist(),
+            n_results=n_results,
+            where=where,
+            include=["documents", "metadatas", "distances"]
+        )
+        return {k: results[k] for k in ("ids", "documents", "metadatas", "distances")}
+
+
+def _metadata_columns(metadatas: List[Dict]) -> Dict[str, Tuple[np.ndarray, Dict]]:
+    """
+    Encode chaque clé de métadonnées en colonne d'entiers (valeur -> code).
+
+    Les filtres $eq/$in deviennent aussi rapides qu'une comparaison d'entiers.
+
+    Args:
+        metadatas: Métadonnées des documents
+
+    Returns:
+        Dictionnaire {clé: (codes, vocabulaire)}
+    """
+    columns = {}
+    for key in sorted({key for metadata in metadatas for key in metadata}):
+        vocabulary: Dict = {}
+        codes = np.fromiter(
+            (vocabulary.setdefault(metadata.get(key), len(vocabulary)) for metadata in metadatas),
+            dtype=np.int32,
+            count=len(metadatas)
+        )
+        columns[key] = (codes, vocabulary)
+    return columns
+
+
+class _Snapshot:
+    """
+    Contenu de NumpyVectorStore à un instant donné.
+
+    Jamais modifié après sa création: une écriture en construit un nouveau
+    et le publie d'une seule affectation, chaque lecture travaille sur celui
+    qu'elle a pris au départ (IDs, vecteurs et codes toujours cohérents).
+    """
+
+    def __init__(
+        self,
+        version: int,
+        ids: List[str],
+        documents: List[str],
+        metadatas: List[Dict],
+        vectors: np.ndarray,
+        codes: Optional[np.ndarray] = None,
+        scales: Optional[np.ndarray] = None
+    ):
+        self.version = version
+        self.ids = ids
+        self.documents = documents
+        self.metadatas = metadatas
+        self.vectors = vectors
+        self.codes = codes
+        self.scales = scales
+        self.positions = {doc_id: i for i, doc_id in enumerate(ids)}
+        self.columns = _metadata_columns(metadatas)
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    Base vectorielle exacte en mémoire.
+
+    Les embeddings normalisés sont conservés dans vectors.<version>.npy (mappé
+    en mémoire à l'ouverture); IDs, documents et métadonnées sont stockés par
+    colonnes dans records.<version>.json, ce qui permet de filtrer les
+    métadonnées de façon vectorisée. Chaque écriture réécrit les fichiers
+    sous une nouvelle version, puis remplace manifest.json qui la désigne:
+    une interruption laisse la version précédente intacte. Les indexations
+    se font donc en un seul lot (max_batch_size() est None).
+
+    Les écritures sont sérialisées et publient un nouvel état d'un bloc:
+    les recherches peuvent continuer depuis d'autres threads pendant une
+    indexation.
+
+    Avec une quantification, seuls des codes compacts sont chargés en RAM
+    (codes.<mode>.<version>.npy): la recherche les parcourt tous, retient
+    n_results x rescore_factor candidats, puis les rescore exactement contre
+    les vecteurs float32, qui restent sur disque (mmap: seules les lignes
+    des candidats sont lues). Les distances retournées sont exactes.
+    """
+
+    def __init__(self, path: str, quantization: str = "none", rescore_factor: int = 10):
+        """
+        Ouvre (ou crée) la base dans un répertoire.
+
+        Args:
+            path: Répertoire de la base
+            quantization: Codes de la recherche: "none" (float32), "float16",
+                "int8" ou "binary" (préfiltre par distance de Hamming)
+            rescore_factor: Candidats rescorés par résultat demandé (quantification seulement)
+        """
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Quantification inconnue: {quantization} (attendu: {', '.join(QUANTIZATIONS)})")
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.quantization = quantization
+        self.rescore_factor = max(1, rescore_factor)
+        self._write_lock = threading.Lock()
+        self._snapshot = _Snapshot(0, [], [], [], np.zeros((0, 0), dtype=np.float32))
+
+        snapshot = self._open()
+        if snapshot is not None:
+            self._snapshot = self._load_codes(snapshot)
+            print(f"✅ Base NumPy chargée: {len(snapshot.ids)} documents")
+        else:
+            print(f"✅ Nouvelle base NumPy créée: {self.path}")
+
+    def _open(self) -> Optional[_Snapshot]:
+        """
+        Lit la version désignée par le manifeste (ou l'ancien format sans version).
+
+        Returns:
+            Contenu de la base, ou None si elle n'existe pas
+
+        Raises:
+            ValueError: Si les vecteurs et les enregistrements ne correspondent pas
+        """
+        manifest_file = self.path / "manifest.json"
+        if manifest_file.exists():
+            with open(manifest_file, 'r', encoding='utf-8') as f:
+                version = json.load(f)['version']
+            vectors_file, records_file = self.path / f"vectors.{version}.npy", self.path / f"records.{version}.json"
+        elif (self.path / "records.json").exists():
+            version = 0
+            vectors_file, records_file = self.path / "vectors.npy", self.path / "records.json"
+        else:
+            return None
+
+        with open(records_file, 'r', encoding='utf-8') as f:
+            records = json.load(f)
+        vectors = np.load(vectors_file, mmap_mode='r')
+        if not len(records['ids']) == len(records['documents']) == len(records['metadatas']) == len(vectors):
+            raise ValueError(
+                f"Base NumPy incohérente dans {self.path}: {len(records['ids'])} enregistrements "
+                f"pour {len(vectors)} vecteurs (supprimer le répertoire et réindexer)"
+            )
+        return _Snapshot(version, records['ids'], records['documents'], records['metadatas'], vectors)
+
+    def _publish(self, ids: List[str], documents: List[str], metadatas: List[Dict], vectors: np.ndarray) -> None:
+        """
+        Écrit une nouvelle version sur disque, la désigne dans le manifeste,
+        puis la publie pour les recherches (appelé sous _write_lock).
+        """
+        version = self._snapshot.version + 1
+        np.save(self.path / f"vectors.{version}.npy", np.ascontiguousarray(vectors, dtype=np.float32))
+        with open(self.path / f"records.{version}.json", 'w', encoding='utf-8') as f:
+            json.dump({'ids': ids, 'documents': documents, 'metadatas': metadatas}, f, ensure_ascii=False)
+
+        vectors = np.load(self.path / f"vectors.{version}.npy", mmap_mode='r')
+        snapshot = self._save_codes(_Snapshot(version, ids, documents, metadatas, vectors))
+
+        tmp_manifest = self.path / "manifest.tmp.json"
+        with open(tmp_manifest, 'w', encoding='utf-8') as f:
+            json.dump({'version': version, 'count': len(ids)}, f)
+        tmp_manifest.replace(self.path / "manifest.json")
+
+        self._snapshot = snapshot
+        self._remove_stale_files(version)
+
+    def _remove_stale_files(self, version: int) -> None:
+        """Supprime les fichiers des versions précédentes et des autres modes de quantification."""
+        keep = {f"vectors.{version}.npy", f"records.{version}.json",
+                f"codes.{self.quantization}.{version}.npy", f"scales.{self.quantization}.{version}.npy"}
+        for file in self.path.iterdir():
+            if file.name.startswith(("vectors.", "records.", "codes.", "scales.")) and file.name not in keep:
+                try:
+                    file.unlink(missing_ok=True)
+                except OSError:
+                    pass  # Encore mappé (Windows): supprimé à la prochaine écriture
+
+    def _save_codes(self, snapshot: _Snapshot) -> _Snapshot:
+        """Calcule et écrit les codes compacts d'une version."""
+        if self.quantization == "none":
+            return snapshot
+
+        snapshot.codes, snapshot.scales = quantize(snapshot.vectors, self.quantization)
+        for name, array in ((f"codes.{self.quantization}", snapshot.codes),
+                            (f"scales.{self.quantization}", snapshot.scales)):
+            if array is not None:
+                tmp = self.path / f"{name}.tmp.npy"
+                np.save(tmp, array)
+                tmp.replace(self.path / f"{name}.{snapshot.version}.npy")
+        return snapshot
+
+    def _load_codes(self, snapshot: _Snapshot) -> _Snapshot:
+        """Charge en RAM les codes compacts d'une version (calculés s'ils manquent)."""
+        if self.quantization == "none":
+            return snapshot
+        codes_file = self.path / f"codes.{self.quantization}.{snapshot.version}.npy"
+        scales_file = self.path / f"scales.{self.quantization}.{snapshot.version}.npy"
+        if codes_file.exists() and (self.quantization != "int8" or scales_file.exists()):
+            codes = np.load(codes_file)
+            if len(codes) == len(snapshot.ids):
+                snapshot.codes = codes
+                snapshot.scales = np.load(scales_file) if self.quantization == "int8" else None
+                return snapshot
+        print(f"🔄 Calcul des codes {self.quantization} ({len(snapshot.ids)} vecteurs)...")
+        return self._save_codes(snapshot)
+
+    def storage_stats(self) -> Dict[str, int]:
+        """
+        Taille de la base.
+
+        Returns:
+            {'disk_bytes': fichiers de la base, 'search_bytes': données parcourues
+            par chaque recherche (codes en RAM, ou matrice float32 entière)}
+        """
+        snapshot = self._snapshot
+        if snapshot.codes is not None:
+            search = snapshot.codes.nbytes + (snapshot.scales.nbytes if snapshot.scales is not None else 0)
+        else:
+            search = int(np.prod(snapshot.vectors.shape)) * 4
+        return {
+            'disk_bytes': sum(f.stat().st_size for f in self.path.iterdir() if f.is_file()),
+            'search_bytes': int(search),
+        }
+
+    @classmethod
+    def _mask(cls, snapshot: _Snapshot, where: Optional[Dict]) -> Optional[np.ndarray]:
+        """
+        Évalue un filtre de métadonnées au format ChromaDB.
+
+        Opérateurs supportés: égalité, $eq, $ne, $in, $nin, $and, $or.
+
+        Args:
+            snapshot: Contenu de la base
+            where: Filtre de métadonnées
+
+        Returns:
+            Masque booléen des documents retenus (None si pas de filtre)
+        """
+        if not where:
+            return None
+
+        n = len(snapshot.ids)
+        mask = np.ones(n, dtype=bool)
+        for key, condition in where.items():
+            if key == "$and":
+                for sub in condition:
+                    mask &= cls._mask(snapshot, sub)
+                continue
+            if key == "$or":
+                any_mask = np.zeros(n, dtype=bool)
+                for sub in condition:
+                    any_mask |= cls._mask(snapshot, sub)
+                mask &= any_mask
+                continue
+
+            codes, vocabulary = snapshot.columns.get(key, (np.zeros(n, dtype=np.int32), {None: 0}))
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            for op, value in condition.items():
+                # Une valeur absente de la colonne prend un code qui ne correspond à rien
+                if op == "$eq":
+                    mask &= codes == vocabulary.get(value, -1)
+                elif op == "$ne":
+                    mask &= codes != vocabulary.get(value, -1)
+                elif op == "$in":
+                    mask &= np.isin(codes, [vocabulary.get(v, -1) for v in value])
+                elif op == "$nin":
+                    mask &= ~np.isin(codes, [vocabulary.get(v, -1) for v in value])
+                else:
+                    raise ValueError(f"Opérateur de filtre non supporté: {op}")
+        return mask
+
+    def count(self) -> int:
+        return len(self._snapshot.ids)
+
+    def get_ids(self) -> List[str]:
+        return list(self._snapshot.ids)
+
+    def get(
+        self,
+        ids: Optional[Sequence[str]] = None,
+        where: Optional[Dict] = None,
+        include: Sequence[str] = ("documents", "metadatas")
+    ) -> Dict:
+        snapshot = self._snapshot
+        if ids is None:
+            positions = np.arange(len(snapshot.ids))
+        else:
+            positions = np.array([snapshot.positions[i] for i in ids if i in snapshot.positions], dtype=np.int64)
+
+        mask = self._mask(snapshot, where)
+        if mask is not None:
+            positions = positions[mask[positions]]
+
+        columns = {'ids': snapshot.ids, 'documents': snapshot.documents, 'metadatas': snapshot.metadatas}
+        return {k: [columns[k][i] for i in positions] for k in ("ids", *include)}
+
+    def upsert(self, ids, embeddings, documents, metadatas) -> None:
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings = embeddings / np.where(norms > 0, norms, 1.0)
+
+        with self._write_lock:
+            # Copies modifiées localement: l'état publié reste intact jusqu'à _publish
+            current = self._snapshot
+            new_ids, new_documents, new_metadatas = list(current.ids), list(current.documents), list(current.metadatas)
+            positions = dict(current.positions)
+            vectors = np.array(current.vectors) if len(new_ids) else np.zeros((0, embeddings.shape[1]), np.float32)
+            new_rows = []
+            for doc_id, vector, document, metadata in zip(ids, embeddings, documents, metadatas):
+                position = positions.get(doc_id)
+                if position is None:
+                    positions[doc_id] = len(new_ids)
+                    new_ids.append(doc_id)
+                    new_documents.append(document)
+                    new_metadatas.append(dict(metadata))
+                    new_rows.append(vector)
+                elif position < len(vectors):
+                    vectors[position] = vector
+                    new_documents[position] = document
+                    new_metadatas[position] = dict(metadata)
+                else:
+                    # ID répété dans le lot: la dernière occurrence l'emporte
+                    new_rows[position - len(vectors)] = vector
+                    new_documents[position] = document
+                    new_metadatas[position] = dict(metadata)
+
+            if new_rows:
+                vectors = np.concatenate([vectors, np.stack(new_rows)], axis=0)
+            self._publish(new_ids, new_documents, new_metadatas, vectors)
+
+    def delete(self, ids: Sequence[str]) -> None:
+        with self._write_lock:
+            current = self._snapshot
+            doomed = {current.positions[i] for i in ids if i in current.positions}
+            if not doomed:
+                return
+
+            keep = [i for i in range(len(current.ids)) if i not in doomed]
+            self._publish(
+                [current.ids[i] for i in keep],
+                [current.documents[i] for i in keep],
+                [current.metadatas[i] for i in keep],
+                np.array(current.vectors[keep])
+            )
+
+    def query(self, query_embeddings: np.ndarray, n_results: int, where: Optional[Dict] = None) -> Dict:
+        queries = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms > 0, norms, 1.0)
+
+        snapshot = self._snapshot
+        results = {'ids': [], 'documents': [], 'metadatas': [], 'distances': []}
+        if len(snapshot.ids) == 0:
+            for key in results:
+                results[key] = [[] for _ in queries]
+            return results
+
+        # Avec un filtre, seules les lignes retenues sont comparées aux requêtes
+        mask = self._mask(snapshot, where)
+        rows = np.arange(len(snapshot.ids)) if mask is None else np.flatnonzero(mask)
+        k = min(n_results, len(rows))
+        if snapshot.codes is not None and k > 0:
+            return self._query_quantized(snapshot, queries, rows, k, results)
+
+        vectors = snapshot.vectors if mask is None else snapshot.vectors[rows]
+        scores = queries @ vectors.T
+
+        if k == 0:
+            top = np.zeros((len(queries), 0), dtype=np.int64)
+        elif k < scores.shape[1]:
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            top = np.tile(np.arange(scores.shape[1]), (len(queries), 1))
+
+        for row, candidates in zip(scores, top):
+            candidates = candidates[np.argsort(-row[candidates], kind='stable')]
+            ordered = rows[candidates]
+            results['ids'].append([snapshot.ids[i] for i in ordered])
+            results['documents'].append([snapshot.documents[i] for i in ordered])
+            results['metadatas'].append([snapshot.metadatas[i] for i in ordered])
+            results['distances'].append([float(1.0 - row[i]) for i in candidates])
+        return results
+
+    def _coarse_scores(self, snapshot: _Snapshot, queries: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """
+        Scores approchés des lignes retenues, à partir des codes compacts.
+
+        Returns:
+            Scores (n_requêtes x len(rows)), plus grands pour les plus proches
+        """
+        scores = np.empty((len(queries), len(rows)), dtype=np.float32)
+        if self.quantization == "binary":
+            query_codes = np.packbits(queries > 0, axis=1)
+        for start in range(0, len(rows), _BLOCK_ROWS):
+            block_rows = rows[start:start + _BLOCK_ROWS]
+            codes = snapshot.codes[block_rows]
+            if self.quantization == "binary":
+                for i, query_code in enumerate(query_codes):
+                    scores[i, start:start + len(block_rows)] = -hamming_distances(codes, query_code)
+                continue
+            block = queries @ codes.astype(np.float32).T
+            if snapshot.scales is not None:
+                block *= snapshot.scales[block_rows]
+            scores[:, start:start + len(block_rows)] = block
+        return scores
+
+    def _query_quantized(self, snapshot: _Snapshot, queries: np.ndarray, rows: np.ndarray, k: int, results: Dict) -> Dict:
+        """Recherche sur les codes compacts, puis rescoring exact des candidats en float32."""
+        coarse = self._coarse_scores(snapshot, queries, rows)
+        n_candidates = min(len(rows), k * self.rescore_factor)
+        if n_candidates < len(rows):
+            shortlist = np.argpartition(-coarse, n_candidates - 1, axis=1)[:, :n_candidates]
+        else:
+            shortlist = np.tile(np.arange(len(rows)), (len(queries), 1))
+
+        for query, candidates in zip(queries, shortlist):
+            # Lignes triées: lecture séquentielle du fichier mappé
+            candidate_rows = np.sort(rows[candidates])
+            exact = np.asarray(snapshot.vectors[candidate_rows], dtype=np.float32) @ query
+            top = np.argsort(-exact, kind='stable')[:k]
+            ordered = candidate_rows[top]
+            results['ids'].append([snapshot.ids[i] for i in ordered])
+            results['documents'].append([snapshot.documents[i] for i in ordered])
+            results['metadatas'].append([snapshot.metadatas[i] for i in ordered])
+            results['distances'].append([float(1.0 - exact[i]) for i in top])
+        return results
+
+
+def create_vector_store(
+    backend: str,
+    path: str,
+    collection_name: str = "regulation_collection",
+    quantization: str = "none",
+    rescore_factor: int = 10
+) -> VectorStore:
+    """
+    Crée la base vectorielle configurée.
+
+    Args:
+        backend: "chroma" ou "numpy"
+        path: Chemin de la base
+        collection_name: Nom de la collection (ChromaDB)
+        quantization: Codes compacts de la recherche (NumPy seulement, voir NumpyVectorStore)
+        rescore_factor: Candidats rescorés par résultat demandé (NumPy quantifiée)
+
+    Returns:
+        Instance de VectorStore
+    """
+    if backend == "chroma":
+        if quantization != "none":
+            print(f"⚠️  Quantification {quantization} ignorée: non supportée par ChromaDB (backend numpy requis)")
+        return ChromaVectorStore(path, collection_name)
+    if backend == "numpy":
+        return NumpyVectorStore(path, quantization, rescore_factor)
+    raise ValueError(f"Backend de base vectorielle inconnu: {backend}")